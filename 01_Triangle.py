@@ -7,72 +7,16 @@ wxPython examples and amengede/getIntoGameDev pyOpengGL series'''
 # GitHub: https://github.com/amengede/getIntoGameDev/blob/main/pyopengl/02%20-%20triangle/finished/triangle.py
 # GitHub: https://github.com/tartley/gltutpy/blob/master/t01.hello-triangle/HelloTriangle.py#L76
 
-import time
+import os
 import wx
 from wx import glcanvas
 import pyglet
-pyglet.options['debug_gl'] = True
-pyglet.options['shadow_window'] = False
+from gl3wxpyg import options
+# GL3WXPYG_PROFILE=debug for driver diagnostics
+options.configure()
 from pyglet.gl.gl import *
-import ctypes
-import numpy as np
-
-
-class Triangle:
-    """
-        Yep, it's a triangle.
-    """
-    def __init__(self):
-        """
-            Initialize a triangle.
-        """
-        # x, y, z, r, g, b
-        vertices = (
-            -0.5, -0.5, 0.0, 1.0, 0.3, 0.0,
-             0.5, -0.5, 0.0, 0.7, 0.9, 0.0,
-             0.0,  0.5, 0.0, 0.1, 0.3, 0.5
-        )
-        vertices = np.array(vertices, dtype=np.float32)
-        # One way to convert the array to GLfloat
-        array_type = GLfloat * len(vertices)
-        vertices_gl = array_type(*vertices)
-
-        self.vertex_count = 3
-
-        # Vertex array object
-        self.vao = GLuint(0)
-        glGenVertexArrays(1, self.vao)
-        glBindVertexArray(self.vao)
-        # Vertex buffer object
-        self.vbo = GLuint(0)
-        glGenBuffers(1, self.vbo)
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices_gl, GL_STATIC_DRAW)
-
-        glEnableVertexAttribArray(0)  # Vertex position
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 24, 0)
-
-        glEnableVertexAttribArray(1)  # Vertex colour
-        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 24, 12)
-
-    def arm_for_drawing(self) -> None:
-        """
-            Arm the triangle for drawing.
-        """
-        glBindVertexArray(self.vao)
-
-    def draw(self) -> None:
-        """
-            Draw the triangle. This is the actual drawcall
-        """
-        glDrawArrays(GL_TRIANGLES, 0, self.vertex_count)
-
-    def destroy(self) -> None:
-        """
-            Free any allocated memory.
-        """
-        glDeleteVertexArrays(1, self.vao)
-        glDeleteBuffers(1, self.vbo)
+from gl3wxpyg.scheduler import FrameScheduler
+from gl3wxpyg.triangle_scene import TriangleScene
 
 
 class MyCanvasBase(glcanvas.GLCanvas):
@@ -92,7 +36,10 @@ class MyCanvasBase(glcanvas.GLCanvas):
         # Context attributes
         # I'm not certain if this settings do anything here
         cxt_attrs = glcanvas.GLContextAttrs()
-        cxt_attrs.PlatformDefaults().CoreProfile().MajorVersion(3).MinorVersion(3).EndList()
+        cxt_attrs.PlatformDefaults().CoreProfile().MajorVersion(3).MinorVersion(3)
+        if options.profile() == 'debug':
+            cxt_attrs.DebugCtx()
+        cxt_attrs.EndList()
         self.wx_context = glcanvas.GLContext(self, ctxAttrs=cxt_attrs)
         self.SetCurrent(self.wx_context)
         # Feed the wx context to pyglet by giving it the currently activated context
@@ -110,6 +57,10 @@ class MyCanvasBase(glcanvas.GLCanvas):
         self.lastx = self.x = 30
         self.lasty = self.y = 30
         self.size = None
+        # Input, resize and scene changes only mark the canvas dirty,
+        # the scheduler turns them into at most one frame per refresh
+        self.scheduler = FrameScheduler(self)
+        self.viewport_dirty = True
         self.Bind(wx.EVT_ERASE_BACKGROUND, self.on_erase_background)
         self.Bind(wx.EVT_SIZE, self.on_size)
         self.Bind(wx.EVT_PAINT, self.on_paint)
@@ -124,21 +75,28 @@ class MyCanvasBase(glcanvas.GLCanvas):
         pass  # Do nothing, to avoid flashing on MSW.
 
     def on_size(self, event):
-        wx.CallAfter(self.do_set_viewport)
+        # The viewport is updated once by the next paint, however many
+        # size events arrive before it
+        self.viewport_dirty = True
+        self.scheduler.invalidate()
         event.Skip()
 
     def do_set_viewport(self):
         size = self.size = self.GetClientSize() * self.GetContentScaleFactor()
-        self.aspect = size.width / size.height
+        self.aspect = size.width / max(size.height, 1)
         self.SetCurrent(self.wx_context)
         glViewport(0, 0, size.width, size.height)
+        self.viewport_dirty = False
 
     def on_paint(self, event):
         self.SetCurrent(self.wx_context)
         if not self.init:
             self.init_gl(self.status_text)
             self.init = True
+        if self.viewport_dirty:
+            self.do_set_viewport()
         self.on_draw()
+        self.scheduler.frame_rendered()
 
     def on_mouse_down(self, event):
         if self.HasCapture():
@@ -154,131 +112,46 @@ class MyCanvasBase(glcanvas.GLCanvas):
         if event.Dragging() and event.LeftIsDown():
             self.lastx, self.lasty = self.x, self.y
             self.x, self.y = event.GetPosition()
-            self.Refresh(False)
+            self.scheduler.invalidate()
+
 
+class Canvas(TriangleScene, MyCanvasBase):
+    '''Use OpenGL canvas, the drawing itself is done by TriangleScene'''
+    # Render continuously at this FPS instead of on demand, e.g. GL3WXPYG_FPS=60
+    continuous_fps = float(os.environ.get('GL3WXPYG_FPS', 0)) or None
 
-class Canvas(MyCanvasBase):
-    '''Use OpenGL canvas'''
     def init_gl(self, status_text: wx.StaticText):
         '''Initialise ogl context'''
         self.fps_status = status_text
-        self.last_time = 0
-        self.sh_program = None
-        self.triangle = None
-
-        # Background colour
-        COL_BG = (96, 147, 172)
-        glClearColor(COL_BG[0] / 255, COL_BG[1] / 255, COL_BG[2] / 255, 1)
-
-        # Enable depth testing and face culling. Not needed in this example
-        glEnable(GL_DEPTH_TEST)
-        glEnable(GL_CULL_FACE)
-
-        self._create_assets()
+        super().init_gl()
         self.do_set_viewport()
+        self.scheduler.set_continuous(self.continuous_fps)
 
-    def on_draw(self):
-        '''Drawcall, clear the stage, prepare a new frame and
-        eventually swap buffers
-        '''
-
-        # Clear color and depth buffers.
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        # Activate the compiled shader program for use
-        glUseProgram(self.sh_program)
-        aspect_ratio = self.get_aspect()
-        glUniform1f(glGetUniformLocation(self.sh_program, b'aspect'), aspect_ratio)
-
-        # Activate the vertex array buffer for the objects to draw
-        self.triangle.arm_for_drawing()
-        self.triangle.draw()
-
-        # Swap the currently shown frame with the prepared new frame
+    # Surface hooks used by TriangleScene
+    def swap_buffers(self) -> None:
         self.SwapBuffers()
 
-        # Approximate how long the frame took
-        self.calc_frametime()
-
-    def _create_assets(self) -> None:
-        """
-            Create all of the assets needed for drawing.
-        """
-        # A triangle object (vertices and colours)
-        self.triangle = Triangle()
-
-        # Shader program
-        vert_filepath = "shaders/vertex.glsl"
-        frag_filepath = "shaders/fragment.glsl"
-        self.sh_program = self.create_shader_program(vert_filepath, frag_filepath)
-
-    def compile_shader(self, filepath: str, shader_type: type) -> int:
-        '''Take a path to an opengl shader as string,
-        prepare it with ctypes and compile a shader
-            Parameters:
-                shader_src: shader source code as string
-            Returns:
-                A handle to the compiled shader object
-        '''
-        with open(filepath,'r', encoding='utf-8') as f:
-            shader_src = f.read()
-
-        b_src = shader_src.encode('utf-8')
-        src_len = ctypes.c_int(len(b_src))
-        src_pointer = ctypes.cast(ctypes.c_char_p(b_src), ctypes.POINTER(ctypes.c_char))
-
-        shader_id = glCreateShader(shader_type)
-        glShaderSource(shader_id, 1, src_pointer, src_len)
-        glCompileShader(shader_id)
-
-        return shader_id
-
-    def create_shader_program(self, vertex_filepath: str, fragment_filepath: str) -> int:
-        """
-            Compile and link shader modules to make a shader program.
-            Parameters:
-                vertex_filepath: path to the text file storing the vertex
-                                source code
-                fragment_filepath: path to the text file storing the
-                                fragment source code
-            Returns:
-                A handle to the created shader program
-        """
-
-        # Create and compile the shader objects
-        vert_sh_id = self.compile_shader(vertex_filepath, GL_VERTEX_SHADER)
-        frag_sh_id = self.compile_shader(fragment_filepath, GL_FRAGMENT_SHADER)
-
-        # Link the shader in one program
-        program_id = glCreateProgram()
-        glAttachShader(program_id, vert_sh_id)
-        glAttachShader(program_id, frag_sh_id)
-        glLinkProgram(program_id)
+    def make_current(self) -> None:
+        self.SetCurrent(self.wx_context)
 
-        # Shader objects no longer needed
-        glDetachShader(program_id, vert_sh_id)
-        glDetachShader(program_id, frag_sh_id)
+    def request_redraw(self) -> None:
+        self.scheduler.invalidate()
 
-        return program_id
+    def call_after(self, func, *args) -> None:
+        wx.CallAfter(func, *args)
 
-    def calc_frametime(self) -> None:
+    def update_frame_status(self) -> None:
         """
-            Calculate the frametime and framerate,
-            and update the textbox.
+            Show the frame statistics in the textbox. Called a few
+            times per second, not per frame, to avoid a wx relayout
+            on every frame.
         """
-        current_time = time.time_ns()
-        frametime = (current_time - self.last_time) / 1000000
-        if frametime > 1000:
-            frametime = 10
-        framerate = int(1000 / frametime)
-        self.last_time = current_time
-        self.fps_status.SetLabel(f"Frametime: {frametime:.3f} ms, FPS: {framerate}")
+        self.fps_status.SetLabel(self.frame_stats.format())
 
     def destroy(self) -> None:
         '''Clean up before closing the window'''
-        if self.triangle:
-            self.triangle.destroy()
-        if self.sh_program:
-            glDeleteProgram(self.sh_program)
+        self.scheduler.stop()
+        super().destroy()
 
 
 class OpenGLDemoWindow(wx.Frame):
@@ -0,0 +1,131 @@
+''' Benchmark for gl3wxpyg.draw_queue: draws of many groups (programs x
+textures) submitted in scene order, once with set_state()/unset_state()
+around every draw and once through a DrawQueue that sorts them by state.
+Reports CPU time per frame and state changes per frame.
+Run from the repo root: python -m benchmarks.draw_queue'''
+
+import argparse
+import random
+import time
+
+from gl3wxpyg import options
+options.configure()
+import pyglet
+# Error checks after every call would dominate the timings
+pyglet.options['debug_gl'] = False
+from pyglet.gl import GL_TEXTURE_2D, GL_TEXTURE0, GL_RGBA8, GL_RGBA, GL_UNSIGNED_BYTE, \
+    glActiveTexture, glTexImage2D, glFinish
+import numpy as np
+
+from gl3wxpyg.buffers import Mesh
+from gl3wxpyg.draw_queue import DrawQueue
+from gl3wxpyg.frame_uniforms import FrameUniforms
+from gl3wxpyg.offscreen import create_context, Framebuffer
+from gl3wxpyg.shaders import ShaderProgram, build_program
+from gl3wxpyg.textures import Texture
+from .render_paths import TRIANGLE_CORNERS, triangle_sources
+
+
+class SceneGroup:
+    """
+        Program and texture of a draw, like RenderGroup of
+        examples/pyglet_shader_example.py.
+    """
+    def __init__(self, program: ShaderProgram, texture: Texture):
+        self.program = program
+        self.texture = texture
+
+    def set_state(self) -> None:
+        glActiveTexture(GL_TEXTURE0)
+        self.texture.bind()
+        self.program.use()
+
+    def unset_state(self) -> None:
+        pass
+
+
+def make_textures(count: int) -> list:
+    textures = []
+    for _ in range(count):
+        texture = Texture(1, 1, 4)
+        texture.bind()
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, 1, 1, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+        textures.append(texture)
+    return textures
+
+
+def make_programs(count: int) -> list:
+    return [ShaderProgram(build_program(triangle_sources())) for _ in range(count)]
+
+
+def frame_unsorted(draws: list) -> int:
+    for group, draw in draws:
+        group.set_state()
+        draw()
+        group.unset_state()
+    return len(draws)
+
+
+def frame_queued(queue: DrawQueue, draws: list) -> int:
+    for group, draw in draws:
+        queue.submit(group, draw)
+    return queue.flush()
+
+
+def best_ms(frame, frames: int) -> float:
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        frame()
+        glFinish()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--draws', type=int, nargs='+', default=[1_000, 10_000],
+                        help="draws per frame")
+    parser.add_argument('--programs', type=int, default=4)
+    parser.add_argument('--textures', type=int, default=16)
+    parser.add_argument('--frames', type=int, default=10,
+                        help="frames per measurement, the best one is reported")
+    args = parser.parse_args()
+
+    window = create_context()
+    framebuffer = Framebuffer(64, 64)
+    framebuffer.bind()
+    frame_uniforms = FrameUniforms()
+    programs = make_programs(args.programs)
+    textures = make_textures(args.textures)
+    groups = [SceneGroup(program, texture) for program in programs for texture in textures]
+    mesh = Mesh(np.hstack((TRIANGLE_CORNERS * 0.01, np.ones((3, 3), dtype=np.float32))),
+                ((0, 3), (1, 3)))
+
+    def draw():
+        mesh.arm_for_drawing()
+        mesh.draw()
+
+    print(f"{'draws':>8} {'groups':>7} {'unsorted ms':>12} {'changes':>8} "
+          f"{'queued ms':>10} {'changes':>8} {'speedup':>8}")
+    rng = random.Random(0)
+    for count in args.draws:
+        draws = [(rng.choice(groups), draw) for _ in range(count)]
+        queue = DrawQueue()
+        old = best_ms(lambda: frame_unsorted(draws), args.frames)
+        new = best_ms(lambda: frame_queued(queue, draws), args.frames)
+        print(f"{count:>8} {len(groups):>7} {old:12.2f} {count:>8} "
+              f"{new:10.2f} {queue.state_changes:>8} {old / new:7.1f}x")
+
+    mesh.destroy()
+    for program in programs:
+        program.destroy()
+    for texture in textures:
+        texture.destroy()
+    frame_uniforms.destroy()
+    framebuffer.destroy()
+    window.close()
+
+
+if __name__ == '__main__':
+    main()
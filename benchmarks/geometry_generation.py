@@ -0,0 +1,96 @@
+''' Benchmark for procedural geometry: create_torus of
+examples/pyglet_graphics_example.py with its nested Python loops against
+the NumPy generator gl3wxpyg.geometry.torus. No OpenGL needed.
+Run from the repo root: python -m benchmarks.geometry_generation'''
+
+import argparse
+import time
+from math import pi, sin, cos
+
+import numpy as np
+
+from gl3wxpyg.geometry import torus
+
+
+def torus_loops(radius: float, inner_radius: float, slices: int, inner_slices: int):
+    """
+        The vertex, normal and index generation of the original
+        create_torus, unchanged.
+    """
+    # Create the vertex and normal arrays.
+    vertices = []
+    normals = []
+
+    u_step = 2 * pi / (slices - 1)
+    v_step = 2 * pi / (inner_slices - 1)
+    u = 0.
+    for i in range(slices):
+        cos_u = cos(u)
+        sin_u = sin(u)
+        v = 0.
+        for j in range(inner_slices):
+            cos_v = cos(v)
+            sin_v = sin(v)
+
+            d = (radius + inner_radius * cos_v)
+            x = d * cos_u
+            y = d * sin_u
+            z = inner_radius * sin_v
+
+            nx = cos_u * cos_v
+            ny = sin_u * cos_v
+            nz = sin_v
+
+            vertices.extend([x, y, z])
+            normals.extend([nx, ny, nz])
+            v += v_step
+        u += u_step
+
+    # Create a list of triangle indices.
+    indices = []
+    for i in range(slices - 1):
+        for j in range(inner_slices - 1):
+            p = i * inner_slices + j
+            indices.extend([p, p + inner_slices, p + inner_slices + 1])
+            indices.extend([p, p + inner_slices + 1, p + 1])
+    return vertices, normals, indices
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', nargs='+', default=['50x30', '200x200', '500x500',
+                                                       '1000x1000', '2000x2000'],
+                        help="torus resolutions as SLICESxINNER_SLICES")
+    parser.add_argument('--max-loop', type=int, default=4_000_000,
+                        help="skip the loop version above this vertex count")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="runs of the NumPy version, the best one is reported")
+    args = parser.parse_args()
+
+    print(f"{'slices':>11} {'vertices':>10} {'loops ms':>10} {'numpy ms':>10} "
+          f"{'speedup':>8} {'match':>6}")
+    for size in args.sizes:
+        slices, inner_slices = (int(value) for value in size.lower().split('x'))
+        new, geometry = min((timed(torus, 1.0, 0.3, slices, inner_slices)
+                             for _ in range(args.repeat)), key=lambda run: run[0])
+        count = slices * inner_slices
+        if count <= args.max_loop:
+            old, (vertices, normals, indices) = timed(torus_loops, 1.0, 0.3, slices, inner_slices)
+            # The loop accumulates its angles, allow for the rounding
+            match = (np.allclose(geometry.positions.ravel(), vertices, atol=1e-5)
+                     and np.allclose(geometry.normals.ravel(), normals, atol=1e-5)
+                     and np.array_equal(geometry.indices, indices))
+            old_text, speedup, match_text = f"{old * 1000:10.1f}", f"{old / new:7.1f}x", str(match)
+        else:
+            old_text, speedup, match_text = f"{'skipped':>10}", f"{'-':>8}", '-'
+        print(f"{size:>11} {count:>10} {old_text} {new * 1000:10.1f} {speedup} {match_text:>6}")
+
+
+if __name__ == '__main__':
+    main()
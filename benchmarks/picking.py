@@ -0,0 +1,138 @@
+''' Benchmark for gl3wxpyg.picking: hover picks over growing numbers of
+instanced triangles, every instance an object. "sync" renders the ids
+of the whole window and reads the pixel under the cursor with
+glReadPixels into client memory, which waits for the GPU every frame.
+"async" renders only the scissored pixels around the cursor into a
+PickBuffer and reads them a frame later through a pack buffer.
+Reports CPU ms per pick frame and how many frames late the result is.
+Run from the repo root: python -m benchmarks.picking'''
+
+import argparse
+import ctypes
+import os
+import time
+
+from gl3wxpyg import options
+options.configure()
+import pyglet
+# Error checks after every call would dominate the timings
+pyglet.options['debug_gl'] = False
+from pyglet.gl import GLuint, GL_VERTEX_SHADER, GL_FRAGMENT_SHADER, GL_FRAMEBUFFER, GL_COLOR, \
+    GL_DEPTH_BUFFER_BIT, GL_DEPTH_TEST, GL_COLOR_ATTACHMENT0, GL_RED_INTEGER, GL_UNSIGNED_INT, \
+    glBindFramebuffer, glClearBufferuiv, glClear, glEnable, glReadBuffer, glReadPixels, \
+    glViewport, glFinish
+import numpy as np
+
+from gl3wxpyg.frame_uniforms import FrameUniforms
+from gl3wxpyg.instancing import InstancedMesh
+from gl3wxpyg.offscreen import create_context
+from gl3wxpyg.picking import PickBuffer
+from gl3wxpyg.shaders import ShaderProgram, build_program, read_source
+from .render_paths import SHADER_DIR, TRIANGLE_CORNERS, scattered_offsets
+
+
+def pick_program() -> ShaderProgram:
+    sources = {
+        GL_VERTEX_SHADER: read_source(os.path.join(SHADER_DIR, "instanced_vertex.glsl")),
+        GL_FRAGMENT_SHADER: read_source(os.path.join(SHADER_DIR, "pick_fragment.glsl")),
+    }
+    return ShaderProgram(build_program(sources, {'PICKING': 1}))
+
+
+def make_objects(count: int) -> InstancedMesh:
+    vertices = np.hstack((TRIANGLE_CORNERS, np.ones((3, 3), dtype=np.float32)))
+    mesh = InstancedMesh(vertices, ((0, 3), (1, 3)), capacity=count)
+    instances = mesh.instances
+    instances.resize(count)
+    instances['offset'][:] = scattered_offsets(count)
+    # Small enough that the objects under the cursor change with it
+    instances['scale'][:] = 2.0 / np.sqrt(count)
+    instances.mark_dirty(0, count)
+    return mesh
+
+
+def frame_sync(pick_buffer: PickBuffer, draw, x: int, y: int) -> int:
+    glBindFramebuffer(GL_FRAMEBUFFER, pick_buffer.fbo)
+    glClearBufferuiv(GL_COLOR, 0, (GLuint * 4)())
+    glClear(GL_DEPTH_BUFFER_BIT)
+    draw()
+    glReadBuffer(GL_COLOR_ATTACHMENT0)
+    pixel = GLuint(0)
+    glReadPixels(x, y, 1, 1, GL_RED_INTEGER, GL_UNSIGNED_INT, ctypes.byref(pixel))
+    glBindFramebuffer(GL_FRAMEBUFFER, 0)
+    return pixel.value
+
+
+def measure(frame, frames: int) -> float:
+    times = []
+    for index in range(frames):
+        start = time.perf_counter()
+        frame(index)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--objects', type=int, nargs='+', default=[1_000, 10_000, 100_000, 300_000])
+    parser.add_argument('--size', type=int, nargs=2, default=[1280, 720], help="window size")
+    parser.add_argument('--radius', type=int, default=2, help="pick radius of the async picks")
+    parser.add_argument('--frames', type=int, default=30,
+                        help="frames per measurement, the median is reported")
+    args = parser.parse_args()
+    width, height = args.size
+
+    window = create_context()
+    frame_uniforms = FrameUniforms()
+    frame_uniforms.set_aspect(1.0)
+    frame_uniforms.update()
+    program = pick_program()
+    pick_buffer = PickBuffer(width, height)
+    glViewport(0, 0, width, height)
+    glEnable(GL_DEPTH_TEST)
+    rng = np.random.default_rng(0)
+
+    print(f"{'objects':>8} {'sync ms':>8} {'async ms':>9} {'late':>5} {'hits':>5} {'dropped':>8}")
+    for count in args.objects:
+        mesh = make_objects(count)
+
+        def draw():
+            program.use()
+            mesh.arm_for_drawing()
+            mesh.draw()
+
+        cursors = rng.integers((0, 0), (width, height), (args.frames, 2)).tolist()
+        draw()
+        glFinish()
+        sync = measure(lambda index: frame_sync(pick_buffer, draw, *cursors[index]), args.frames)
+
+        latencies = []
+        hits = 0
+
+        def frame_async(index):
+            nonlocal hits
+            result = pick_buffer.poll()
+            if result is not None:
+                latencies.append(pick_buffer.frame - result.frame)
+                hits += result.object_id != 0
+            if pick_buffer.begin(*cursors[index], args.radius):
+                draw()
+                pick_buffer.end()
+
+        dropped = pick_buffer.dropped
+        asynchronous = measure(frame_async, args.frames)
+        late = np.mean(latencies) if latencies else float('nan')
+        print(f"{count:>8} {sync:8.2f} {asynchronous:9.2f} {late:5.1f} {hits:>5} "
+              f"{pick_buffer.dropped - dropped:>8}")
+        glFinish()
+        pick_buffer.poll()
+        mesh.destroy()
+
+    pick_buffer.destroy()
+    program.destroy()
+    frame_uniforms.destroy()
+    window.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,407 @@
+''' The render paths compared by benchmarks.render_suite. Every path
+draws `size` small objects scattered over the viewport. The shader
+paths read the aspect ratio from the FrameBlock uniform buffer the suite
+creates with every context:
+
+ctypes_vbo      - 01_Triangle.py before gl3wxpyg.buffers: vertices are
+                  unpacked into a ctypes array, one VAO/VBO per triangle
+mesh            - the same triangles through gl3wxpyg.buffers.Mesh
+instanced       - the triangles as instances of one InstancedMesh, one
+                  draw call per frame
+pyglet_batch    - the triangles as vertex lists of one pyglet Batch,
+                  like examples/pyglet_graphics_example.py
+sub_data        - all triangles rewritten every frame with
+                  glBufferSubData into one GL_DYNAMIC_DRAW Mesh
+stream          - all triangles rewritten every frame through a
+                  gl3wxpyg.streaming.StreamMesh
+immediate_cube  - glBegin/glEnd cubes as drawn by CubeCanvas
+immediate_cone  - glBegin/glEnd cone fans as drawn by ConeCanvas
+
+The immediate paths need a compatibility profile and pyglet's debug_gl
+option turned off, glGetError is not allowed inside glBegin/glEnd.'''
+
+from abc import ABC, abstractmethod
+import os
+import time
+from math import pi, sin, cos
+
+import pyglet
+from pyglet.gl import GLfloat, GLuint, GL_ARRAY_BUFFER, GL_STATIC_DRAW, GL_DYNAMIC_DRAW, \
+    GL_FLOAT, GL_FALSE, GL_TRIANGLES, GL_VERTEX_SHADER, GL_FRAGMENT_SHADER, glGenVertexArrays, \
+    glBindVertexArray, glGenBuffers, glBindBuffer, glBufferData, glEnableVertexAttribArray, \
+    glVertexAttribPointer, glDrawArrays, glDeleteVertexArrays, glDeleteBuffers
+from pyglet.gl import gl_compat
+from pyglet.graphics.shader import Shader, ShaderProgram as PygletShaderProgram
+import numpy as np
+
+from gl3wxpyg.buffers import Mesh
+from gl3wxpyg.frame_uniforms import attach_frame_block
+from gl3wxpyg.instancing import InstancedMesh
+from gl3wxpyg.shaders import ShaderProgram, build_program, read_source
+from gl3wxpyg.streaming import StreamMesh
+
+SHADER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shaders')
+FLOAT_SIZE = 4
+# Objects are scaled down so a thousand of them still overlap little
+OBJECT_SCALE = 0.08
+TRIANGLE_CORNERS = np.array(((-0.5, -0.5, 0.0), (0.5, -0.5, 0.0), (0.0, 0.5, 0.0)), dtype=np.float32)
+
+
+def triangle_sources(vertex: str = "vertex.glsl") -> dict:
+    """
+        The shader sources of 01_Triangle.py.
+    """
+    return {
+        GL_VERTEX_SHADER: read_source(os.path.join(SHADER_DIR, vertex)),
+        GL_FRAGMENT_SHADER: read_source(os.path.join(SHADER_DIR, "fragment.glsl")),
+    }
+
+
+def scattered_triangles(size: int) -> np.ndarray:
+    """
+        Interleaved x, y, z, r, g, b vertices of size triangles, shape
+        (size, 18). The same seed is used every run.
+    """
+    rng = np.random.default_rng(0)
+    offsets = rng.uniform(-0.9, 0.9, (size, 1, 3)).astype(np.float32)
+    offsets[..., 2] = 0.0
+    positions = TRIANGLE_CORNERS * OBJECT_SCALE + offsets
+    colors = rng.random((size, 3, 3), dtype=np.float32)
+    return np.concatenate((positions, colors), axis=2).reshape(size, 18)
+
+
+def scattered_offsets(size: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    offsets = rng.uniform(-0.9, 0.9, (size, 3))
+    offsets[:, 2] = 0.0
+    return offsets
+
+
+class RenderPath(ABC):
+    """
+        One way of getting objects on screen. setup() creates the scene
+        once, draw() renders a frame of it.
+    """
+    name = ''
+    # Needs a core (True) or a compatibility (False) context
+    core = True
+
+    def __init__(self):
+        self.size = 0
+
+    def compile(self) -> float | None:
+        """
+            Build the shader program of the path.
+                Returns:
+                    Seconds spent until the program was linked, None
+                    for the fixed-function paths
+        """
+        return None
+
+    def setup(self, size: int) -> int:
+        """
+            Create size objects.
+                Returns:
+                    Bytes of vertex data uploaded
+        """
+        self.size = size
+        return 0
+
+    @abstractmethod
+    def draw(self) -> None:
+        """
+            Render one frame of the scene.
+        """
+
+    @property
+    def draw_calls(self) -> int:
+        """
+            Draw calls (or glBegin/glEnd pairs) issued per frame.
+        """
+        return self.size
+
+    @property
+    def frame_upload_bytes(self) -> int:
+        """
+            Vertex data sent to the driver on every frame.
+        """
+        return 0
+
+    def destroy(self) -> None:
+        pass
+
+
+class CtypesVBO(RenderPath):
+    name = 'ctypes_vbo'
+
+    def compile(self) -> float:
+        start = time.perf_counter()
+        self.program = ShaderProgram(build_program(triangle_sources()))
+        return time.perf_counter() - start
+
+    def setup(self, size: int) -> int:
+        super().setup(size)
+        self.vaos = []
+        self.vbos = []
+        for triangle in scattered_triangles(size):
+            # One way to convert the array to GLfloat
+            array_type = GLfloat * len(triangle)
+            vertices_gl = array_type(*triangle)
+            vao = GLuint(0)
+            glGenVertexArrays(1, vao)
+            glBindVertexArray(vao)
+            vbo = GLuint(0)
+            glGenBuffers(1, vbo)
+            glBindBuffer(GL_ARRAY_BUFFER, vbo)
+            glBufferData(GL_ARRAY_BUFFER, triangle.nbytes, vertices_gl, GL_STATIC_DRAW)
+            glEnableVertexAttribArray(0)
+            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 24, 0)
+            glEnableVertexAttribArray(1)
+            glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 24, 12)
+            self.vaos.append(vao)
+            self.vbos.append(vbo)
+        glBindVertexArray(0)
+        return size * 18 * FLOAT_SIZE
+
+    def draw(self) -> None:
+        self.program.use()
+        for vao in self.vaos:
+            glBindVertexArray(vao)
+            glDrawArrays(GL_TRIANGLES, 0, 3)
+
+    def destroy(self) -> None:
+        for vao, vbo in zip(self.vaos, self.vbos):
+            glDeleteVertexArrays(1, vao)
+            glDeleteBuffers(1, vbo)
+        self.program.destroy()
+
+
+class MeshPath(CtypesVBO):
+    name = 'mesh'
+
+    def setup(self, size: int) -> int:
+        self.size = size
+        self.meshes = [Mesh(triangle, ((0, 3), (1, 3))) for triangle in scattered_triangles(size)]
+        glBindVertexArray(0)
+        return size * 18 * FLOAT_SIZE
+
+    def draw(self) -> None:
+        self.program.use()
+        for mesh in self.meshes:
+            mesh.arm_for_drawing()
+            mesh.draw()
+
+    def destroy(self) -> None:
+        for mesh in self.meshes:
+            mesh.destroy()
+        self.program.destroy()
+
+
+class InstancedPath(RenderPath):
+    name = 'instanced'
+
+    def compile(self) -> float:
+        start = time.perf_counter()
+        self.program = ShaderProgram(build_program(triangle_sources("instanced_vertex.glsl")))
+        return time.perf_counter() - start
+
+    def setup(self, size: int) -> int:
+        super().setup(size)
+        # One white triangle, the instances move, scale and colour it
+        vertices = np.hstack((TRIANGLE_CORNERS, np.ones((3, 3), dtype=np.float32)))
+        self.mesh = InstancedMesh(vertices, ((0, 3), (1, 3)), capacity=size)
+        instances = self.mesh.instances
+        instances.resize(size)
+        instances['offset'][:] = scattered_offsets(size)
+        instances['scale'][:] = OBJECT_SCALE
+        instances['color'][:] = np.random.default_rng(0).random((size, 3))
+        instances.mark_dirty(0, size)
+        uploaded = instances.flush() * instances.stride + vertices.nbytes
+        glBindVertexArray(0)
+        return uploaded
+
+    def draw(self) -> None:
+        self.program.use()
+        self.mesh.arm_for_drawing()
+        self.mesh.draw()
+
+    @property
+    def draw_calls(self) -> int:
+        return 1 if self.size else 0
+
+    def destroy(self) -> None:
+        self.mesh.destroy()
+        self.program.destroy()
+
+
+class PygletBatch(RenderPath):
+    name = 'pyglet_batch'
+
+    def compile(self) -> float:
+        start = time.perf_counter()
+        sources = triangle_sources()
+        self.program = PygletShaderProgram(Shader(sources[GL_VERTEX_SHADER], 'vertex'),
+                                           Shader(sources[GL_FRAGMENT_SHADER], 'fragment'))
+        elapsed = time.perf_counter() - start
+        # pyglet assigns its own block bindings
+        attach_frame_block(self.program.id)
+        return elapsed
+
+    def setup(self, size: int) -> int:
+        super().setup(size)
+        self.batch = pyglet.graphics.Batch()
+        group = pyglet.graphics.ShaderGroup(program=self.program)
+        self.vertex_lists = []
+        for triangle in scattered_triangles(size):
+            triangle = triangle.reshape(3, 6)
+            self.vertex_lists.append(self.program.vertex_list(
+                3, GL_TRIANGLES, self.batch, group,
+                vertexPos=('f', triangle[:, :3].ravel()),
+                vertexColor=('f', triangle[:, 3:].ravel())))
+        # The first draw moves the data into the GL buffers
+        self.batch.draw()
+        return size * 18 * FLOAT_SIZE
+
+    def draw(self) -> None:
+        self.batch.draw()
+
+    @property
+    def draw_calls(self) -> int:
+        # The lists share one domain and are drawn together
+        return 1 if self.size else 0
+
+    def destroy(self) -> None:
+        for vertex_list in self.vertex_lists:
+            vertex_list.delete()
+        self.program.delete()
+
+
+class DynamicSubData(CtypesVBO):
+    name = 'sub_data'
+
+    def setup(self, size: int) -> int:
+        self.size = size
+        # Two versions of the scene, alternated like a changing preview
+        triangles = scattered_triangles(size)
+        self.frames = (triangles, triangles[::-1].copy())
+        self.frame = 0
+        self.create_mesh(size)
+        glBindVertexArray(0)
+        return 0
+
+    def create_mesh(self, size: int) -> None:
+        self.mesh = Mesh(self.frames[0], ((0, 3), (1, 3)), usage=GL_DYNAMIC_DRAW)
+
+    def update(self, vertices: np.ndarray) -> None:
+        self.mesh.update_vertices(vertices)
+
+    def draw(self) -> None:
+        self.frame ^= 1
+        self.update(self.frames[self.frame])
+        self.program.use()
+        self.mesh.arm_for_drawing()
+        self.mesh.draw()
+
+    @property
+    def draw_calls(self) -> int:
+        return 1 if self.size else 0
+
+    @property
+    def frame_upload_bytes(self) -> int:
+        return self.size * 18 * FLOAT_SIZE
+
+    def destroy(self) -> None:
+        self.mesh.destroy()
+        self.program.destroy()
+
+
+class DynamicStream(DynamicSubData):
+    name = 'stream'
+
+    def create_mesh(self, size: int) -> None:
+        self.mesh = StreamMesh(((0, 3), (1, 3)), max(size * 3, 1))
+
+    def update(self, vertices: np.ndarray) -> None:
+        self.mesh.update(vertices)
+
+
+class ImmediateCube(RenderPath):
+    name = 'immediate_cube'
+    core = False
+    # (normal, four corners) per face, the faces of CubeCanvas
+    FACES = (
+        ((0.0, 0.0, -1.0), ((-0.5, -0.5, -0.5), (-0.5, 0.5, -0.5), (0.5, 0.5, -0.5), (0.5, -0.5, -0.5))),
+        ((0.0, 1.0, 0.0), ((0.5, 0.5, 0.5), (0.5, 0.5, -0.5), (-0.5, 0.5, -0.5), (-0.5, 0.5, 0.5))),
+        ((0.0, -1.0, 0.0), ((-0.5, -0.5, -0.5), (0.5, -0.5, -0.5), (0.5, -0.5, 0.5), (-0.5, -0.5, 0.5))),
+        ((1.0, 0.0, 0.0), ((0.5, 0.5, 0.5), (0.5, -0.5, 0.5), (0.5, -0.5, -0.5), (0.5, 0.5, -0.5))),
+        ((-1.0, 0.0, 0.0), ((-0.5, -0.5, -0.5), (-0.5, -0.5, 0.5), (-0.5, 0.5, 0.5), (-0.5, 0.5, -0.5))),
+        ((0.0, 0.0, 1.0), ((0.5, 0.5, 0.5), (-0.5, 0.5, 0.5), (-0.5, -0.5, 0.5), (0.5, -0.5, 0.5))),
+    )
+    VERTICES = 24
+
+    def setup(self, size: int) -> int:
+        super().setup(size)
+        self.offsets = scattered_offsets(size).tolist()
+        gl_compat.glEnable(gl_compat.GL_LIGHTING)
+        gl_compat.glEnable(gl_compat.GL_LIGHT0)
+        return 0
+
+    def draw_object(self) -> None:
+        gl_compat.glBegin(gl_compat.GL_QUADS)
+        for normal, corners in self.FACES:
+            gl_compat.glNormal3f(*normal)
+            for corner in corners:
+                gl_compat.glVertex3f(*corner)
+        gl_compat.glEnd()
+
+    def draw(self) -> None:
+        gl_compat.glMatrixMode(gl_compat.GL_MODELVIEW)
+        for x, y, z in self.offsets:
+            gl_compat.glPushMatrix()
+            gl_compat.glTranslatef(x, y, z)
+            gl_compat.glScalef(OBJECT_SCALE, OBJECT_SCALE, OBJECT_SCALE)
+            gl_compat.glRotatef(30.0, 1.0, 0.0, 0.0)
+            gl_compat.glRotatef(30.0, 0.0, 1.0, 0.0)
+            self.draw_object()
+            gl_compat.glPopMatrix()
+
+    @property
+    def frame_upload_bytes(self) -> int:
+        # Position and normal of every vertex
+        return self.size * self.VERTICES * 6 * FLOAT_SIZE
+
+    def destroy(self) -> None:
+        gl_compat.glDisable(gl_compat.GL_LIGHTING)
+        gl_compat.glDisable(gl_compat.GL_LIGHT0)
+
+
+class ImmediateCone(ImmediateCube):
+    name = 'immediate_cone'
+    SLICES = 16
+    VERTICES = SLICES + 2
+
+    def setup(self, size: int) -> int:
+        super().setup(size)
+        # Open ended cone of ConeCanvas without glu
+        tau = pi * 2
+        self.rim = [(0.5 * cos(tau * i / self.SLICES), 0.5 * sin(tau * i / self.SLICES), 0.0)
+                    for i in range(self.SLICES + 1)]
+        return 0
+
+    def draw_object(self) -> None:
+        gl_compat.glBegin(gl_compat.GL_TRIANGLE_FAN)
+        gl_compat.glNormal3f(0.0, 0.0, 1.0)
+        gl_compat.glVertex3f(0.0, 0.0, 1.0)
+        for vertex in self.rim:
+            gl_compat.glVertex3f(*vertex)
+        gl_compat.glEnd()
+
+    @property
+    def frame_upload_bytes(self) -> int:
+        # Positions plus the single normal
+        return self.size * (self.VERTICES * 3 + 3) * FLOAT_SIZE
+
+
+RENDER_PATHS = {path.name: path for path in
+                (CtypesVBO, MeshPath, InstancedPath, PygletBatch, DynamicSubData, DynamicStream,
+                 ImmediateCube, ImmediateCone)}
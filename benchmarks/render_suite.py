@@ -0,0 +1,246 @@
+''' Rendering benchmark suite. Every render path of benchmarks.render_paths
+is run offscreen at increasing scene sizes, each in a fresh context, and
+measured for frame time, draw calls per second, upload bandwidth, shader
+compile time and startup time. Results are written as JSON and can be
+compared against a stored baseline; the exit code is 1 on a regression.
+
+Run from the repo root:
+    python -m benchmarks.render_suite --output results.json
+    python -m benchmarks.render_suite --baseline baseline.json --threshold frame_ms=5
+Without a display pyglet's EGL headless mode is used.'''
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+# Reproducible compile times: no driver shader cache (Mesa)
+os.environ.setdefault('MESA_SHADER_CACHE_DISABLE', 'true')
+
+from gl3wxpyg import options
+options.configure()
+import pyglet
+# Error checks after every call would dominate the timings
+pyglet.options['debug_gl'] = False
+from pyglet.gl import glViewport, glClear, glClearColor, glFinish, \
+    GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT, GL_RENDERER, GL_VERSION, GL_VENDOR
+import numpy as np
+
+from gl3wxpyg.frame_uniforms import FrameUniforms
+from gl3wxpyg.offscreen import create_context, Framebuffer
+from gl3wxpyg.shader_cache import gl_string
+from .render_paths import RENDER_PATHS
+
+SCHEMA_VERSION = 1
+# Metric name: True if higher is better
+METRICS = {
+    'frame_ms': False,
+    'draw_calls_per_s': True,
+    'upload_mb_per_s': True,
+    'compile_ms': False,
+    'startup_ms': False,
+}
+# Allowed change towards worse in percent before it counts as regression
+DEFAULT_THRESHOLDS = {
+    'frame_ms': 10.0,
+    'draw_calls_per_s': 10.0,
+    'upload_mb_per_s': 20.0,
+    'compile_ms': 25.0,
+    'startup_ms': 25.0,
+}
+
+
+def run_path(name: str, size: int, frames: int, warmup: int, resolution: tuple) -> dict:
+    """
+        Measure one render path at one scene size in a fresh context.
+            Returns:
+                The metrics, see METRICS
+    """
+    path = RENDER_PATHS[name]()
+    start = time.perf_counter()
+    window = create_context(core=path.core)
+    framebuffer = Framebuffer(*resolution)
+    glViewport(0, 0, *resolution)
+    glClearColor(96 / 255, 147 / 255, 172 / 255, 1)
+    # Aspect ratio 1 for the shader paths
+    frame_uniforms = FrameUniforms() if path.core else None
+
+    compile_s = path.compile()
+    upload_start = time.perf_counter()
+    uploaded = path.setup(size)
+    glFinish()
+    upload_s = time.perf_counter() - upload_start
+
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+    path.draw()
+    glFinish()
+    startup_s = time.perf_counter() - start
+
+    times = []
+    for frame in range(warmup + frames):
+        frame_start = time.perf_counter()
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        path.draw()
+        # Wait for the GPU, otherwise only the submission is measured
+        glFinish()
+        if frame >= warmup:
+            times.append(time.perf_counter() - frame_start)
+
+    frame_s = statistics.median(times)
+    if path.frame_upload_bytes:
+        # Immediate mode sends the vertices again on every frame
+        upload_rate = path.frame_upload_bytes / frame_s
+    else:
+        upload_rate = uploaded / upload_s if uploaded else 0.0
+    result = {
+        'path': name,
+        'size': size,
+        'frame_ms': frame_s * 1000,
+        'frame_p95_ms': float(np.percentile(times, 95)) * 1000,
+        'draw_calls': path.draw_calls,
+        'draw_calls_per_s': path.draw_calls / frame_s,
+        'upload_mb_per_s': upload_rate / 2**20,
+        'compile_ms': None if compile_s is None else compile_s * 1000,
+        'startup_ms': startup_s * 1000,
+    }
+
+    path.destroy()
+    if frame_uniforms:
+        frame_uniforms.destroy()
+    framebuffer.destroy()
+    window.close()
+    return result
+
+
+def environment() -> dict:
+    """
+        Describe the machine, results of different renderers should not
+        be compared. Needs a current context.
+    """
+    return {
+        'renderer': gl_string(GL_RENDERER),
+        'vendor': gl_string(GL_VENDOR),
+        'gl_version': gl_string(GL_VERSION),
+        'headless': bool(pyglet.options['headless']),
+        'python': platform.python_version(),
+        'pyglet': pyglet.version,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+    }
+
+
+def compare(results: dict, baseline: dict, thresholds: dict) -> list:
+    """
+        Compare the results against a baseline run.
+            Returns:
+                A list of (path, size, metric, baseline, current,
+                change in percent) for every regression
+    """
+    previous = {(entry['path'], entry['size']): entry for entry in baseline['results']}
+    regressions = []
+    for entry in results['results']:
+        old = previous.get((entry['path'], entry['size']))
+        if old is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            current, reference = entry.get(metric), old.get(metric)
+            if current is None or not reference:
+                continue
+            change = (current - reference) / reference * 100
+            worse = -change if higher_is_better else change
+            if worse > thresholds[metric]:
+                regressions.append((entry['path'], entry['size'], metric, reference, current, change))
+    return regressions
+
+
+def parse_thresholds(values: list) -> dict:
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for value in values:
+        metric, _, percent = value.partition('=')
+        if metric not in METRICS or not percent:
+            raise argparse.ArgumentTypeError(
+                f"Expected METRIC=PERCENT with one of {', '.join(METRICS)}, got {value!r}")
+        thresholds[metric] = float(percent)
+    return thresholds
+
+
+def print_results(results: dict) -> None:
+    print(f"{results['environment']['renderer']}, {results['environment']['gl_version']}")
+    print(f"{'path':<16} {'size':>6} {'frame ms':>9} {'p95 ms':>8} {'calls/s':>11} "
+          f"{'upload MiB/s':>13} {'compile ms':>11} {'startup ms':>11}")
+    for entry in results['results']:
+        compile_ms = '-' if entry['compile_ms'] is None else f"{entry['compile_ms']:.2f}"
+        print(f"{entry['path']:<16} {entry['size']:>6} {entry['frame_ms']:9.3f} "
+              f"{entry['frame_p95_ms']:8.3f} {entry['draw_calls_per_s']:11.0f} "
+              f"{entry['upload_mb_per_s']:13.1f} {compile_ms:>11} {entry['startup_ms']:11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--paths', nargs='+', choices=list(RENDER_PATHS), default=list(RENDER_PATHS),
+                        help="render paths to run")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000],
+                        help="number of objects per scene")
+    parser.add_argument('--frames', type=int, default=100, help="measured frames per run")
+    parser.add_argument('--warmup', type=int, default=10, help="frames drawn before measuring")
+    parser.add_argument('--resolution', type=int, nargs=2, default=[640, 480],
+                        metavar=('WIDTH', 'HEIGHT'), help="size of the render target")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against the results in this JSON file")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="write the results to the --baseline file instead of comparing")
+    parser.add_argument('--threshold', action='append', default=[], metavar='METRIC=PERCENT',
+                        help="allowed regression of a metric in percent, can be repeated. "
+                             f"Defaults: {DEFAULT_THRESHOLDS}")
+    args = parser.parse_args()
+    try:
+        thresholds = parse_thresholds(args.threshold)
+    except argparse.ArgumentTypeError as error:
+        parser.error(str(error))
+    if args.save_baseline and not args.baseline:
+        parser.error("--save-baseline needs --baseline")
+
+    window = create_context()
+    env = environment()
+    window.close()
+
+    results = {
+        'schema': SCHEMA_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': env,
+        'settings': {'frames': args.frames, 'warmup': args.warmup,
+                     'resolution': args.resolution},
+        'results': [run_path(name, size, args.frames, args.warmup, tuple(args.resolution))
+                    for name in args.paths for size in args.sizes],
+    }
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        return 0
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as file:
+        baseline = json.load(file)
+    if baseline['environment']['renderer'] != env['renderer']:
+        print(f"Warning: the baseline was recorded on {baseline['environment']['renderer']}")
+    regressions = compare(results, baseline, thresholds)
+    for path, size, metric, reference, current, change in regressions:
+        print(f"REGRESSION {path} size {size}: {metric} {reference:.3f} -> {current:.3f} "
+              f"({change:+.1f}%, limit {thresholds[metric]:.0f}%)")
+    if not regressions:
+        print("No regressions against the baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+''' Micro-benchmark for vertex uploads: the old ctypes array path
+from 01_Triangle.py against the zero-copy BufferObject path.
+Run from the repo root: python -m benchmarks.vertex_upload'''
+
+import argparse
+import time
+
+from gl3wxpyg import options
+options.configure()
+from pyglet.gl import GLfloat, GLuint, GL_ARRAY_BUFFER, GL_STATIC_DRAW, \
+    glGenBuffers, glBindBuffer, glBufferData, glDeleteBuffers, glFinish
+import numpy as np
+
+from gl3wxpyg.buffers import BufferObject
+from gl3wxpyg.offscreen import create_context
+
+FLOATS_PER_VERTEX = 6  # x, y, z, r, g, b
+
+
+def upload_ctypes(vertices: np.ndarray) -> float:
+    """
+        The original path: unpack every float into a ctypes array.
+    """
+    start = time.perf_counter()
+    array_type = GLfloat * len(vertices)
+    vertices_gl = array_type(*vertices)
+    vbo = GLuint(0)
+    glGenBuffers(1, vbo)
+    glBindBuffer(GL_ARRAY_BUFFER, vbo)
+    glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices_gl, GL_STATIC_DRAW)
+    glFinish()
+    elapsed = time.perf_counter() - start
+    glDeleteBuffers(1, vbo)
+    return elapsed
+
+
+def upload_pointer(vertices: np.ndarray) -> float:
+    """
+        The new path: hand the NumPy data pointer to the driver.
+    """
+    start = time.perf_counter()
+    vbo = BufferObject(GL_ARRAY_BUFFER, GL_STATIC_DRAW, vertices)
+    glFinish()
+    elapsed = time.perf_counter() - start
+    vbo.destroy()
+    return elapsed
+
+
+def best_of(func, vertices: np.ndarray, repeat: int) -> float:
+    return min(func(vertices) for _ in range(repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--counts', type=int, nargs='+',
+                        default=[1_000, 10_000, 100_000, 1_000_000],
+                        help="vertex counts to upload")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="runs per measurement, the best one is reported")
+    parser.add_argument('--max-ctypes', type=int, default=1_000_000,
+                        help="skip the slow ctypes path above this vertex count")
+    args = parser.parse_args()
+
+    window = create_context()
+    print(f"{'vertices':>10} {'MiB':>8} {'ctypes ms':>11} {'pointer ms':>11} {'speedup':>8}")
+    for count in args.counts:
+        vertices = np.random.default_rng(0).random(count * FLOATS_PER_VERTEX,
+                                                   dtype=np.float32)
+        new = best_of(upload_pointer, vertices, args.repeat)
+        if count <= args.max_ctypes:
+            old = best_of(upload_ctypes, vertices, args.repeat)
+            old_text = f"{old * 1000:11.3f}"
+            speedup = f"{old / new:7.1f}x"
+        else:
+            old_text, speedup = f"{'skipped':>11}", f"{'-':>8}"
+        print(f"{count:>10} {vertices.nbytes / 2**20:8.2f} {old_text} "
+              f"{new * 1000:11.3f} {speedup}")
+    window.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,7 @@
 
 from threading import Lock
 import logging
+import os
 import traceback
 import numpy
 import numpy.linalg
@@ -23,28 +24,31 @@ import wx
 from wx import glcanvas
 
 import pyglet
-pyglet.options['debug_gl'] = True
+from gl3wxpyg import options
+# GL3WXPYG_PROFILE=debug for driver diagnostics
+options.configure()
 
-from pyglet.gl import glEnable, glDisable, GL_LIGHTING, glLightfv, \
-    GL_LIGHT0, GL_LIGHT1, GL_LIGHT2, GL_POSITION, GL_DIFFUSE, \
-    GL_AMBIENT, GL_SPECULAR, GL_COLOR_MATERIAL, \
-    glShadeModel, GL_SMOOTH, GL_NORMALIZE, \
-    GL_BLEND, glBlendFunc, glClear, glClearColor, \
+from pyglet.gl import GL_BLEND, glClear, \
     glClearDepth, GL_COLOR_BUFFER_BIT, GL_CULL_FACE, \
-    GL_DEPTH_BUFFER_BIT, glDepthFunc, GL_DEPTH_TEST, \
-    GLdouble, glGetDoublev, glGetIntegerv, GLint, \
-    GL_LEQUAL, glLoadIdentity, glMatrixMode, GL_MODELVIEW, \
-    GL_MODELVIEW_MATRIX, GL_ONE_MINUS_SRC_ALPHA, glOrtho, \
-    GL_PROJECTION, GL_PROJECTION_MATRIX, glScalef, \
-    GL_SRC_ALPHA, glTranslatef, gluPerspective, gluUnProject, \
-    glViewport, GL_VIEWPORT, glPushMatrix, glPopMatrix, \
-    glBegin, glVertex2f, glVertex3f, glEnd, GL_LINE_LOOP, glColor3f, \
-    GL_LINE_STIPPLE, glColor4f, glLineStipple
+    GL_DEPTH_BUFFER_BIT, GL_DEPTH_TEST, GL_LEQUAL, \
+    GL_ONE_MINUS_SRC_ALPHA, GL_SRC_ALPHA, glViewport, \
+    GL_LINE_LOOP, GL_DYNAMIC_DRAW, GL_VERTEX_SHADER, GL_FRAGMENT_SHADER
 
 from pyglet import gl
+from pyglet.gl import GLdouble, gl_compat
 from .trackball import trackball, mulquat, axis_to_quat
-from .libtatlin.actors import vec
-from pyglet.gl.glu import gluOrtho2D
+from gl3wxpyg.gpu_profiler import GpuProfiler
+from gl3wxpyg.gl_state import GLState
+from gl3wxpyg.gl_debug import install_for_profile
+from gl3wxpyg.gl_trace import GLCallTracer
+from gl3wxpyg.camera import Camera, ortho, perspective, translation
+from gl3wxpyg.frame_uniforms import FrameUniforms
+from gl3wxpyg.shaders import ShaderProgram, build_program, read_source
+from gl3wxpyg.buffers import Mesh
+from gl3wxpyg.picking import PickBuffer
+
+SHADER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shaders')
+IDENTITY = numpy.eye(4)
 
 # When Subclassing wx.Window in Windows the focus goes to the wx.Window
 # instead of GLCanvas and it does not draw the focus rectangle and
@@ -61,6 +65,22 @@ class wxGLPanel(BASE_CLASS):
     orthographic = True
     color_background = (0.98, 0.98, 0.78, 1)
     do_lights = True
+    # Request a 3.3 core context. Subclasses still drawing with the
+    # fixed-function pipeline set this False: they get the driver's
+    # compatibility context, draw_objects() runs without a program and
+    # with the camera loaded into GL_PROJECTION and GL_MODELVIEW. The
+    # focus rectangle still needs GLSL 3.30 in that context
+    core_profile = True
+    # Time the render phases with GPU timer queries, see self.profiler
+    profile_gpu = False
+    # Count the GL calls of every frame, see self.gl_tracer. With a budget
+    # frames making more calls are logged
+    trace_gl_calls = False
+    gl_call_budget = None
+    # Find the object under the mouse with a GPU id pass, see pick_at().
+    # Results arrive a frame later in OnPick, picks pixels within the radius
+    pick_objects = False
+    pick_radius = 2
 
     def __init__(self, parent, pos = wx.DefaultPosition,
                  size = wx.DefaultSize, style = 0,
@@ -90,8 +110,19 @@ class wxGLPanel(BASE_CLASS):
             self.canvas = glcanvas.GLCanvas(self, wx.ID_ANY, attribList, pos, size, style)
 
         self.width = self.height = None
-
-        self.context = glcanvas.GLContext(self.canvas)
+        # Projection and modelview on the CPU, unprojecting mouse
+        # positions reads nothing back from GL
+        self.camera = Camera()
+
+        if self.core_profile:
+            cxt_attrs = glcanvas.GLContextAttrs()
+            cxt_attrs.PlatformDefaults().CoreProfile().MajorVersion(3).MinorVersion(3)
+            if options.profile() == 'debug':
+                cxt_attrs.DebugCtx()
+            cxt_attrs.EndList()
+            self.context = glcanvas.GLContext(self.canvas, ctxAttrs=cxt_attrs)
+        else:
+            self.context = glcanvas.GLContext(self.canvas)
 
         self.rot_lock = Lock()
         self.basequat = [0, 0, 0, 1]
@@ -175,6 +206,20 @@ class wxGLPanel(BASE_CLASS):
 
     def Destroy(self):
         # clean up the pyglet OpenGL context
+        self.profiler.destroy()
+        if self.gl_tracer:
+            self.gl_tracer.uninstall()
+            logging.info("GL calls per frame:\n" + self.gl_tracer.format_histogram())
+        if self.debug_output:
+            self.debug_output.destroy()
+        self.program.destroy()
+        self.overlay_program.destroy()
+        self.focus_mesh.destroy()
+        if self.pick_buffer:
+            self.pick_buffer.destroy()
+        if self.pick_program:
+            self.pick_program.destroy()
+        self.frame_uniforms.destroy()
         self.pygletcontext.destroy()
         # call the super method
         super().Destroy()
@@ -191,15 +236,49 @@ class wxGLPanel(BASE_CLASS):
         self.pygletcontext = gl.Context(gl.current_context)
         self.pygletcontext.canvas = self
         self.pygletcontext.set_current()
+        self.debug_output = install_for_profile()
+        self.profiler = GpuProfiler(enabled=self.profile_gpu)
+        self.gl_tracer = None
+        if self.trace_gl_calls:
+            self.gl_tracer = GLCallTracer(self.gl_call_budget)
+            self.gl_tracer.install()
+        # Capabilities, blend/depth functions and the clear colour go
+        # through it and calls that change nothing are skipped. Subclasses
+        # setting these directly must call self.gl_state.invalidate() after
+        self.gl_state = GLState()
+        # Camera matrices and viewport of every program, uploaded once per frame
+        self.frame_uniforms = FrameUniforms()
+        # Lit, vertex coloured geometry under the camera, see set_model()
+        self.program = ShaderProgram(build_program({
+            GL_VERTEX_SHADER: read_source(os.path.join(SHADER_DIR, "panel_vertex.glsl")),
+            GL_FRAGMENT_SHADER: read_source(os.path.join(SHADER_DIR, "panel_fragment.glsl")),
+        }))
+        # Lines in window coordinates, for the focus rectangle
+        self.overlay_program = ShaderProgram(build_program({
+            GL_VERTEX_SHADER: read_source(os.path.join(SHADER_DIR, "overlay_vertex.glsl")),
+            GL_FRAGMENT_SHADER: read_source(os.path.join(SHADER_DIR, "overlay_fragment.glsl")),
+        }))
+        self.focus_mesh = Mesh(numpy.zeros(8, dtype=numpy.float32), ((0, 2),),
+                               mode=GL_LINE_LOOP, usage=GL_DYNAMIC_DRAW)
+        self.focus_size = None
+        # Object ids instead of colours, see draw_pick_objects()
+        self.pick_program = None
+        self.pick_buffer = None
+        self.pick_request = None
+        self.hovered_object = 0
+        if self.pick_objects:
+            self.pick_program = ShaderProgram(build_program({
+                GL_VERTEX_SHADER: read_source(os.path.join(SHADER_DIR, "panel_vertex.glsl")),
+                GL_FRAGMENT_SHADER: read_source(os.path.join(SHADER_DIR, "pick_fragment.glsl")),
+            }, {'PICKING': 1}))
         # normal gl init
-        glClearColor(*self.color_background)
+        self.gl_state.clear_color(*self.color_background)
         glClearDepth(1.0)                # set depth value to 1
-        glDepthFunc(GL_LEQUAL)
-        glEnable(GL_COLOR_MATERIAL)
-        glEnable(GL_DEPTH_TEST)
-        glEnable(GL_CULL_FACE)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        self.gl_state.depth_func(GL_LEQUAL)
+        self.gl_state.enable(GL_DEPTH_TEST)
+        self.gl_state.enable(GL_CULL_FACE)
+        self.gl_state.enable(GL_BLEND)
+        self.gl_state.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
         if call_reshape:
             self.OnReshape()
 
@@ -215,15 +294,18 @@ class wxGLPanel(BASE_CLASS):
         self.OnInitGL(call_reshape = False)
         # print('glViewport', width)
         glViewport(0, 0, width, height)
-        glMatrixMode(GL_PROJECTION)
-        glLoadIdentity()
+        self.camera.set_viewport(width, height)
+        if self.pick_objects:
+            if self.pick_buffer is None:
+                self.pick_buffer = PickBuffer(width, height, max(self.pick_radius, 1))
+            else:
+                self.pick_buffer.resize(width, height)
         if self.orthographic:
-            glOrtho(-width / 2, width / 2, -height / 2, height / 2,
-                    -5 * self.dist, 5 * self.dist)
+            self.camera.set_projection(ortho(-width / 2, width / 2, -height / 2, height / 2,
+                                             -5 * self.dist, 5 * self.dist))
         else:
-            gluPerspective(60., float(width) / height, 10.0, 3 * self.dist)
-            glTranslatef(0, 0, -self.dist)  # Move back
-        glMatrixMode(GL_MODELVIEW)
+            self.camera.set_projection(perspective(60., float(width) / height, 10.0, 3 * self.dist)
+                                       @ translation(0, 0, -self.dist))  # Move back
 
         if not self.mview_initialized:
             self.reset_mview(0.9)
@@ -244,29 +326,71 @@ class wxGLPanel(BASE_CLASS):
             self.update_object_resize()
 
     def setup_lights(self):
+        '''Light uniforms of self.program, the lights are fixed in eye space'''
+        self.gl_state.use_program(self.program)
+        self.program['lit'] = self.do_lights
         if not self.do_lights:
             return
-        glEnable(GL_LIGHTING)
-        glDisable(GL_LIGHT0)
-        glLightfv(GL_LIGHT0, GL_AMBIENT, vec(0.4, 0.4, 0.4, 1.0))
-        glLightfv(GL_LIGHT0, GL_SPECULAR, vec(0, 0, 0, 0))
-        glLightfv(GL_LIGHT0, GL_DIFFUSE, vec(0, 0, 0, 0))
-        glEnable(GL_LIGHT1)
-        glLightfv(GL_LIGHT1, GL_AMBIENT, vec(0, 0, 0, 1.0))
-        glLightfv(GL_LIGHT1, GL_SPECULAR, vec(0.6, 0.6, 0.6, 1.0))
-        glLightfv(GL_LIGHT2, GL_DIFFUSE, vec(0.8, 0.8, 0.8, 1))
-        glLightfv(GL_LIGHT1, GL_POSITION, vec(1, 2, 3, 0))
-        glEnable(GL_LIGHT2)
-        glLightfv(GL_LIGHT2, GL_AMBIENT, vec(0, 0, 0, 1.0))
-        glLightfv(GL_LIGHT2, GL_SPECULAR, vec(0.6, 0.6, 0.6, 1.0))
-        glLightfv(GL_LIGHT2, GL_DIFFUSE, vec(0.8, 0.8, 0.8, 1))
-        glLightfv(GL_LIGHT2, GL_POSITION, vec(-1, -1, 3, 0))
-        glEnable(GL_NORMALIZE)
-        glShadeModel(GL_SMOOTH)
+        # What the former fixed-function setup lit with: global ambient
+        # 0.2, no specular material, GL_LIGHT1 without a diffuse colour
+        # and GL_LIGHT2 with 0.8
+        self.program['ambient'] = (0.2, 0.2, 0.2)
+        self.program['lightDirections'] = ((1, 2, 3), (-1, -1, 3))
+        self.program['lightDiffuse'] = ((0, 0, 0), (0.8, 0.8, 0.8))
+
+    def set_model(self, matrix = IDENTITY):
+        '''Transform what self.program draws next by a 4x4 model matrix
+        under the camera view, e.g. self.rotation_matrix()'''
+        self.gl_state.use_program(self.program)
+        modelview = self.camera.view @ matrix
+        self.program['model'] = numpy.asarray(matrix).T
+        # Column-major upload of the inverse transpose is the plain inverse
+        self.program['normalMatrix'] = numpy.linalg.inv(modelview[:3, :3])
+
+    def rotation_matrix(self):
+        '''The orbit or trackball rotation of self.basequat as a 4x4 model
+        matrix, what glMultMatrixd(build_rotmatrix(self.basequat)) did'''
+        with self.rot_lock:
+            x, y, z, w = self.basequat
+        return numpy.array((
+            (1 - 2 * (y * y + z * z), 2 * (x * y + z * w), 2 * (z * x - y * w), 0),
+            (2 * (x * y - z * w), 1 - 2 * (z * z + x * x), 2 * (y * z + x * w), 0),
+            (2 * (z * x + y * w), 2 * (y * z - x * w), 1 - 2 * (y * y + x * x), 0),
+            (0, 0, 0, 1)))
+
+    def set_pick_model(self, matrix = IDENTITY, id_base = 1):
+        '''Like set_model() for self.pick_program in draw_pick_objects().
+        The next draw writes id_base, instanced draws id_base + instance'''
+        self.gl_state.use_program(self.pick_program)
+        self.pick_program['model'] = numpy.asarray(matrix).T
+        self.pick_program['idBase'] = id_base
+
+    def pick_at(self, x, y):
+        '''Pick the object at a window position in framebuffer pixels,
+        e.g. from a motion handler. OnPick gets it after a later frame'''
+        self.pick_request = (int(x), int(self.height - y - 1))
+        self.Refresh(False)
+
+    def load_matrix_stack(self):
+        '''The camera as fixed-function matrices, no program or vertex
+        array bound, for subclasses drawing without shaders'''
+        self.gl_state.use_program(0)
+        self.gl_state.bind_vertex_array(0)
+        gl_compat.glMatrixMode(gl_compat.GL_PROJECTION)
+        gl_compat.glLoadMatrixd((GLdouble * 16)(*self.camera.projection.T.ravel()))
+        gl_compat.glMatrixMode(gl_compat.GL_MODELVIEW)
+        gl_compat.glLoadMatrixd((GLdouble * 16)(*self.camera.view.T.ravel()))
+
+    def update_frame_uniforms(self):
+        '''Upload the camera, only what changed since the last frame'''
+        camera = self.camera
+        self.frame_uniforms.set_projection(camera.projection.T)
+        self.frame_uniforms.set_view(camera.view.T)
+        self.frame_uniforms.set_viewport(self.width, self.height)
+        self.frame_uniforms.update()
 
     def reset_mview(self, factor):
-        glMatrixMode(GL_MODELVIEW)
-        glLoadIdentity()
+        self.camera.reset_view()
         self.setup_lights()
 
         wratio = self.width / self.dist
@@ -275,48 +399,70 @@ class wxGLPanel(BASE_CLASS):
         self.zoom_factor = 1.0
         self.zoomed_width = wratio / minratio
         self.zoomed_height = hratio / minratio
-        glScalef(factor * minratio, factor * minratio, 1)
+        self.camera.scale(factor * minratio, factor * minratio, 1)
 
     def DrawCanvas(self):
         """Draw the window."""
-        #import time
-        #start = time.perf_counter()
         # print('DrawCanvas', self.canvas.GetClientRect())
         self.pygletcontext.set_current()
-        glClearColor(*self.color_background)
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        self.draw_objects()
+        profiler = self.profiler
+        profiler.begin_frame()
+        if self.gl_tracer:
+            self.gl_tracer.begin_frame()
+        if self.pick_buffer:
+            # Copies of earlier frames that are done, never waits for them
+            result = self.pick_buffer.poll()
+            if result is not None:
+                self.OnPick(result)
+        with profiler.scope('DrawCanvas'):
+            with profiler.scope('clear'):
+                self.gl_state.clear_color(*self.color_background)
+                glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            # One upload for all programs instead of a matrix stack
+            self.update_frame_uniforms()
+            if self.core_profile:
+                self.set_model()
+            else:
+                self.load_matrix_stack()
+            with profiler.scope('draw_objects'):
+                self.draw_objects()
 
-        if self.canvas.HasFocus():
-            self.drawFocus()
+            if self.pick_buffer and self.pick_request:
+                with profiler.scope('pick'):
+                    self.drawPick()
+
+            if self.canvas.HasFocus():
+                with profiler.scope('drawFocus'):
+                    self.drawFocus()
         self.canvas.SwapBuffers()
-        #print('Draw took', '%.2f'%(time.perf_counter()-start))
+        if self.gl_tracer:
+            self.gl_tracer.end_frame()
+        profiler.end_frame()
+        if self.pick_buffer and self.pick_buffer.pending:
+            # Another frame to deliver the pick
+            wx.CallAfter(self.Refresh, False)
+
+    def drawPick(self):
+        x, y = self.pick_request
+        self.pick_request = None
+        # Only the pixels around the cursor are cleared and shaded
+        if self.pick_buffer.begin(x, y, self.pick_radius):
+            self.draw_pick_objects()
+            self.pick_buffer.end(0)
 
     def drawFocus(self):
-        glColor4f(0, 0, 0, 0.4)
-
-        glPushMatrix()
-        glLoadIdentity()
-
-        glMatrixMode(GL_PROJECTION)
-        glPushMatrix()
-        glLoadIdentity()
-        gluOrtho2D(0, self.width, 0, self.height)
-
-        glLineStipple(1, 0xf0f0)
-        glEnable(GL_LINE_STIPPLE)
-        glBegin(GL_LINE_LOOP)
-        glVertex2f(1, 0)
-        glVertex2f(self.width, 0)
-        glVertex2f(self.width, self.height-1)
-        glVertex2f(1, self.height-1)
-        glEnd()
-        glDisable(GL_LINE_STIPPLE)
-
-        glPopMatrix() # restore PROJECTION
-
-        glMatrixMode(GL_MODELVIEW)
-        glPopMatrix()
+        if self.focus_size != (self.width, self.height):
+            self.focus_size = (self.width, self.height)
+            self.focus_mesh.update_vertices((1, 0, self.width, 0,
+                                             self.width, self.height - 1, 1, self.height - 1))
+        self.gl_state.use_program(self.overlay_program)
+        self.overlay_program['lineColor'] = (0, 0, 0, 0.4)
+        # glLineStipple(1, 0xf0f0)
+        self.overlay_program['dash'] = 4.0
+        self.gl_state.disable(GL_DEPTH_TEST)
+        self.gl_state.bind_vertex_array(self.focus_mesh.vao)
+        self.focus_mesh.draw()
+        self.gl_state.enable(GL_DEPTH_TEST)
 
     # ==========================================================================
     # To be implemented by a sub class
@@ -333,13 +479,23 @@ class wxGLPanel(BASE_CLASS):
         '''called in the middle of ondraw after the buffer has been cleared'''
         pass
 
+    def draw_pick_objects(self):
+        '''called with pick_objects to draw the pickable objects again with
+        self.pick_program and their ids, see set_pick_model()'''
+        pass
+
+    def OnPick(self, result):
+        '''called with the gl3wxpyg.picking.PickResult of a pick_at(),
+        object_id 0 is the background'''
+        self.hovered_object = result.object_id
+
     # ==========================================================================
     # Utils
     # ==========================================================================
     def get_modelview_mat(self, local_transform):
-        mvmat = (GLdouble * 16)()
-        glGetDoublev(GL_MODELVIEW_MATRIX, mvmat)
-        return mvmat
+        '''The view as a 4x4 NumPy matrix, see gl3wxpyg.camera. Subclasses
+        apply their object transform to a copy for local_transform'''
+        return self.camera.view
 
     def mouse_to_3d(self, x, y, z = 1.0, local_transform = False):
         x = float(x)
@@ -348,35 +504,15 @@ class wxGLPanel(BASE_CLASS):
         # the bed
         # if self.orthographic:
         #    return (x - self.width / 2, y - self.height / 2, 0)
-        pmat = (GLdouble * 16)()
-        mvmat = self.get_modelview_mat(local_transform)
-        viewport = (GLint * 4)()
-        px = (GLdouble)()
-        py = (GLdouble)()
-        pz = (GLdouble)()
-        glGetIntegerv(GL_VIEWPORT, viewport)
-        glGetDoublev(GL_PROJECTION_MATRIX, pmat)
-        glGetDoublev(GL_MODELVIEW_MATRIX, mvmat)
-        gluUnProject(x, y, z, mvmat, pmat, viewport, px, py, pz)
-        return (px.value, py.value, pz.value)
+        point = self.camera.unproject((x, y, z), self.get_modelview_mat(local_transform))
+        return tuple(point)
 
     def mouse_to_ray(self, x, y, local_transform = False):
         x = float(x)
         y = self.height - float(y)
-        pmat = (GLdouble * 16)()
-        mvmat = (GLdouble * 16)()
-        viewport = (GLint * 4)()
-        px = (GLdouble)()
-        py = (GLdouble)()
-        pz = (GLdouble)()
-        glGetIntegerv(GL_VIEWPORT, viewport)
-        glGetDoublev(GL_PROJECTION_MATRIX, pmat)
-        mvmat = self.get_modelview_mat(local_transform)
-        gluUnProject(x, y, 1, mvmat, pmat, viewport, px, py, pz)
-        ray_far = (px.value, py.value, pz.value)
-        gluUnProject(x, y, 0., mvmat, pmat, viewport, px, py, pz)
-        ray_near = (px.value, py.value, pz.value)
-        return ray_near, ray_far
+        # Both ends in one unprojection
+        ray_near, ray_far = self.camera.rays((x, y), self.get_modelview_mat(local_transform))
+        return tuple(ray_near), tuple(ray_far)
 
     def mouse_to_plane(self, x, y, plane_normal, plane_offset, local_transform = False):
         # Ray/plane intersection
@@ -395,15 +531,14 @@ class wxGLPanel(BASE_CLASS):
         return ray_near + t * ray_dir
 
     def zoom(self, factor, to = None):
-        glMatrixMode(GL_MODELVIEW)
         if to:
             delta_x = to[0]
             delta_y = to[1]
-            glTranslatef(delta_x, delta_y, 0)
-        glScalef(factor, factor, 1)
+            self.camera.translate(delta_x, delta_y, 0)
+        self.camera.scale(factor, factor, 1)
         self.zoom_factor *= factor
         if to:
-            glTranslatef(-delta_x, -delta_y, 0)
+            self.camera.translate(-delta_x, -delta_y, 0)
         # For wxPython (<4.1) and GTK:
         # when you resize (enlarge) 3d view fast towards the log pane
         # sash garbage may remain in GLCanvas
@@ -455,9 +590,10 @@ class wxGLPanel(BASE_CLASS):
             p1 = self.initpos
             p2 = event.GetPosition() * content_scale_factor
             if self.orthographic:
-                x1, y1, _ = self.mouse_to_3d(p1[0], p1[1])
-                x2, y2, _ = self.mouse_to_3d(p2[0], p2[1])
-                glTranslatef(x2 - x1, y2 - y1, 0)
+                # Both positions in one unprojection, window y points down
+                (x1, y1, _), (x2, y2, _) = self.camera.unproject(
+                    ((p1[0], self.height - p1[1], 1.0), (p2[0], self.height - p2[1], 1.0)))
+                self.camera.translate(x2 - x1, y2 - y1, 0)
             else:
-                glTranslatef(p2[0] - p1[0], -(p2[1] - p1[1]), 0)
+                self.camera.translate(p2[0] - p1[0], -(p2[1] - p1[1]), 0)
             self.initpos = p2
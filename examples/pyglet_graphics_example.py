@@ -13,13 +13,18 @@ This example demonstrates:
  * Drawing simple 3D primitives using the pyglet.graphics API
  * Fixed-pipeline lighting
 """
-from math import pi, sin, cos
+import os
+import sys
 
 import pyglet
 from pyglet.gl import Config, GL_CULL_FACE, GL_DEPTH_TEST, \
                       GL_TRIANGLES, glClearColor, glEnable
 from pyglet.math import Mat4, Vec3
 
+# Make the gl3wxpyg package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gl3wxpyg.geometry import torus
+
 WINDOW_X = WINDOW_Y = 480
 COL_BG = (96, 147, 172)
 COL_TOR = (246, 120, 40)
@@ -69,42 +74,11 @@ def setup():
 
 def create_torus(radius, inner_radius, slices, inner_slices, shader, batch):
 
-    # Create the vertex and normal arrays.
-    vertices = []
-    normals = []
-
-    u_step = 2 * pi / (slices - 1)
-    v_step = 2 * pi / (inner_slices - 1)
-    u = 0.
-    for i in range(slices):
-        cos_u = cos(u)
-        sin_u = sin(u)
-        v = 0.
-        for j in range(inner_slices):
-            cos_v = cos(v)
-            sin_v = sin(v)
-
-            d = (radius + inner_radius * cos_v)
-            x = d * cos_u
-            y = d * sin_u
-            z = inner_radius * sin_v
-
-            nx = cos_u * cos_v
-            ny = sin_u * cos_v
-            nz = sin_v
-
-            vertices.extend([x, y, z])
-            normals.extend([nx, ny, nz])
-            v += v_step
-        u += u_step
-
-    # Create a list of triangle indices.
-    indices = []
-    for i in range(slices - 1):
-        for j in range(inner_slices - 1):
-            p = i * inner_slices + j
-            indices.extend([p, p + inner_slices, p + inner_slices + 1])
-            indices.extend([p, p + inner_slices + 1, p + 1])
+    # Vertices, normals and indices from NumPy instead of Python loops
+    geometry = torus(radius, inner_radius, slices, inner_slices)
+    vertices = geometry.positions.ravel()
+    normals = geometry.normals.ravel()
+    indices = geometry.indices
 
     # Create a Material and Group for the Model
     diffuse = [COL_TOR[0] / 255, COL_TOR[1] / 255, COL_TOR[2] / 255, 1.0]
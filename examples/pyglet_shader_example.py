@@ -1,7 +1,17 @@
+import os
+import random
+import sys
+
+import numpy as np
+import pyglet
 from pyglet.gl import *
 from pyglet.graphics import Group
 from pyglet.graphics.shader import Shader, ShaderProgram
 
+# Make the gl3wxpyg package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gl3wxpyg.atlas import TextureAtlas
+
 
 ###################################
 # Create a Window, and render Batch
@@ -9,7 +19,7 @@ from pyglet.graphics.shader import Shader, ShaderProgram
 window = pyglet.window.Window()
 batch = pyglet.graphics.Batch()
 
-label = pyglet.text.Label("A minimal shader to display a textured quad.", font_size=16, x=20, y=20, batch=batch)
+label = pyglet.text.Label("A minimal shader to display a textured quad and atlas icons.", font_size=16, x=20, y=20, batch=batch)
 
 
 
@@ -52,9 +62,23 @@ _fragment_source = """#version 330 core
     }
 """
 
+# The layer of an array texture is the third texture coordinate
+_array_fragment_source = """#version 330 core
+    in vec3 texture_coords;
+    out vec4 final_colors;
+
+    uniform sampler2DArray our_texture;
+
+    void main()
+    {
+        final_colors = texture(our_texture, texture_coords);
+    }
+"""
+
 vert_shader = Shader(_vertex_source, 'vertex')
 frag_shader = Shader(_fragment_source, 'fragment')
 shader_program = ShaderProgram(vert_shader, frag_shader)
+array_program = ShaderProgram(vert_shader, Shader(_array_fragment_source, 'fragment'))
 
 
 #####################################################
@@ -66,6 +90,9 @@ class RenderGroup(Group):
     RenderGroups are equal if their Texture and ShaderProgram
     are equal.
     """
+    # Sort key field of gl3wxpyg.draw_queue.DrawQueue
+    blend = True
+
     def __init__(self, texture, program, order=0, parent=None):
         """Create a RenderGroup.
 
@@ -82,6 +109,9 @@ class RenderGroup(Group):
         super().__init__(order, parent)
         self.texture = texture
         self.program = program
+        # Batches hash and compare groups a lot, build the key only once
+        self._key = (texture.target, texture.id, order, parent, program)
+        self._hash = hash(self._key)
 
     def set_state(self):
         glActiveTexture(GL_TEXTURE0)
@@ -94,15 +124,12 @@ class RenderGroup(Group):
         glDisable(GL_BLEND)
 
     def __hash__(self):
-        return hash((self.texture.target, self.texture.id, self.order, self.parent, self.program))
+        return self._hash
 
     def __eq__(self, other):
         return (self.__class__ is other.__class__ and
-                self.texture.target == other.texture.target and
-                self.texture.id == other.texture.id and
-                self.order == other.order and
-                self.program == other.program and
-                self.parent == other.parent)
+                self._hash == other._hash and
+                self._key == other._key)
 
 
 #########################################################
@@ -127,6 +154,43 @@ vertex_list = shader_program.vertex_list_indexed(4, GL_TRIANGLES, indices, batch
                                                  tex_coords=('f', tex.tex_coords))
 
 
+####################################################################
+# Pack many small images into one atlas, so all their quads share a
+# RenderGroup and the batch draws them with a single call
+####################################################################
+
+
+def create_icon(size, color):
+    """A filled circle of one colour on a transparent background"""
+    y, x = np.mgrid[:size, :size] + 0.5 - size / 2
+    icon = np.zeros((size, size, 4), dtype=np.uint8)
+    icon[..., :3] = color
+    icon[..., 3] = np.where(x * x + y * y <= (size / 2) ** 2, 255, 0)
+    return icon
+
+
+atlas = TextureAtlas(size=512, layers=4)
+regions = [atlas.add_image(pyglet.resource.image('pyglet.png'))]
+regions += [atlas.add(create_icon(random.choice((12, 16, 24)),
+                                  [random.randrange(256) for _ in range(3)]))
+            for _ in range(64)]
+
+icon_lists = []
+for _ in range(2000):
+    region = random.choice(regions[1:])
+    x, y = random.uniform(0, window.width), random.uniform(0, window.height)
+    icon_list = array_program.vertex_list_indexed(
+        4, GL_TRIANGLES, indices, batch, RenderGroup(region.page, array_program, order=-1),
+        position=('f', (x, y, x + region.width, y, x + region.width, y + region.height,
+                        x, y + region.height)),
+        tex_coords=('f', region.tex_coords))
+    icon_lists.append(icon_list)
+
+# Another image from the atlas, re-pointed to a region in place
+atlas.set_tex_coords(icon_lists[0], regions[0])
+icon_lists[0].position = create_quad(20, 300, regions[0])
+
+
 #####################
 # Enter the main loop
 #####################
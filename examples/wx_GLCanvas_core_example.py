@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+''' Retained-mode OpenGL 3.3 core profile port of CubeCanvas and
+ConeCanvas from wx_GLCanvas_example.py. The geometry is uploaded once
+into vertex array objects with index buffers and every object is drawn
+with a single call, the fixed-function lighting is done by a small GLSL
+shader. No glBegin/glEnd and no GLU quadric per frame.'''
+
+import os
+import sys
+from math import atan, degrees, radians
+
+import wx
+from wx import glcanvas
+import pyglet
+
+# Make the gl3wxpyg package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gl3wxpyg import options
+# GL3WXPYG_PROFILE=debug for driver diagnostics
+options.configure()
+from pyglet.gl import GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT, GL_DEPTH_TEST, \
+    GL_LESS, GL_BLEND, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_FRONT_AND_BACK, \
+    GL_LINE, GL_VERTEX_SHADER, GL_FRAGMENT_SHADER, GL_TEXTURE0, glClear, glEnable, \
+    glDepthFunc, glBlendFunc, glPolygonMode, glViewport, glActiveTexture
+from pyglet.math import Mat4, Vec3
+
+from gl3wxpyg.mesh_cache import MeshCache
+from gl3wxpyg.shaders import ShaderProgram, build_program, read_source
+from gl3wxpyg.textures import TextureLoader
+
+SHADER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shaders')
+TEXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pyglet.png')
+# glFrustum(-0.5, 0.5, -0.5, 0.5, 1.0, 3.0) of the original canvases
+FRUSTUM_FOV = degrees(2 * atan(0.5 / 1.0))
+
+
+class CoreCanvasBase(glcanvas.GLCanvas):
+    '''GLCanvas with a 3.3 core context handed to pyglet'''
+    def __init__(self, parent, mesh_cache: MeshCache):
+        disp_attrs = glcanvas.GLAttributes()
+        disp_attrs.PlatformDefaults().DoubleBuffer().Depth(24).EndList()
+        glcanvas.GLCanvas.__init__(self, parent, disp_attrs, -1)
+
+        cxt_attrs = glcanvas.GLContextAttrs()
+        cxt_attrs.PlatformDefaults().CoreProfile().MajorVersion(3).MinorVersion(3).EndList()
+        self.context = glcanvas.GLContext(self, ctxAttrs=cxt_attrs)
+        self.SetCurrent(self.context)
+        self.pyg_context = pyglet.gl.Context(pyglet.gl.current_context)
+        self.pyg_context.canvas = self
+        self.pyg_context.set_current()
+
+        self.init = False
+        self.mesh_cache = mesh_cache
+        self.program = None
+        self.mesh = None
+        self.aspect = 1.0
+
+        # Initial mouse position.
+        self.lastx = self.x = 30
+        self.lasty = self.y = 30
+        self.size = None
+        self.Bind(wx.EVT_ERASE_BACKGROUND, self.OnEraseBackground)
+        self.Bind(wx.EVT_SIZE, self.OnSize)
+        self.Bind(wx.EVT_PAINT, self.OnPaint)
+        self.Bind(wx.EVT_LEFT_DOWN, self.OnMouseDown)
+        self.Bind(wx.EVT_LEFT_UP, self.OnMouseUp)
+        self.Bind(wx.EVT_MOTION, self.OnMouseMotion)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.OnDestroy)
+
+    def OnEraseBackground(self, event):
+        pass  # Do nothing, to avoid flashing on MSW.
+
+    def OnSize(self, event):
+        wx.CallAfter(self.DoSetViewport)
+        event.Skip()
+
+    def DoSetViewport(self):
+        size = self.size = self.GetClientSize() * self.GetContentScaleFactor()
+        self.aspect = size.width / max(size.height, 1)
+        self.SetCurrent(self.context)
+        glViewport(0, 0, size.width, size.height)
+        self.Refresh(False)
+
+    def OnPaint(self, event):
+        # A paint DC has to be created in every EVT_PAINT handler, on MSW
+        # the window is repainted endlessly otherwise
+        wx.PaintDC(self)
+        self.SetCurrent(self.context)
+        if not self.init:
+            self.InitGL()
+            self.init = True
+        self.OnDraw()
+
+    def OnMouseDown(self, event):
+        if self.HasCapture():
+            self.ReleaseMouse()
+        self.CaptureMouse()
+        self.x, self.y = self.lastx, self.lasty = event.GetPosition()
+
+    def OnMouseUp(self, event):
+        if self.HasCapture():
+            self.ReleaseMouse()
+
+    def OnMouseMotion(self, event):
+        if event.Dragging() and event.LeftIsDown():
+            self.lastx, self.lasty = self.x, self.y
+            self.x, self.y = event.GetPosition()
+            self.OnRotate(self.x - self.lastx, self.y - self.lasty)
+            self.Refresh(False)
+
+    def OnDestroy(self, event):
+        if self.init:
+            self.SetCurrent(self.context)
+            # The mesh stays in the cache for the next canvas
+            self.mesh_cache.release(self.mesh)
+            self.program.destroy()
+            self.init = False
+        event.Skip()
+
+    def InitGL(self):
+        '''Build the lighting program shared by both canvases'''
+        self.program = ShaderProgram(build_program({
+            GL_VERTEX_SHADER: read_source(os.path.join(SHADER_DIR, "lit_vertex.glsl")),
+            GL_FRAGMENT_SHADER: read_source(os.path.join(SHADER_DIR, "lit_fragment.glsl")),
+        }))
+        glEnable(GL_DEPTH_TEST)
+
+    def projection(self) -> Mat4:
+        return Mat4.perspective_projection(self.aspect, z_near=1.0, z_far=3.0, fov=FRUSTUM_FOV)
+
+    def OnRotate(self, dx: int, dy: int):
+        '''Mouse drag by dx, dy pixels'''
+
+
+class CubeCanvas(CoreCanvasBase):
+    def InitGL(self):
+        super().InitGL()
+        # Decoded on a worker thread and uploaded over the next frames,
+        # the cube is drawn untextured until then
+        self.texture = None
+        self.texture_loader = TextureLoader()
+        self.texture_loader.load(TEXTURE_PATH, on_ready=self.OnTextureReady)
+        # Position viewer and object.
+        self.modelview = (Mat4.from_translation(Vec3(0.0, 0.0, -2.0))
+                          @ Mat4.from_rotation(radians(self.y), Vec3(1.0, 0.0, 0.0))
+                          @ Mat4.from_rotation(radians(self.x), Vec3(0.0, 1.0, 0.0)))
+        # Uploaded once per cache; vertex arrays belong to one context,
+        # so only canvases of this window's context could share it
+        self.mesh = self.mesh_cache.acquire('cube')
+        # GL_LIGHT0 defaults: white diffuse light along +z, no ambient
+        self.program.use()
+        self.program['lightDirection'] = (0.0, 0.0, 1.0)
+        self.program['ambient'] = (0.2 * 0.2, 0.2 * 0.2, 0.2 * 0.2)
+        self.program['diffuse'] = (0.8, 0.8, 0.8, 1.0)
+        self.program['diffuseMap'] = 0
+
+    def OnTextureReady(self, texture):
+        self.texture = texture
+        self.program.use()
+        self.program['textured'] = True
+
+    def OnDestroy(self, event):
+        if self.init:
+            self.SetCurrent(self.context)
+            self.texture_loader.destroy()
+            if self.texture:
+                self.texture.destroy()
+        super().OnDestroy(event)
+
+    def OnRotate(self, dx, dy):
+        w, h = self.size if self.size is not None else self.GetClientSize()
+        # 180 degrees per canvas width or height
+        x_angle = radians(180.0 * dx / max(w, 1))
+        y_angle = radians(180.0 * dy / max(h, 1))
+        self.modelview = (self.modelview
+                          @ Mat4.from_rotation(y_angle, Vec3(1.0, 0.0, 0.0))
+                          @ Mat4.from_rotation(x_angle, Vec3(0.0, 1.0, 0.0)))
+
+    def OnDraw(self):
+        # A slice of the texture per frame at most
+        self.texture_loader.poll()
+        # Clear color and depth buffers.
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        self.program.use()
+        # Unchanged uniforms are skipped
+        self.program['projection'] = self.projection()
+        self.program['modelview'] = self.modelview
+        if self.texture:
+            glActiveTexture(GL_TEXTURE0)
+            self.texture.bind()
+        self.mesh.arm_for_drawing()
+        self.mesh.draw()
+        self.SwapBuffers()
+        if self.texture_loader.pending:
+            # Keep drawing until the upload is done
+            wx.CallAfter(self.Refresh, False)
+
+
+class ConeCanvas(CoreCanvasBase):
+    def InitGL(self):
+        super().InitGL()
+        glDepthFunc(GL_LESS)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+        # Position viewer.
+        self.view = Mat4.from_translation(Vec3(0.0, 0.0, -2.0))
+        # Position object, fixed relative to the view
+        self.model = (Mat4.from_rotation(radians(30.0), Vec3(1.0, 0.0, 0.0))
+                      @ Mat4.from_rotation(radians(30.0), Vec3(0.0, 1.0, 0.0))
+                      @ Mat4.from_translation(Vec3(0.0, -1.0, 0.0))
+                      @ Mat4.from_rotation(radians(250.0), Vec3(1.0, 0.0, 0.0)))
+        # gluCylinder(quad, 0.5, 0.0, 1.0, 16, 16) without caps, uploaded once
+        self.mesh = self.mesh_cache.acquire('cone', radius=0.5, height=1.0, slices=16,
+                                            stacks=16, cap=False)
+        # Material and GL_LIGHT0 of the original: light at (1, 1, 1, 0),
+        # green light ambient plus 0.2 global ambient
+        material = (0.5, 0.5, 1.0)
+        self.program.use()
+        self.program['lightDirection'] = (1.0, 1.0, 1.0)
+        self.program['ambient'] = tuple(c * (0.2 + light)
+                                        for c, light in zip(material, (0.0, 1.0, 0.0)))
+        self.program['diffuse'] = (*material, 0.5)
+
+    def OnRotate(self, dx, dy):
+        self.view = (self.view
+                     @ Mat4.from_rotation(radians(dy), Vec3(0.0, 0.0, 1.0))
+                     @ Mat4.from_rotation(radians(dx), Vec3(1.0, 0.0, 0.0)))
+
+    def OnDraw(self):
+        # Clear color and depth buffers.
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        self.program.use()
+        self.program['projection'] = self.projection()
+        self.program['modelview'] = self.view @ self.model
+        self.mesh.arm_for_drawing()
+        self.mesh.draw()
+        # Push into visible buffer.
+        self.SwapBuffers()
+
+
+class OpenGLDemoWindow(wx.Frame):
+    def __init__(self, canvas_class, mesh_cache: MeshCache):
+        super().__init__(parent=None,
+                         title='OpenGL 3.3 core: ' + canvas_class.__name__,
+                         size=(480, 480))
+        topsizer = wx.BoxSizer(wx.VERTICAL)
+        canvas = canvas_class(self, mesh_cache)
+        topsizer.Add(canvas, 1, wx.EXPAND)
+
+        close_button = wx.Button(self, wx.ID_CLOSE)
+        topsizer.Add(close_button, 0, wx.ALL | wx.CENTER, 5)
+        close_button.Bind(wx.EVT_BUTTON, self.on_close)
+
+        self.SetSizer(topsizer)
+        self.Show(True)
+
+    def on_close(self, event):
+        self.Close()
+
+
+if __name__ == '__main__':
+    app = wx.App()
+    # Both windows have their own context, so they get their own cache
+    OpenGLDemoWindow(CubeCanvas, MeshCache())
+    OpenGLDemoWindow(ConeCanvas, MeshCache())
+    app.MainLoop()
@@ -0,0 +1,3 @@
+''' Reusable OpenGL 3.3 helpers for the wxPython + pyglet examples
+in this repo. Every module expects a current pyglet GL context
+before any of its objects are created.'''
@@ -0,0 +1,231 @@
+''' Texture atlases for many small images. Images are packed with a
+skyline bin packer into the layers of GL_TEXTURE_2D_ARRAY pages, so every
+image on a page shares one texture binding and quads using them can be
+drawn by one call. Regions provide texture coordinates with the layer
+index as third component, the layout of pyglet's Texture.tex_coords.'''
+
+from pyglet.gl import GLuint, GL_TEXTURE_2D_ARRAY, GL_RGBA8, GL_RGBA, GL_UNSIGNED_BYTE, \
+    GL_UNPACK_ALIGNMENT, GL_TEXTURE_MIN_FILTER, GL_TEXTURE_MAG_FILTER, GL_TEXTURE_WRAP_S, \
+    GL_TEXTURE_WRAP_T, GL_LINEAR, GL_CLAMP_TO_EDGE, glGenTextures, glBindTexture, \
+    glDeleteTextures, glTexImage3D, glTexSubImage3D, glTexParameteri, glPixelStorei
+import numpy as np
+
+
+class SkylinePacker:
+    """
+        Packs rectangles bottom-left first along a skyline of segments,
+        fast and with little waste for similar sized images.
+    """
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        # (x, y, width) segments covering the full width, left to right
+        self.skyline = [(0, 0, width)]
+        self.used_area = 0
+
+    def _fit(self, index: int, width: int, height: int) -> int | None:
+        x, y, _ = self.skyline[index]
+        if x + width > self.width:
+            return None
+        remaining = width
+        while remaining > 0:
+            y = max(y, self.skyline[index][1])
+            if y + height > self.height:
+                return None
+            remaining -= self.skyline[index][2]
+            index += 1
+        return y
+
+    def insert(self, width: int, height: int) -> tuple | None:
+        """
+            Find room for a width x height rectangle.
+                Returns:
+                    Its (x, y) corner, or None if it does not fit
+        """
+        best = None
+        for index, (x, _, _) in enumerate(self.skyline):
+            y = self._fit(index, width, height)
+            if y is not None and (best is None or (y + height, x) < (best[0], best[2])):
+                best = (y + height, index, x, y)
+        if best is None:
+            return None
+        top, index, x, y = best
+
+        # Raise the skyline under the rectangle
+        skyline = self.skyline
+        skyline.insert(index, (x, top, width))
+        right = x + width
+        next_index = index + 1
+        while next_index < len(skyline) and skyline[next_index][0] < right:
+            seg_x, seg_y, seg_width = skyline[next_index]
+            if seg_x + seg_width <= right:
+                del skyline[next_index]
+            else:
+                skyline[next_index] = (right, seg_y, seg_x + seg_width - right)
+                break
+        # Merge neighbours of equal height
+        merged = [skyline[0]]
+        for seg_x, seg_y, seg_width in skyline[1:]:
+            last_x, last_y, last_width = merged[-1]
+            if last_y == seg_y:
+                merged[-1] = (last_x, last_y, last_width + seg_width)
+            else:
+                merged.append((seg_x, seg_y, seg_width))
+        self.skyline = merged
+        self.used_area += width * height
+        return x, y
+
+
+class AtlasRegion:
+    """
+        Where an image ended up: page, layer and pixel rectangle, with
+        y counted from the bottom like OpenGL.
+    """
+    __slots__ = ('page', 'layer', 'x', 'y', 'width', 'height')
+
+    def __init__(self, page, layer: int, x: int, y: int, width: int, height: int):
+        self.page = page
+        self.layer = layer
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    @property
+    def tex_coords(self) -> tuple:
+        """
+            (u, v, layer) of the bottom-left, bottom-right, top-right and
+            top-left corner.
+        """
+        size = self.page.size
+        u0, v0 = self.x / size, self.y / size
+        u1, v1 = (self.x + self.width) / size, (self.y + self.height) / size
+        r = float(self.layer)
+        return (u0, v0, r, u1, v0, r, u1, v1, r, u0, v1, r)
+
+
+class AtlasPage:
+    """
+        One GL_TEXTURE_2D_ARRAY of square layers. It has the target and
+        id attributes of a pyglet texture, so groups comparing those
+        (e.g. RenderGroup) put all its images into one batch entry.
+    """
+    target = GL_TEXTURE_2D_ARRAY
+
+    def __init__(self, size: int, layers: int):
+        self.size = size
+        self.layers = layers
+        self.packers = [SkylinePacker(size, size) for _ in range(layers)]
+        self._id = GLuint(0)
+        glGenTextures(1, self._id)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self._id)
+        glTexImage3D(GL_TEXTURE_2D_ARRAY, 0, GL_RGBA8, size, size, layers, 0,
+                     GL_RGBA, GL_UNSIGNED_BYTE, None)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, 0)
+
+    @property
+    def id(self) -> int:
+        return self._id.value
+
+    def bind(self) -> None:
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self._id)
+
+    def allocate(self, width: int, height: int) -> tuple | None:
+        """
+            Reserve a rectangle on the first layer with room.
+                Returns:
+                    (layer, x, y) or None if the page is full
+        """
+        for layer, packer in enumerate(self.packers):
+            position = packer.insert(width, height)
+            if position is not None:
+                return (layer, *position)
+        return None
+
+    def upload(self, layer: int, x: int, y: int, pixels: np.ndarray) -> None:
+        height, width, _ = pixels.shape
+        # Rows go bottom up in OpenGL
+        data = np.ascontiguousarray(pixels[::-1])
+        self.bind()
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexSubImage3D(GL_TEXTURE_2D_ARRAY, 0, x, y, layer, width, height, 1,
+                        GL_RGBA, GL_UNSIGNED_BYTE, data.ctypes.data)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+
+    def destroy(self) -> None:
+        if self._id.value:
+            glDeleteTextures(1, self._id)
+            self._id = GLuint(0)
+
+
+class TextureAtlas:
+    """
+        Packs images into as few array texture pages as possible. A new
+        page is only started when all layers of the existing ones are
+        full.
+    """
+    def __init__(self, size: int = 1024, layers: int = 8, padding: int = 1):
+        """
+            Parameters:
+                size: width and height of a layer in pixels
+                layers: layers per page
+                padding: empty pixels around every image, keeps linear
+                         filtering from bleeding neighbours in
+        """
+        self.size = size
+        self.layers = layers
+        self.padding = padding
+        self.pages = []
+
+    def add(self, pixels: np.ndarray) -> AtlasRegion:
+        """
+            Pack an image and upload it.
+            Parameters:
+                pixels: (height, width, 4) uint8 RGBA, top row first
+            Returns:
+                The region of the image
+        """
+        pixels = np.asarray(pixels, dtype=np.uint8)
+        if pixels.ndim != 3 or pixels.shape[2] != 4:
+            raise ValueError(f"Expected (height, width, 4) RGBA pixels, got {pixels.shape}")
+        height, width, _ = pixels.shape
+        pad = self.padding
+        if width + 2 * pad > self.size or height + 2 * pad > self.size:
+            raise ValueError(f"Image of {width}x{height} does not fit into a "
+                             f"{self.size}x{self.size} atlas layer")
+
+        for page in self.pages:
+            slot = page.allocate(width + 2 * pad, height + 2 * pad)
+            if slot is not None:
+                break
+        else:
+            page = AtlasPage(self.size, self.layers)
+            self.pages.append(page)
+            slot = page.allocate(width + 2 * pad, height + 2 * pad)
+        layer, x, y = slot
+        page.upload(layer, x + pad, y + pad, pixels)
+        return AtlasRegion(page, layer, x + pad, y + pad, width, height)
+
+    def add_image(self, image) -> AtlasRegion:
+        """
+            Pack a pyglet image, e.g. from pyglet.image.load().
+        """
+        data = image.get_image_data().get_data('RGBA', -image.width * 4)
+        pixels = np.frombuffer(data, dtype=np.uint8).reshape(image.height, image.width, 4)
+        return self.add(pixels)
+
+    @staticmethod
+    def set_tex_coords(vertex_list, region: AtlasRegion, attribute: str = 'tex_coords') -> None:
+        """
+            Point the four vertices of a quad vertex list at a region.
+        """
+        setattr(vertex_list, attribute, region.tex_coords)
+
+    def destroy(self) -> None:
+        for page in self.pages:
+            page.destroy()
+        self.pages = []
@@ -0,0 +1,186 @@
+''' Buffer and mesh helpers that upload vertex data to the GPU
+without copying it through ctypes arrays first. Anything that
+supports the buffer protocol (NumPy arrays, bytes, memoryview,
+array.array, ...) is handed to OpenGL by its data pointer.'''
+
+from pyglet.gl import GLuint, GL_ARRAY_BUFFER, GL_ELEMENT_ARRAY_BUFFER, \
+    GL_STATIC_DRAW, GL_FLOAT, GL_FALSE, GL_TRIANGLES, GL_UNSIGNED_BYTE, \
+    GL_UNSIGNED_SHORT, GL_UNSIGNED_INT, glGenBuffers, glBindBuffer, \
+    glBufferData, glBufferSubData, glDeleteBuffers, glGenVertexArrays, \
+    glBindVertexArray, glDeleteVertexArrays, glEnableVertexAttribArray, \
+    glVertexAttribPointer, glDrawArrays, glDrawElements
+import numpy as np
+
+
+INDEX_TYPES = {
+    np.dtype(np.uint8): GL_UNSIGNED_BYTE,
+    np.dtype(np.uint16): GL_UNSIGNED_SHORT,
+    np.dtype(np.uint32): GL_UNSIGNED_INT,
+}
+
+
+def as_array(data) -> np.ndarray:
+    """
+        Return a C-contiguous NumPy view of any buffer-protocol object,
+        with the dtype of its format, e.g. uint32 for array.array('I').
+        Contiguous buffers are wrapped without copying; other sequences,
+        e.g. lists, are converted with np.asarray.
+    """
+    if isinstance(data, np.ndarray):
+        return np.ascontiguousarray(data)
+    try:
+        view = memoryview(data)
+    except TypeError:
+        return np.ascontiguousarray(np.asarray(data))
+    return np.ascontiguousarray(np.asarray(view))
+
+
+class BufferObject:
+    """
+        A single OpenGL buffer object (VBO, IBO, UBO, ...).
+    """
+    def __init__(self, target: int = GL_ARRAY_BUFFER, usage: int = GL_STATIC_DRAW,
+                 data=None, size: int = 0):
+        """
+            Create the buffer and optionally fill it.
+            Parameters:
+                target: buffer binding target, e.g. GL_ARRAY_BUFFER
+                usage: usage hint passed to glBufferData
+                data: initial content, any buffer-protocol object
+                size: bytes to allocate if no data is given
+        """
+        self.target = target
+        self.usage = usage
+        self.nbytes = 0
+        self.id = GLuint(0)
+        glGenBuffers(1, self.id)
+        if data is not None:
+            self.set_data(data)
+        elif size:
+            self.allocate(size)
+
+    def bind(self) -> None:
+        """
+            Bind the buffer to its target.
+        """
+        glBindBuffer(self.target, self.id)
+
+    def allocate(self, size: int) -> None:
+        """
+            (Re)allocate the storage with undefined content.
+        """
+        self.bind()
+        glBufferData(self.target, size, None, self.usage)
+        self.nbytes = size
+
+    def set_data(self, data) -> None:
+        """
+            Replace the storage with the content of data. The data
+            pointer goes straight to the driver, nothing is copied
+            on the Python side.
+        """
+        array = as_array(data)
+        self.bind()
+        glBufferData(self.target, array.nbytes, array.ctypes.data, self.usage)
+        self.nbytes = array.nbytes
+
+    def set_sub_data(self, data, offset: int = 0) -> None:
+        """
+            Overwrite a range of the buffer starting at offset (bytes).
+        """
+        array = as_array(data)
+        if offset < 0 or offset + array.nbytes > self.nbytes:
+            raise ValueError(f"Range {offset}:{offset + array.nbytes} is outside "
+                             f"of the buffer ({self.nbytes} bytes)")
+        self.bind()
+        glBufferSubData(self.target, offset, array.nbytes, array.ctypes.data)
+
+    def destroy(self) -> None:
+        """
+            Free the buffer on the GPU.
+        """
+        if self.id.value:
+            glDeleteBuffers(1, self.id)
+            self.id = GLuint(0)
+            self.nbytes = 0
+
+
+class Mesh:
+    """
+        A vertex array object with one interleaved float32 vertex
+        buffer and an optional index buffer.
+    """
+    def __init__(self, vertices, attributes, indices=None,
+                 mode: int = GL_TRIANGLES, usage: int = GL_STATIC_DRAW):
+        """
+            Upload the vertices and describe their layout.
+            Parameters:
+                vertices: interleaved float32 vertex data, any shape
+                attributes: sequence of (location, components) in the
+                            order they are interleaved in a vertex
+                indices: optional unsigned integer index data
+                mode: primitive type used by draw()
+                usage: usage hint for the vertex buffer
+        """
+        vertices = np.asarray(vertices, dtype=np.float32)
+        components = sum(count for _, count in attributes)
+        self.stride = components * vertices.itemsize
+        self.vertex_count = vertices.size // components
+        self.mode = mode
+
+        # Vertex array object
+        self.vao = GLuint(0)
+        glGenVertexArrays(1, self.vao)
+        glBindVertexArray(self.vao)
+        # Vertex buffer object
+        self.vbo = BufferObject(GL_ARRAY_BUFFER, usage, vertices)
+
+        offset = 0
+        for location, count in attributes:
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, count, GL_FLOAT, GL_FALSE, self.stride, offset)
+            offset += count * vertices.itemsize
+
+        # Index buffer, the binding is stored in the VAO
+        self.ibo = None
+        self.index_count = 0
+        self.index_type = None
+        if indices is not None:
+            indices = as_array(indices)
+            if indices.dtype not in INDEX_TYPES:
+                indices = indices.astype(np.uint32)
+            self.ibo = BufferObject(GL_ELEMENT_ARRAY_BUFFER, usage, indices)
+            self.index_count = indices.size
+            self.index_type = INDEX_TYPES[indices.dtype]
+
+        glBindVertexArray(0)
+
+    def update_vertices(self, vertices, first: int = 0) -> None:
+        """
+            Overwrite vertices starting at vertex index first.
+        """
+        self.vbo.set_sub_data(np.asarray(vertices, dtype=np.float32), first * self.stride)
+
+    def arm_for_drawing(self) -> None:
+        """
+            Arm the mesh for drawing.
+        """
+        glBindVertexArray(self.vao)
+
+    def draw(self) -> None:
+        """
+            Draw the mesh. This is the actual drawcall
+        """
+        if self.ibo is not None:
+            glDrawElements(self.mode, self.index_count, self.index_type, 0)
+        else:
+            glDrawArrays(self.mode, 0, self.vertex_count)
+
+    def destroy(self) -> None:
+        """
+            Free any allocated memory.
+        """
+        glDeleteVertexArrays(1, self.vao)
+        self.vbo.destroy()
+        if self.ibo is not None:
+            self.ibo.destroy()
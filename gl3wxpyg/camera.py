@@ -0,0 +1,168 @@
+''' Projection and view matrices kept on the CPU in NumPy. The GL way of
+unprojecting a mouse position reads the viewport and both matrices back
+from the driver, which waits for all queued commands, and then calls
+gluUnProject once per point. Camera holds the matrices itself, caches
+their product and its inverse until one of them changes, and unprojects
+any number of points with one matrix product.
+
+Matrices are float64 4x4 arrays for column vectors, as in OpenGL, so a
+point transforms as projection @ view @ point. Pass matrix.T.ravel() to
+anything that expects OpenGL's column-major order.'''
+
+import math
+
+import numpy as np
+
+
+def translation(x: float, y: float, z: float) -> np.ndarray:
+    matrix = np.eye(4)
+    matrix[:3, 3] = (x, y, z)
+    return matrix
+
+
+def scaling(x: float, y: float, z: float) -> np.ndarray:
+    return np.diag((x, y, z, 1.0))
+
+
+def ortho(left: float, right: float, bottom: float, top: float,
+          near: float, far: float) -> np.ndarray:
+    """
+        The matrix of glOrtho.
+    """
+    matrix = np.eye(4)
+    matrix[0, 0] = 2 / (right - left)
+    matrix[1, 1] = 2 / (top - bottom)
+    matrix[2, 2] = -2 / (far - near)
+    matrix[:3, 3] = (-(right + left) / (right - left), -(top + bottom) / (top - bottom),
+                     -(far + near) / (far - near))
+    return matrix
+
+
+def perspective(fovy: float, aspect: float, near: float, far: float) -> np.ndarray:
+    """
+        The matrix of gluPerspective.
+            Parameters:
+                fovy: vertical field of view in degrees
+    """
+    f = 1 / math.tan(math.radians(fovy) / 2)
+    matrix = np.zeros((4, 4))
+    matrix[0, 0] = f / aspect
+    matrix[1, 1] = f
+    matrix[2, 2] = (far + near) / (near - far)
+    matrix[2, 3] = 2 * far * near / (near - far)
+    matrix[3, 2] = -1
+    return matrix
+
+
+class Camera:
+    """
+        Viewport, projection and view of one canvas. The view changes
+        like the GL modelview matrix: translate() and scale() multiply
+        on the right, as glTranslate and glScale do.
+    """
+    def __init__(self, width: int = 1, height: int = 1):
+        self.viewport = (0, 0, width, height)
+        self._projection = np.eye(4)
+        self._view = np.eye(4)
+        self._view_projection = None
+        self._inverse = None
+        # Bumped on every change, e.g. to upload the matrices only then
+        self.version = 0
+
+    def _changed(self) -> None:
+        self._view_projection = None
+        self._inverse = None
+        self.version += 1
+
+    @property
+    def projection(self) -> np.ndarray:
+        """
+            Read only, change it through set_projection().
+        """
+        return self._projection
+
+    @property
+    def view(self) -> np.ndarray:
+        """
+            Read only, change it through set_view() or the view operations.
+        """
+        return self._view
+
+    def set_viewport(self, width: int, height: int, x: int = 0, y: int = 0) -> None:
+        self.viewport = (x, y, width, height)
+
+    def set_projection(self, matrix: np.ndarray) -> None:
+        self._projection = np.array(matrix, dtype=np.float64).reshape(4, 4)
+        self._changed()
+
+    def set_view(self, matrix: np.ndarray) -> None:
+        self._view = np.array(matrix, dtype=np.float64).reshape(4, 4)
+        self._changed()
+
+    def reset_view(self) -> None:
+        self.set_view(np.eye(4))
+
+    def translate(self, x: float, y: float, z: float) -> None:
+        self._view = self._view @ translation(x, y, z)
+        self._changed()
+
+    def scale(self, x: float, y: float, z: float) -> None:
+        self._view = self._view @ scaling(x, y, z)
+        self._changed()
+
+    @property
+    def view_projection(self) -> np.ndarray:
+        if self._view_projection is None:
+            self._view_projection = self._projection @ self._view
+        return self._view_projection
+
+    @property
+    def inverse_view_projection(self) -> np.ndarray:
+        if self._inverse is None:
+            self._inverse = np.linalg.inv(self.view_projection)
+        return self._inverse
+
+    def unproject(self, points, view: np.ndarray | None = None) -> np.ndarray:
+        """
+            Window coordinates to world coordinates, gluUnProject for an
+            array of points at once.
+            Parameters:
+                points: (x, y, depth) or an (n, 3) array of them, y up
+                        from the bottom of the viewport and depth 0 at the
+                        near and 1 at the far plane
+                view: a view matrix to use instead of the camera's, e.g.
+                      with an object's model transform applied. Only the
+                      inverse of the camera's own view is cached
+            Returns:
+                The points as a float64 array of the same shape
+        """
+        points = np.asarray(points, dtype=np.float64)
+        if view is None or view is self._view:
+            inverse = self.inverse_view_projection
+        else:
+            inverse = np.linalg.inv(self._projection @ view)
+        x, y, width, height = self.viewport
+        ndc = np.empty(points.shape[:-1] + (4,))
+        ndc[..., 0] = (points[..., 0] - x) / width * 2 - 1
+        ndc[..., 1] = (points[..., 1] - y) / height * 2 - 1
+        ndc[..., 2] = points[..., 2] * 2 - 1
+        ndc[..., 3] = 1
+        world = ndc @ inverse.T
+        return world[..., :3] / world[..., 3:]
+
+    def rays(self, points, view: np.ndarray | None = None) -> tuple:
+        """
+            The near and far points under window positions.
+            Parameters:
+                points: (x, y) or an (n, 2) array of them, see unproject()
+            Returns:
+                The near and far points, each shaped like the input with 3
+                coordinates
+        """
+        points = np.asarray(points, dtype=np.float64)
+        ends = np.empty(points.shape[:-1] + (2, 3))
+        ends[..., :2] = points[..., None, :]
+        ends[..., 0, 2] = 0.0
+        ends[..., 1, 2] = 1.0
+        world = self.unproject(ends, view)
+        return world[..., 0, :], world[..., 1, :]
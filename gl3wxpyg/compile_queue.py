@@ -0,0 +1,264 @@
+''' Deferred shader compilation. All stages and programs are submitted
+up front and their status is polled later, so the driver can build them
+in the background (GL_KHR_parallel_shader_compile) while the UI keeps
+running. Programs become usable one by one as they finish.'''
+
+import logging
+
+from pyglet.gl import GLint, GLuint, gl_info, glGetShaderiv, glGetProgramiv, \
+    glDeleteShader, glDeleteProgram
+from pyglet.gl.lib import link_GL
+from pyglet.graphics.shader import ShaderException
+
+from .shaders import ShaderProgram, apply_defines, start_compile, check_compile, \
+    start_link, check_link
+
+log = logging.getLogger(__name__)
+
+# Not part of the pyglet headers
+GL_COMPLETION_STATUS_KHR = 0x91B1
+# Extension: its glMaxShaderCompilerThreads entry point
+PARALLEL_EXTENSIONS = {
+    'GL_KHR_parallel_shader_compile': 'glMaxShaderCompilerThreadsKHR',
+    'GL_ARB_parallel_shader_compile': 'glMaxShaderCompilerThreadsARB',
+}
+
+
+class PendingProgram:
+    """
+        A program that was submitted to a CompileQueue.
+    """
+    COMPILING = 'compiling'
+    LINKING = 'linking'
+    READY = 'ready'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, name: str, sources: dict, defines: dict | None, on_ready=None,
+                 compiled: dict | None = None, keep_shaders: bool = False):
+        self.name = name
+        self.sources = sources
+        self.defines = defines
+        self.on_ready = on_ready
+        self.compiled = compiled or {}
+        self.keep_shaders = keep_shaders
+        self.state = self.COMPILING
+        self.program = None
+        self.error = None
+        self.cache_key = None
+        # Shader objects compiled for this program, {shader type: id}
+        self.shaders = {}
+        self._program_id = 0
+
+    @property
+    def done(self) -> bool:
+        return self.state in (self.READY, self.FAILED, self.CANCELLED)
+
+    def __repr__(self):
+        return f"PendingProgram({self.name!r}, {self.state})"
+
+
+class CompileQueue:
+    """
+        Submits shader stages and programs without waiting for them and
+        finishes them from poll(). Without the parallel compile extension
+        the status queries block, so only a limited number of programs
+        are advanced per poll to keep every call short.
+    """
+    def __init__(self, cache=None, blocking_per_poll: int = 1):
+        """
+            Parameters:
+                cache: optional ProgramBinaryCache, cached programs are
+                       ready right after submit()
+                blocking_per_poll: how many programs may be finished per
+                                   poll() when status queries block
+        """
+        self.cache = cache
+        self.blocking_per_poll = blocking_per_poll
+        self.programs = {}
+        self._pending = []
+
+        extension = next((ext for ext in PARALLEL_EXTENSIONS if gl_info.have_extension(ext)), None)
+        self.parallel = extension is not None
+        if self.parallel:
+            # Let the driver pick the number of compiler threads
+            max_threads = link_GL(PARALLEL_EXTENSIONS[extension], None, [GLuint])
+            max_threads(0xFFFFFFFF)
+
+    @property
+    def pending(self) -> int:
+        """
+            Number of programs that are not finished yet.
+        """
+        return len(self._pending)
+
+    def get(self, name: str) -> ShaderProgram | None:
+        """
+            The linked program for name, None while it is still building.
+        """
+        return self.programs.get(name)
+
+    def submit(self, name: str, sources: dict, defines: dict | None = None,
+               on_ready=None, compiled: dict | None = None,
+               keep_shaders: bool = False) -> PendingProgram:
+        """
+            Start compiling every stage of a program. Nothing waits for
+            the driver here. A program that is submitted again under the
+            same name replaces the old one once it has linked, a failed
+            build leaves the old one in place. An unfinished older build
+            of the same name is cancelled.
+            Parameters:
+                name: key under which the program is found by get()
+                sources: {shader type: source code}
+                defines: optional {name: value} inserted after #version
+                on_ready: optional callable, called with the ShaderProgram
+                          once it is linked
+                compiled: {shader type: id} of already compiled stages to
+                          link in, they stay owned by the caller
+                keep_shaders: hand the freshly compiled shader objects to
+                              the caller in PendingProgram.shaders instead
+                              of deleting them after linking
+        """
+        for older in [p for p in self._pending if p.name == name]:
+            self._cancel(older)
+
+        pending = PendingProgram(name, sources, defines, on_ready, compiled, keep_shaders)
+        # The binary cache only helps if no shader objects are needed
+        use_cache = (self.cache is not None and self.cache.supported
+                     and not compiled and not keep_shaders)
+        if use_cache:
+            pending.cache_key, program_id = self.cache.lookup(sources, defines)
+            if program_id is not None:
+                self._finish(pending, program_id)
+                return pending
+
+        for shader_type, source in sources.items():
+            pending.shaders[shader_type] = start_compile(apply_defines(source, defines),
+                                                         shader_type)
+        self._pending.append(pending)
+        return pending
+
+    def _completed(self, object_id: int, get_iv) -> bool:
+        """
+            Ask the driver if a shader/program is done without blocking.
+        """
+        if not self.parallel:
+            return True
+        status = GLint(0)
+        get_iv(object_id, GL_COMPLETION_STATUS_KHR, status)
+        return bool(status.value)
+
+    def _advance(self, pending: PendingProgram) -> bool:
+        """
+            Move a program on as far as possible.
+            Returns:
+                True if a status had to be queried
+        """
+        if pending.state == PendingProgram.COMPILING:
+            if not all(self._completed(shader_id, glGetShaderiv)
+                       for shader_id in pending.shaders.values()):
+                return False
+            for shader_type, shader_id in list(pending.shaders.items()):
+                try:
+                    check_compile(shader_id, shader_type)
+                except ShaderException as err:
+                    # check_compile already deleted the failed shader
+                    del pending.shaders[shader_type]
+                    self._fail(pending, err)
+                    return True
+            shader_ids = [*pending.compiled.values(), *pending.shaders.values()]
+            pending._program_id = start_link(shader_ids,
+                                             retrievable=pending.cache_key is not None)
+            if not pending.keep_shaders:
+                self._delete_shaders(pending)
+            pending.state = PendingProgram.LINKING
+            if self.parallel:
+                return True
+
+        if pending.state == PendingProgram.LINKING:
+            if not self._completed(pending._program_id, glGetProgramiv):
+                return False
+            try:
+                check_link(pending._program_id)
+            except ShaderException as err:
+                pending._program_id = 0
+                self._fail(pending, err)
+                return True
+            if pending.cache_key is not None:
+                self.cache.store(pending.cache_key, pending._program_id)
+            self._finish(pending, pending._program_id)
+        return True
+
+    def _finish(self, pending: PendingProgram, program_id: int) -> None:
+        pending.program = ShaderProgram(program_id)
+        pending.state = PendingProgram.READY
+        # Swap in one step, get() never sees a half built program
+        old = self.programs.get(pending.name)
+        self.programs[pending.name] = pending.program
+        if old is not None:
+            old.destroy()
+        if pending.on_ready is not None:
+            pending.on_ready(pending.program)
+
+    def _fail(self, pending: PendingProgram, error: ShaderException) -> None:
+        self._delete_shaders(pending)
+        pending.error = error
+        pending.state = PendingProgram.FAILED
+        log.error("Shader program '%s': %s", pending.name, error)
+
+    def _cancel(self, pending: PendingProgram) -> None:
+        self._delete_shaders(pending)
+        if pending._program_id:
+            glDeleteProgram(pending._program_id)
+            pending._program_id = 0
+        pending.state = PendingProgram.CANCELLED
+        self._pending.remove(pending)
+
+    @staticmethod
+    def _delete_shaders(pending: PendingProgram) -> None:
+        # Only the stages compiled by the queue, never pending.compiled
+        for shader_id in pending.shaders.values():
+            glDeleteShader(shader_id)
+        pending.shaders.clear()
+
+    def poll(self) -> list:
+        """
+            Finish whatever the driver has completed. Call this once per
+            frame or from a timer.
+            Returns:
+                The PendingPrograms that became ready or failed
+        """
+        finished = []
+        budget = self.blocking_per_poll
+        for pending in list(self._pending):
+            if not self.parallel and budget <= 0:
+                break
+            if self._advance(pending):
+                budget -= 1
+            if pending.done:
+                self._pending.remove(pending)
+                finished.append(pending)
+        return finished
+
+    def finish(self) -> None:
+        """
+            Block until every submitted program is done.
+        """
+        parallel, self.parallel = self.parallel, False
+        blocking, self.blocking_per_poll = self.blocking_per_poll, len(self._pending)
+        try:
+            while self._pending:
+                self.poll()
+        finally:
+            self.parallel = parallel
+            self.blocking_per_poll = blocking
+
+    def destroy(self) -> None:
+        """
+            Delete pending objects and every program built by the queue.
+        """
+        for pending in list(self._pending):
+            self._cancel(pending)
+        for program in self.programs.values():
+            program.destroy()
+        self.programs.clear()
@@ -0,0 +1,143 @@
+''' A draw queue that orders a frame's draws by state. Every group gets a
+packed integer sort key once, from its order, blending, program and
+texture, so sorting and comparing draws is plain integer work instead of
+tuple hashing and attribute comparisons. Opaque draws run first, grouped
+by program and texture and front to back within a state; blended draws
+follow back to front. Consecutive draws with equal state share one
+set_state()/unset_state() pair.'''
+
+from operator import itemgetter
+
+ORDER_BITS = 8
+TEXTURE_BITS = 16
+PROGRAM_BITS = 12
+DEPTH_BITS = 24
+MATERIAL_BITS = PROGRAM_BITS + TEXTURE_BITS
+DEPTH_MAX = (1 << DEPTH_BITS) - 1
+
+_sort_key = itemgetter(0)
+
+
+def _gl_name(gl_object) -> int:
+    """
+        The GL name of a program or texture wrapper, pyglet's or ours.
+    """
+    if gl_object is None:
+        return 0
+    name = gl_object.id
+    return getattr(name, 'value', name)
+
+
+class DrawQueue:
+    """
+        Collects (group, draw) pairs during a frame and issues them in
+        state order on flush().
+
+        A group needs set_state() and unset_state() and is described by
+        its program, texture (optional), blend (optional, False) and
+        order (optional, 0) attributes. Groups with equal values there
+        must set equal state, like RenderGroup.__eq__ assumes. Keys are
+        computed on first use and cached; call invalidate() after
+        changing a group's attributes.
+    """
+    def __init__(self):
+        # id(group) -> (group, prefix, state); the group keeps the id valid
+        self._groups = {}
+        self._programs = {}
+        self._textures = {}
+        self._draws = []
+        self.draw_calls = 0
+        self.state_changes = 0
+        self.skipped_changes = 0
+
+    def _index(self, table: dict, gl_object, bits: int) -> int:
+        # Small dense indices, GL names can be larger than the key fields
+        name = _gl_name(gl_object)
+        index = table.get(name)
+        if index is None:
+            index = table[name] = len(table)
+            if index >= 1 << bits:
+                raise OverflowError(f"More than {1 << bits} distinct objects in one draw queue")
+        return index
+
+    def _group_keys(self, group) -> tuple:
+        entry = self._groups.get(id(group))
+        if entry is None:
+            order = min(max(getattr(group, 'order', 0) + (1 << ORDER_BITS - 1), 0),
+                        (1 << ORDER_BITS) - 1)
+            # Blending is the lowest bit of the prefix, opaque sorts first
+            prefix = order << 1 | bool(getattr(group, 'blend', False))
+            material = (self._index(self._programs, group.program, PROGRAM_BITS) << TEXTURE_BITS
+                        | self._index(self._textures, getattr(group, 'texture', None), TEXTURE_BITS))
+            entry = self._groups[id(group)] = (group, prefix, prefix << MATERIAL_BITS | material)
+        return entry
+
+    def sort_key(self, group, depth: float = 0.0) -> int:
+        """
+            The packed key of a draw.
+            Parameters:
+                group: state of the draw
+                depth: distance from the camera, 0.0 (near) to 1.0 (far)
+        """
+        _, prefix, state = self._group_keys(group)
+        depth = int(min(max(depth, 0.0), 1.0) * DEPTH_MAX)
+        if prefix & 1:
+            # Blended: far to near, depth ranks above program and texture
+            material = state & ((1 << MATERIAL_BITS) - 1)
+            return ((prefix << DEPTH_BITS | DEPTH_MAX - depth) << MATERIAL_BITS) | material
+        return state << DEPTH_BITS | depth
+
+    def submit(self, group, draw, depth: float = 0.0) -> None:
+        """
+            Queue a draw for this frame.
+            Parameters:
+                group: its state, see the class description
+                draw: called without arguments once the state is set
+                depth: distance from the camera, 0.0 (near) to 1.0 (far)
+        """
+        self._draws.append((self.sort_key(group, depth), group, draw))
+
+    def flush(self) -> int:
+        """
+            Issue and clear the queued draws.
+                Returns:
+                    The number of state changes, also in state_changes
+        """
+        draws = self._draws
+        draws.sort(key=_sort_key)
+        groups = self._groups
+        current = None
+        current_state = None
+        changes = skipped = 0
+        for _, group, draw in draws:
+            if group is not current:
+                state = groups[id(group)][2]
+                if state == current_state:
+                    skipped += 1
+                else:
+                    if current is not None:
+                        current.unset_state()
+                    group.set_state()
+                    current_state = state
+                    changes += 1
+                current = group
+            draw()
+        if current is not None:
+            current.unset_state()
+
+        self.draw_calls = len(draws)
+        self.state_changes = changes
+        self.skipped_changes = skipped
+        self._draws = []
+        return changes
+
+    def invalidate(self, group=None) -> None:
+        """
+            Forget the cached key of a group, or of all groups.
+        """
+        if group is None:
+            self._groups.clear()
+            self._programs.clear()
+            self._textures.clear()
+        else:
+            self._groups.pop(id(group), None)
@@ -0,0 +1,154 @@
+''' Frame-time statistics over a sliding window. Frame times are kept
+in a ring buffer measured with the monotonic perf_counter_ns clock, so
+tail latencies (p95, p99, jank) are visible and not just an average.
+Rendered on demand, the time between two frames is mostly waiting for
+input; call begin() when a frame starts to measure only the frame.'''
+
+import csv
+import json
+import time
+
+import numpy as np
+
+
+class FrameStats:
+    """
+        Collects frame times in a fixed size ring buffer.
+    """
+    def __init__(self, window: int = 600, report_interval: float = 0.25,
+                 jank_factor: float = 2.0, max_gap_ms: float = 1000.0):
+        """
+            Parameters:
+                window: number of most recent frames in the statistics
+                report_interval: seconds between two reports, tick()
+                                 returns True when one is due
+                jank_factor: a frame longer than this times the median
+                             frame time counts as jank
+                max_gap_ms: longer gaps are idle time, not a frame, and
+                            are left out of the statistics
+        """
+        self.report_interval_ns = int(report_interval * 1e9)
+        self.jank_factor = jank_factor
+        self.max_gap_ms = max_gap_ms
+        self._times = np.zeros(window, dtype=np.float64)
+        # Time since the previous tick() of each frame for the frame
+        # rate, NaN after an idle gap
+        self._intervals = np.full(window, np.nan)
+        self._index = 0
+        self._count = 0
+        self.total_frames = 0
+        self._last_ns = None
+        self._begin_ns = None
+        self._last_report_ns = 0
+
+    @property
+    def window(self) -> int:
+        return len(self._times)
+
+    def begin(self, now_ns: int | None = None) -> None:
+        """
+            Mark the start of a frame. The next tick() records the time
+            since then instead of since the previous tick().
+        """
+        self._begin_ns = time.perf_counter_ns() if now_ns is None else now_ns
+
+    def tick(self, now_ns: int | None = None) -> bool:
+        """
+            Mark the end of a frame.
+            Returns:
+                True if the report interval has passed since the last
+                time tick() returned True
+        """
+        now_ns = time.perf_counter_ns() if now_ns is None else now_ns
+        start_ns = self._last_ns if self._begin_ns is None else self._begin_ns
+        self._begin_ns = None
+        if start_ns is not None:
+            frametime = (now_ns - start_ns) / 1e6
+            interval = (now_ns - self._last_ns) / 1e6 if self._last_ns is not None else np.nan
+            if frametime <= self.max_gap_ms:
+                self._times[self._index] = frametime
+                self._intervals[self._index] = interval if interval <= self.max_gap_ms else np.nan
+                self._index = (self._index + 1) % len(self._times)
+                self._count = min(self._count + 1, len(self._times))
+                self.total_frames += 1
+        self._last_ns = now_ns
+
+        if now_ns - self._last_report_ns >= self.report_interval_ns:
+            self._last_report_ns = now_ns
+            return True
+        return False
+
+    def reset(self) -> None:
+        """
+            Forget every recorded frame.
+        """
+        self._index = 0
+        self._count = 0
+        self.total_frames = 0
+        self._last_ns = None
+        self._begin_ns = None
+
+    def frame_times(self) -> np.ndarray:
+        """
+            The frame times of the window in ms, oldest first.
+        """
+        if self._count < len(self._times):
+            return self._times[:self._count].copy()
+        return np.roll(self._times, -self._index)
+
+    def summary(self) -> dict:
+        """
+            Statistics of the current window, times in ms.
+        """
+        times = self._times[:self._count]
+        if not len(times):
+            return {'frames': 0}
+        p50, p95, p99 = np.percentile(times, (50, 95, 99))
+        mean = float(times.mean())
+        intervals = self._intervals[:self._count]
+        intervals = intervals[~np.isnan(intervals)]
+        # From tick to tick, with begin() the frame times leave out idle time
+        interval = float(intervals.mean()) if len(intervals) else 0.0
+        return {
+            'frames': int(len(times)),
+            'min': float(times.min()),
+            'mean': mean,
+            'p50': float(p50),
+            'p95': float(p95),
+            'p99': float(p99),
+            'max': float(times.max()),
+            'fps': 1000.0 / interval if interval > 0 else 0.0,
+            'jank': int(np.count_nonzero(times > self.jank_factor * p50)),
+        }
+
+    def format(self) -> str:
+        """
+            A one line summary for a status bar.
+        """
+        stats = self.summary()
+        if not stats['frames']:
+            return "No frames yet."
+        return (f"Frametime p50: {stats['p50']:.2f} ms, p99: {stats['p99']:.2f} ms, "
+                f"max: {stats['max']:.2f} ms, FPS: {stats['fps']:.0f}, jank: {stats['jank']}")
+
+    def export_csv(self, filepath: str) -> None:
+        """
+            Write the frame times of the window to a CSV file.
+        """
+        with open(filepath, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(('frame', 'frametime_ms'))
+            for index, frametime in enumerate(self.frame_times()):
+                writer.writerow((index, f"{frametime:.6f}"))
+
+    def export_json(self, filepath: str) -> None:
+        """
+            Write the summary and the frame times of the window to JSON.
+        """
+        data = {
+            'summary': self.summary(),
+            'jank_factor': self.jank_factor,
+            'frame_times_ms': self.frame_times().tolist(),
+        }
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
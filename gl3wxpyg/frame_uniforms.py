@@ -0,0 +1,129 @@
+''' Per-frame uniforms in one std140 uniform buffer: camera matrices,
+viewport, aspect ratio and time. The buffer sits at a fixed binding
+point that gl3wxpyg.shaders.ShaderProgram assigns to every program
+declaring the block, so it is written once per frame, and only the
+changed part, however many programs read it. Declare it in GLSL as:
+
+    layout (std140) uniform FrameBlock
+    {
+        mat4 projection;
+        mat4 view;
+        vec2 viewport;
+        float aspect;
+        float time;
+    } frame;
+'''
+
+from pyglet.gl import GL_UNIFORM_BUFFER, GL_DYNAMIC_DRAW, GL_INVALID_INDEX, \
+    glBindBufferBase, glGetUniformBlockIndex, glUniformBlockBinding
+import numpy as np
+
+from .buffers import BufferObject
+from .shaders import UNIFORM_BLOCK_BINDINGS
+
+FRAME_BLOCK = 'FrameBlock'
+FRAME_BINDING = UNIFORM_BLOCK_BINDINGS[FRAME_BLOCK]
+
+# std140 float offsets of the members
+_PROJECTION = slice(0, 16)
+_VIEW = slice(16, 32)
+_VIEWPORT = slice(32, 34)
+_ASPECT = slice(34, 35)
+_TIME = slice(35, 36)
+_FLOATS = 36
+
+_IDENTITY = np.eye(4, dtype=np.float32).ravel()
+
+
+def attach_frame_block(program_id: int, binding: int = FRAME_BINDING) -> bool:
+    """
+        Point the FrameBlock of a program that was not built by
+        ShaderProgram, e.g. a pyglet one, at the shared binding point.
+            Returns:
+                False if the program has no FrameBlock
+    """
+    index = glGetUniformBlockIndex(program_id, FRAME_BLOCK.encode('utf-8'))
+    if index == GL_INVALID_INDEX:
+        return False
+    glUniformBlockBinding(program_id, index, binding)
+    return True
+
+
+class FrameUniforms:
+    """
+        The FrameBlock uniform buffer. Setters only mark what changed,
+        update() uploads it in one call before the frame is drawn.
+    """
+    def __init__(self, binding: int = FRAME_BINDING):
+        """
+            Parameters:
+                binding: uniform buffer binding point, programs built by
+                         ShaderProgram expect FRAME_BINDING
+        """
+        self.binding = binding
+        self.data = np.zeros(_FLOATS, dtype=np.float32)
+        self.data[_PROJECTION] = _IDENTITY
+        self.data[_VIEW] = _IDENTITY
+        self.data[_ASPECT] = 1.0
+        self.buffer = BufferObject(GL_UNIFORM_BUFFER, GL_DYNAMIC_DRAW, self.data)
+        glBindBufferBase(GL_UNIFORM_BUFFER, binding, self.buffer.id)
+        # Float range changed since the last upload
+        self._dirty = None
+        self.uploads = 0
+
+    def _set(self, members: slice, values) -> None:
+        values = np.asarray(values, dtype=np.float32).ravel()
+        if np.array_equal(self.data[members], values):
+            return
+        self.data[members] = values
+        if self._dirty is None:
+            self._dirty = (members.start, members.stop)
+        else:
+            self._dirty = (min(self._dirty[0], members.start), max(self._dirty[1], members.stop))
+
+    def set_projection(self, matrix) -> None:
+        """
+            Parameters:
+                matrix: 16 floats in column-major order, e.g. a pyglet Mat4
+        """
+        self._set(_PROJECTION, matrix)
+
+    def set_view(self, matrix) -> None:
+        self._set(_VIEW, matrix)
+
+    def set_viewport(self, width: int, height: int) -> None:
+        """
+            Set the viewport size in pixels and the aspect ratio from it.
+        """
+        self._set(_VIEWPORT, (width, height))
+        self._set(_ASPECT, width / max(height, 1))
+
+    def set_aspect(self, aspect: float) -> None:
+        self._set(_ASPECT, aspect)
+
+    def set_time(self, seconds: float) -> None:
+        self._set(_TIME, seconds)
+
+    def update(self) -> bool:
+        """
+            Upload the changed members.
+                Returns:
+                    True if anything was uploaded
+        """
+        if self._dirty is None:
+            return False
+        first, last = self._dirty
+        self.buffer.set_sub_data(self.data[first:last], first * self.data.itemsize)
+        self._dirty = None
+        self.uploads += 1
+        return True
+
+    def bind(self) -> None:
+        """
+            Bind the buffer to its binding point again, e.g. after other
+            code used the same one.
+        """
+        glBindBufferBase(GL_UNIFORM_BUFFER, self.binding, self.buffer.id)
+
+    def destroy(self) -> None:
+        self.buffer.destroy()
@@ -0,0 +1,198 @@
+''' Procedural geometry built with NumPy broadcasting instead of Python
+loops. Every generator returns a Geometry with contiguous float32
+positions, normals and UVs and uint32 triangle indices (counter-clockwise
+front faces), ready for glBufferData or gl3wxpyg.buffers.Mesh.'''
+
+import numpy as np
+
+# Mesh attribute layout of Geometry.interleaved(): position, normal, uv
+INTERLEAVED_ATTRIBUTES = ((0, 3), (1, 3), (2, 2))
+
+
+class Geometry:
+    """
+        Vertex attributes and triangle indices of one mesh.
+    """
+    def __init__(self, positions: np.ndarray, normals: np.ndarray, uvs: np.ndarray,
+                 indices: np.ndarray):
+        self.positions = np.ascontiguousarray(positions, dtype=np.float32)
+        self.normals = np.ascontiguousarray(normals, dtype=np.float32)
+        self.uvs = np.ascontiguousarray(uvs, dtype=np.float32)
+        self.indices = np.ascontiguousarray(indices, dtype=np.uint32)
+
+    @property
+    def vertex_count(self) -> int:
+        return len(self.positions)
+
+    @property
+    def nbytes(self) -> int:
+        return self.positions.nbytes + self.normals.nbytes + self.uvs.nbytes + self.indices.nbytes
+
+    def interleaved(self) -> np.ndarray:
+        """
+            One (vertex_count, 8) array of x, y, z, nx, ny, nz, u, v,
+            for Mesh(..., INTERLEAVED_ATTRIBUTES, indices).
+        """
+        return np.hstack((self.positions, self.normals, self.uvs))
+
+
+def grid_indices(rows: int, columns: int) -> np.ndarray:
+    """
+        Two triangles per cell of a rows x columns vertex grid stored
+        row by row. The triangles face the side from which row index
+        cross column index points towards the viewer.
+    """
+    first = (np.arange(rows - 1, dtype=np.uint32)[:, None] * columns
+             + np.arange(columns - 1, dtype=np.uint32)).ravel()
+    return np.stack((first, first + columns, first + columns + 1,
+                     first, first + columns + 1, first + 1), axis=1).ravel()
+
+
+def _fan_indices(center: int, ring_start: int, segments: int, reverse: bool) -> np.ndarray:
+    ring = np.arange(ring_start, ring_start + segments, dtype=np.uint32)
+    centers = np.full(segments, center, dtype=np.uint32)
+    if reverse:
+        return np.stack((centers, ring + 1, ring), axis=1).ravel()
+    return np.stack((centers, ring, ring + 1), axis=1).ravel()
+
+
+def torus(radius: float = 1.0, inner_radius: float = 0.3, slices: int = 50,
+          inner_slices: int = 30) -> Geometry:
+    """
+        A torus around the z axis with the vertex and index order of
+        create_torus in examples/pyglet_graphics_example.py.
+            Parameters:
+                radius: distance from the centre to the middle of the tube
+                inner_radius: radius of the tube
+                slices: vertices around the z axis, the last one closes
+                        the seam
+                inner_slices: vertices around the tube
+    """
+    u = np.linspace(0.0, 2 * np.pi, slices)[:, None]
+    v = np.linspace(0.0, 2 * np.pi, inner_slices)[None, :]
+    cos_u, sin_u, cos_v, sin_v = np.cos(u), np.sin(u), np.cos(v), np.sin(v)
+
+    distance = radius + inner_radius * cos_v
+    positions = np.stack(np.broadcast_arrays(distance * cos_u, distance * sin_u,
+                                             inner_radius * sin_v), axis=-1)
+    normals = np.stack(np.broadcast_arrays(cos_u * cos_v, sin_u * cos_v, sin_v), axis=-1)
+    uvs = np.stack(np.broadcast_arrays(u / (2 * np.pi), v / (2 * np.pi)), axis=-1)
+    return Geometry(positions.reshape(-1, 3), normals.reshape(-1, 3), uvs.reshape(-1, 2),
+                    grid_indices(slices, inner_slices))
+
+
+def sphere(radius: float = 1.0, slices: int = 32, stacks: int = 16) -> Geometry:
+    """
+        A UV sphere around the origin with its poles on the z axis.
+            Parameters:
+                slices: segments around the z axis
+                stacks: segments from pole to pole
+    """
+    theta = np.linspace(0.0, np.pi, stacks + 1)[:, None]
+    phi = np.linspace(0.0, 2 * np.pi, slices + 1)[None, :]
+    normals = np.stack(np.broadcast_arrays(np.sin(theta) * np.cos(phi),
+                                           np.sin(theta) * np.sin(phi),
+                                           np.cos(theta)), axis=-1).reshape(-1, 3)
+    uvs = np.stack(np.broadcast_arrays(phi / (2 * np.pi), 1.0 - theta / np.pi),
+                   axis=-1).reshape(-1, 2)
+    return Geometry(normals * radius, normals, uvs, grid_indices(stacks + 1, slices + 1))
+
+
+def cylinder(base_radius: float = 0.5, top_radius: float = 0.5, height: float = 1.0,
+             slices: int = 32, stacks: int = 1, caps: bool = True) -> Geometry:
+    """
+        A cylinder or truncated cone along the z axis from z = 0 to
+        height, like gluCylinder, optionally closed by caps.
+            Parameters:
+                base_radius: radius at z = 0
+                top_radius: radius at z = height, 0 for a cone
+                slices: segments around the z axis
+                stacks: segments along the z axis
+                caps: add discs at both ends (none at a cone's apex)
+    """
+    phi = np.linspace(0.0, 2 * np.pi, slices + 1)
+    cos_phi, sin_phi = np.cos(phi), np.sin(phi)
+    # Rows run from the top down so the sides face outwards
+    t = np.linspace(1.0, 0.0, stacks + 1)[:, None]
+    ring_radius = base_radius + (top_radius - base_radius) * t
+
+    positions = np.stack(np.broadcast_arrays(ring_radius * cos_phi, ring_radius * sin_phi,
+                                             t * height), axis=-1).reshape(-1, 3)
+    slope = (base_radius - top_radius) / height
+    side_normals = np.stack((cos_phi, sin_phi, np.full_like(phi, slope)), axis=-1)
+    side_normals /= np.linalg.norm(side_normals, axis=-1, keepdims=True)
+    normals = np.broadcast_to(side_normals, (stacks + 1, slices + 1, 3)).reshape(-1, 3)
+    uvs = np.stack(np.broadcast_arrays(phi / (2 * np.pi), t), axis=-1).reshape(-1, 2)
+    parts = [(positions, normals, uvs)]
+    indices = [grid_indices(stacks + 1, slices + 1)]
+
+    if caps:
+        count = len(positions)
+        cap_uvs = np.vstack(((0.5, 0.5), np.stack((0.5 + 0.5 * cos_phi, 0.5 + 0.5 * sin_phi), axis=-1)))
+        for z, cap_radius, facing in ((0.0, base_radius, -1.0), (height, top_radius, 1.0)):
+            if cap_radius <= 0.0:
+                continue
+            ring = np.stack((cap_radius * cos_phi, cap_radius * sin_phi, np.full_like(phi, z)), axis=-1)
+            cap_positions = np.vstack(((0.0, 0.0, z), ring))
+            cap_normals = np.broadcast_to((0.0, 0.0, facing), cap_positions.shape)
+            parts.append((cap_positions, cap_normals, cap_uvs))
+            # The bottom cap is seen from below, its fan turns the other way
+            indices.append(_fan_indices(count, count + 1, slices, reverse=facing < 0))
+            count += len(cap_positions)
+
+    positions, normals, uvs = (np.vstack(columns) for columns in zip(*parts))
+    return Geometry(positions, normals, uvs, np.concatenate(indices))
+
+
+def cone(radius: float = 0.5, height: float = 1.0, slices: int = 32, stacks: int = 1,
+         cap: bool = True) -> Geometry:
+    """
+        A cone along the z axis with its base at z = 0 and its apex at
+        height, optionally closed at the base.
+    """
+    return cylinder(radius, 0.0, height, slices, stacks, cap)
+
+
+# Normal, u and v axis of every cube face, u cross v is the normal
+_CUBE_FACES = np.array((
+    ((1, 0, 0), (0, 0, -1), (0, 1, 0)),
+    ((-1, 0, 0), (0, 0, 1), (0, 1, 0)),
+    ((0, 1, 0), (1, 0, 0), (0, 0, -1)),
+    ((0, -1, 0), (1, 0, 0), (0, 0, 1)),
+    ((0, 0, 1), (1, 0, 0), (0, 1, 0)),
+    ((0, 0, -1), (-1, 0, 0), (0, 1, 0)),
+), dtype=np.float32)
+_QUAD_CORNERS = np.array(((-1, -1), (1, -1), (1, 1), (-1, 1)), dtype=np.float32)
+
+
+def cube(size: float = 1.0) -> Geometry:
+    """
+        An axis-aligned cube around the origin with separate vertices
+        per face, so every face has its own normal and full UV square.
+    """
+    normal, u_axis, v_axis = (_CUBE_FACES[:, None, i] for i in range(3))
+    u, v = _QUAD_CORNERS[None, :, 0, None], _QUAD_CORNERS[None, :, 1, None]
+    positions = 0.5 * size * (normal + u * u_axis + v * v_axis)
+    normals = np.broadcast_to(normal, positions.shape)
+    uvs = np.broadcast_to((_QUAD_CORNERS + 1.0) / 2.0, (6, 4, 2))
+    quad = np.array((0, 1, 2, 0, 2, 3), dtype=np.uint32)
+    indices = (np.arange(6, dtype=np.uint32)[:, None] * 4 + quad).ravel()
+    return Geometry(positions.reshape(-1, 3), normals.reshape(-1, 3), uvs.reshape(-1, 2), indices)
+
+
+def grid(width: float = 1.0, depth: float = 1.0, columns: int = 10, rows: int = 10) -> Geometry:
+    """
+        A flat grid in the xz plane around the origin, facing +y.
+            Parameters:
+                width: extent along x
+                depth: extent along z
+                columns: cells along x
+                rows: cells along z
+    """
+    u = np.linspace(0.0, 1.0, columns + 1)[None, :]
+    v = np.linspace(0.0, 1.0, rows + 1)[:, None]
+    positions = np.stack(np.broadcast_arrays((u - 0.5) * width, 0.0, (v - 0.5) * depth),
+                         axis=-1).reshape(-1, 3)
+    normals = np.broadcast_to(np.array((0.0, 1.0, 0.0)), positions.shape)
+    uvs = np.stack(np.broadcast_arrays(u, v), axis=-1).reshape(-1, 2)
+    return Geometry(positions, normals, uvs, grid_indices(rows + 1, columns + 1))
@@ -0,0 +1,197 @@
+''' Driver diagnostics through KHR_debug (core in OpenGL 4.3) for the
+debug profile of gl3wxpyg.options. Instead of pyglet polling glGetError
+after every call, the driver calls back with errors, warnings and
+performance hints, filtered by source and severity, and only when it
+has something to say. Render phases are wrapped in debug groups, so
+messages and captures in RenderDoc or apitrace show where they came
+from. In the production profile none of this is installed and
+debug_group() does nothing.'''
+
+import ctypes
+import logging
+import os
+from collections import Counter
+from contextlib import nullcontext
+
+import pyglet
+from pyglet.gl import GLuint, GLDEBUGPROC, GL_TRUE, GL_FALSE, GL_DONT_CARE, \
+    GL_DEBUG_OUTPUT, GL_DEBUG_OUTPUT_SYNCHRONOUS, \
+    GL_DEBUG_SOURCE_API, GL_DEBUG_SOURCE_WINDOW_SYSTEM, GL_DEBUG_SOURCE_SHADER_COMPILER, \
+    GL_DEBUG_SOURCE_THIRD_PARTY, GL_DEBUG_SOURCE_APPLICATION, GL_DEBUG_SOURCE_OTHER, \
+    GL_DEBUG_TYPE_ERROR, GL_DEBUG_TYPE_DEPRECATED_BEHAVIOR, GL_DEBUG_TYPE_UNDEFINED_BEHAVIOR, \
+    GL_DEBUG_TYPE_PORTABILITY, GL_DEBUG_TYPE_PERFORMANCE, GL_DEBUG_TYPE_OTHER, \
+    GL_DEBUG_TYPE_MARKER, GL_DEBUG_TYPE_PUSH_GROUP, GL_DEBUG_TYPE_POP_GROUP, \
+    GL_DEBUG_SEVERITY_HIGH, GL_DEBUG_SEVERITY_MEDIUM, GL_DEBUG_SEVERITY_LOW, \
+    GL_DEBUG_SEVERITY_NOTIFICATION, glEnable, glDisable, glDebugMessageCallback, \
+    glDebugMessageControl, glPushDebugGroup, glPopDebugGroup
+
+from . import options
+
+log = logging.getLogger(__name__)
+
+# Lowest filter level of install_for_profile(), e.g. GL3WXPYG_DEBUG_SEVERITY=medium
+SEVERITY_ENV = 'GL3WXPYG_DEBUG_SEVERITY'
+
+# Least severe first
+SEVERITIES = {
+    'notification': GL_DEBUG_SEVERITY_NOTIFICATION,
+    'low': GL_DEBUG_SEVERITY_LOW,
+    'medium': GL_DEBUG_SEVERITY_MEDIUM,
+    'high': GL_DEBUG_SEVERITY_HIGH,
+}
+SOURCES = {
+    'api': GL_DEBUG_SOURCE_API,
+    'window_system': GL_DEBUG_SOURCE_WINDOW_SYSTEM,
+    'shader_compiler': GL_DEBUG_SOURCE_SHADER_COMPILER,
+    'third_party': GL_DEBUG_SOURCE_THIRD_PARTY,
+    'application': GL_DEBUG_SOURCE_APPLICATION,
+    'other': GL_DEBUG_SOURCE_OTHER,
+}
+_TYPES = {
+    GL_DEBUG_TYPE_ERROR: 'error',
+    GL_DEBUG_TYPE_DEPRECATED_BEHAVIOR: 'deprecated',
+    GL_DEBUG_TYPE_UNDEFINED_BEHAVIOR: 'undefined behavior',
+    GL_DEBUG_TYPE_PORTABILITY: 'portability',
+    GL_DEBUG_TYPE_PERFORMANCE: 'performance',
+    GL_DEBUG_TYPE_OTHER: 'other',
+    GL_DEBUG_TYPE_MARKER: 'marker',
+    GL_DEBUG_TYPE_PUSH_GROUP: 'push group',
+    GL_DEBUG_TYPE_POP_GROUP: 'pop group',
+}
+_SEVERITY_NAMES = {value: name for name, value in SEVERITIES.items()}
+_SOURCE_NAMES = {value: name for name, value in SOURCES.items()}
+_LOG_LEVELS = {
+    GL_DEBUG_SEVERITY_HIGH: logging.ERROR,
+    GL_DEBUG_SEVERITY_MEDIUM: logging.WARNING,
+    GL_DEBUG_SEVERITY_LOW: logging.INFO,
+    GL_DEBUG_SEVERITY_NOTIFICATION: logging.DEBUG,
+}
+
+# Set once debug output is installed, debug_group() is a no-op before
+_groups_enabled = False
+
+
+def have_debug_output() -> bool:
+    """
+        Debug output needs OpenGL 4.3 or GL_KHR_debug.
+    """
+    info = pyglet.gl.current_context.get_info()
+    return info.have_version(4, 3) or info.have_extension('GL_KHR_debug')
+
+
+class _DebugGroup:
+    __slots__ = ('label',)
+
+    def __init__(self, label: bytes):
+        self.label = label
+
+    def __enter__(self):
+        glPushDebugGroup(GL_DEBUG_SOURCE_APPLICATION, 0, -1, self.label)
+
+    def __exit__(self, *exc_info):
+        glPopDebugGroup()
+
+
+_NO_GROUP = nullcontext()
+
+
+def debug_group(label: str):
+    """
+        A with block that is a named debug group in the debug profile
+        and nothing otherwise.
+    """
+    if not _groups_enabled:
+        return _NO_GROUP
+    return _DebugGroup(label.encode('utf-8'))
+
+
+class DebugOutput:
+    """
+        Logs the debug messages of the current context. Errors are
+        logged with the Python stack of the call that caused them, the
+        messages arrive synchronously for that.
+    """
+    def __init__(self, min_severity: str = 'low', sources: list | None = None,
+                 synchronous: bool = True):
+        """
+            Parameters:
+                min_severity: least severe messages to log, see SEVERITIES
+                sources: only log messages from these, see SOURCES,
+                         by default from all
+                synchronous: call back from inside the failing GL call,
+                             slower but the stack points at the culprit
+        """
+        self.synchronous = synchronous
+        # Messages received per severity name
+        self.counts = Counter()
+        # ctypes frees the function pointer with the last reference
+        self._callback = GLDEBUGPROC(self._on_message)
+        glEnable(GL_DEBUG_OUTPUT)
+        if synchronous:
+            glEnable(GL_DEBUG_OUTPUT_SYNCHRONOUS)
+        glDebugMessageCallback(self._callback, None)
+        self.set_filter(min_severity, sources)
+
+    def set_filter(self, min_severity: str = 'low', sources: list | None = None) -> None:
+        """
+            Replace the filter, see __init__. Messages dropped by the
+            filter are not even generated by most drivers.
+        """
+        levels = list(SEVERITIES.values())
+        severities = levels[levels.index(SEVERITIES[min_severity]):]
+        # Everything off, then the wanted combinations on again
+        glDebugMessageControl(GL_DONT_CARE, GL_DONT_CARE, GL_DONT_CARE, 0, None, GL_FALSE)
+        for source in [SOURCES[name] for name in sources] if sources else [GL_DONT_CARE]:
+            for severity in severities:
+                glDebugMessageControl(source, GL_DONT_CARE, severity, 0, None, GL_TRUE)
+
+    def ignore(self, source: str, message_ids: list) -> None:
+        """
+            Mute single messages, e.g. a driver's repeated buffer usage hints.
+            Parameters:
+                source: see SOURCES
+                message_ids: the ids shown in the log
+        """
+        ids = (GLuint * len(message_ids))(*message_ids)
+        glDebugMessageControl(SOURCES[source], GL_DONT_CARE, GL_DONT_CARE, len(message_ids), ids, GL_FALSE)
+
+    def _on_message(self, source, message_type, message_id, severity, length, message, user_param):
+        text = ctypes.string_at(message, length).decode('utf-8', 'replace').rstrip()
+        self.counts[_SEVERITY_NAMES.get(severity, 'unknown')] += 1
+        log.log(_LOG_LEVELS.get(severity, logging.INFO), "GL %s %s %d: %s",
+                _SOURCE_NAMES.get(source, 'unknown'), _TYPES.get(message_type, 'unknown'),
+                message_id, text,
+                stack_info=self.synchronous and message_type == GL_DEBUG_TYPE_ERROR)
+
+    def destroy(self) -> None:
+        """
+            Stop the callbacks, the context has to be current.
+        """
+        global _groups_enabled
+        _groups_enabled = False
+        glDebugMessageCallback(GLDEBUGPROC(), None)
+        glDisable(GL_DEBUG_OUTPUT_SYNCHRONOUS)
+        glDisable(GL_DEBUG_OUTPUT)
+
+
+def install_for_profile(sources: list | None = None) -> DebugOutput | None:
+    """
+        Install debug output into the current context if the debug
+        profile is selected, see gl3wxpyg.options.
+            Parameters:
+                sources: see DebugOutput
+            Returns:
+                The debug output, None in production or if the driver has
+                no KHR_debug
+    """
+    global _groups_enabled
+    if options.profile() != 'debug':
+        return None
+    if not have_debug_output():
+        if not pyglet.options['debug_gl']:
+            log.warning("The debug profile needs OpenGL 4.3 or GL_KHR_debug, "
+                        "the driver will not report errors")
+        return None
+    output = DebugOutput(os.environ.get(SEVERITY_ENV) or 'low', sources)
+    _groups_enabled = True
+    return output
@@ -0,0 +1,186 @@
+''' A thin tracker of GL state that skips calls which would not change
+anything. Every ctypes call costs microseconds in Python, so binding the
+same program and vertex array again on every frame adds up. The tracker
+only knows what was set through it: after other code changed tracked
+state, or deleted a bound object, call invalidate(). One tracker per
+context.'''
+
+from pyglet.gl import GL_ELEMENT_ARRAY_BUFFER, GL_TEXTURE0, glUseProgram, \
+    glBindVertexArray, glBindBuffer, glActiveTexture, glBindTexture, glEnable, \
+    glDisable, glBlendFunc, glDepthFunc, glDepthMask, glClearColor
+
+
+def _name(gl_object) -> int:
+    """
+        The GL name of a wrapper with an id, a GLuint or a plain int.
+    """
+    name = getattr(gl_object, 'id', gl_object)
+    return getattr(name, 'value', name)
+
+
+class GLState:
+    """
+        The program, vertex array, buffer and texture bindings, enabled
+        capabilities, blend and depth functions and clear colour of one
+        context, as far as they were set through this object.
+    """
+    def __init__(self):
+        self.issued = 0
+        self.skipped = 0
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """
+            Forget everything, the next call of each kind is issued.
+        """
+        self._program = None
+        self._vertex_array = None
+        self._buffers = {}
+        self._active_texture = None
+        # (unit, target) -> texture
+        self._textures = {}
+        self._caps = {}
+        self._blend_func = None
+        self._depth_func = None
+        self._depth_mask = None
+        self._clear_color = None
+
+    @property
+    def calls(self) -> int:
+        return self.issued + self.skipped
+
+    def reset_counters(self) -> None:
+        self.issued = 0
+        self.skipped = 0
+
+    def use_program(self, program) -> bool:
+        """
+            glUseProgram unless the program is current already.
+            Parameters:
+                program: a program with an id attribute or its GL name
+            Returns:
+                True if the GL call was made
+        """
+        name = _name(program)
+        if name == self._program:
+            self.skipped += 1
+            return False
+        glUseProgram(name)
+        self._program = name
+        self.issued += 1
+        return True
+
+    def bind_vertex_array(self, vertex_array) -> bool:
+        name = _name(vertex_array)
+        if name == self._vertex_array:
+            self.skipped += 1
+            return False
+        glBindVertexArray(name)
+        self._vertex_array = name
+        # The element buffer binding is part of the vertex array
+        self._buffers.pop(GL_ELEMENT_ARRAY_BUFFER, None)
+        self.issued += 1
+        return True
+
+    def bind_buffer(self, target: int, buffer) -> bool:
+        name = _name(buffer)
+        if self._buffers.get(target) == name:
+            self.skipped += 1
+            return False
+        glBindBuffer(target, name)
+        self._buffers[target] = name
+        self.issued += 1
+        return True
+
+    def active_texture(self, unit: int) -> bool:
+        """
+            Parameters:
+                unit: texture unit index, 0 for GL_TEXTURE0
+        """
+        if unit == self._active_texture:
+            self.skipped += 1
+            return False
+        glActiveTexture(GL_TEXTURE0 + unit)
+        self._active_texture = unit
+        self.issued += 1
+        return True
+
+    def bind_texture(self, target: int, texture, unit: int | None = None) -> bool:
+        """
+            Bind a texture, to the given unit or the active one.
+        """
+        if unit is not None:
+            self.active_texture(unit)
+        elif self._active_texture is None:
+            # Unknown unit, nothing to compare with
+            glBindTexture(target, _name(texture))
+            self.issued += 1
+            return True
+        key = (self._active_texture, target)
+        name = _name(texture)
+        if self._textures.get(key) == name:
+            self.skipped += 1
+            return False
+        glBindTexture(target, name)
+        self._textures[key] = name
+        self.issued += 1
+        return True
+
+    def set_enabled(self, cap: int, enabled: bool) -> bool:
+        """
+            glEnable or glDisable a capability, e.g. GL_BLEND.
+        """
+        if self._caps.get(cap) is enabled:
+            self.skipped += 1
+            return False
+        if enabled:
+            glEnable(cap)
+        else:
+            glDisable(cap)
+        self._caps[cap] = enabled
+        self.issued += 1
+        return True
+
+    def enable(self, cap: int) -> bool:
+        return self.set_enabled(cap, True)
+
+    def disable(self, cap: int) -> bool:
+        return self.set_enabled(cap, False)
+
+    def blend_func(self, source: int, destination: int) -> bool:
+        if (source, destination) == self._blend_func:
+            self.skipped += 1
+            return False
+        glBlendFunc(source, destination)
+        self._blend_func = (source, destination)
+        self.issued += 1
+        return True
+
+    def depth_func(self, func: int) -> bool:
+        if func == self._depth_func:
+            self.skipped += 1
+            return False
+        glDepthFunc(func)
+        self._depth_func = func
+        self.issued += 1
+        return True
+
+    def depth_mask(self, flag: bool) -> bool:
+        flag = bool(flag)
+        if flag is self._depth_mask:
+            self.skipped += 1
+            return False
+        glDepthMask(flag)
+        self._depth_mask = flag
+        self.issued += 1
+        return True
+
+    def clear_color(self, red: float, green: float, blue: float, alpha: float) -> bool:
+        color = (red, green, blue, alpha)
+        if color == self._clear_color:
+            self.skipped += 1
+            return False
+        glClearColor(*color)
+        self._clear_color = color
+        self.issued += 1
+        return True
@@ -0,0 +1,246 @@
+''' Counts the ctypes GL calls of each frame. install() replaces every
+function of pyglet.gl, and every copy of it bound into a module by
+"from pyglet.gl import ...", with a wrapper that records the call count
+and the Python-side time per function; uninstall() puts the originals
+back. Nothing checks a flag, without the wrappers tracing costs nothing.
+Besides module-level names only the tables in _FUNCTION_TABLES are
+patched, a GL function kept in any other container or attribute is not
+traced. The times include the ctypes overhead the wrapper adds, compare
+them with each other rather than with an untraced run.'''
+
+import json
+import logging
+import sys
+import time
+from collections import deque
+
+import pyglet.gl.gl
+import pyglet.gl.gl_compat
+
+from . import shaders
+
+log = logging.getLogger(__name__)
+
+# The modules defining the functions, everything else holds copies
+_SOURCE_MODULES = (pyglet.gl.gl, pyglet.gl.gl_compat)
+# Dicts of tuples holding GL functions, looked up on every call
+_FUNCTION_TABLES = (shaders.UNIFORM_SETTERS,)
+
+# The tracer whose wrappers are in place, only one at a time
+_installed = None
+
+
+class FrameCalls:
+    """
+        The GL calls of one frame.
+    """
+    __slots__ = ('index', 'calls', 'cpu_ns')
+
+    def __init__(self, index: int, calls: dict, cpu_ns: int):
+        self.index = index
+        # Function name -> (calls, ns spent in them)
+        self.calls = calls
+        # Time from begin_frame() to end_frame()
+        self.cpu_ns = cpu_ns
+
+    @property
+    def count(self) -> int:
+        return sum(count for count, _ in self.calls.values())
+
+    @property
+    def gl_ms(self) -> float:
+        return sum(ns for _, ns in self.calls.values()) / 1e6
+
+    def as_dict(self) -> dict:
+        return {'frame': self.index, 'calls': self.count, 'gl_ms': self.gl_ms,
+                'frame_ms': self.cpu_ns / 1e6,
+                'functions': {name: {'calls': count, 'ms': ns / 1e6}
+                              for name, (count, ns) in self.calls.items()}}
+
+
+class GLCallTracer:
+    """
+        Records the GL calls between begin_frame() and end_frame() while
+        installed. Calls outside of a frame are not recorded.
+    """
+    def __init__(self, call_budget: int | None = None, max_frames: int = 1000):
+        """
+            Parameters:
+                call_budget: log a warning for frames with more GL calls
+                max_frames: number of recorded frames to keep
+        """
+        self.call_budget = call_budget
+        self.frames = deque(maxlen=max_frames)
+        # Indices of the frames over the budget
+        self.over_budget = []
+        self._frame_index = 0
+        self._frame_start = None
+        # (name, [calls, ns]) of every function called since the last drain
+        self._touched = []
+        # Wrapper by original function id, built once
+        self._wrappers = {}
+        # (namespace, name, original) of every replaced binding
+        self._patched = []
+        # (table, key, original, patched) of every replaced table entry
+        self._patched_entries = []
+
+    @property
+    def installed(self) -> bool:
+        return _installed is self
+
+    def _wrap(self, name: str, func):
+        entry = [0, 0]
+        touched = self._touched
+        clock = time.perf_counter_ns
+
+        def traced(*args):
+            start = clock()
+            try:
+                return func(*args)
+            finally:
+                if not entry[0]:
+                    touched.append((name, entry))
+                entry[0] += 1
+                entry[1] += clock() - start
+
+        traced.__name__ = name
+        traced.__wrapped__ = func
+        return traced
+
+    def install(self) -> int:
+        """
+            Swap the wrappers into pyglet.gl and every loaded module that
+            imported GL functions. Import modules before installing,
+            names bound later are not traced.
+            Returns:
+                The number of replaced bindings and table entries
+        """
+        global _installed
+        if _installed is self:
+            return 0
+        if _installed is not None:
+            raise RuntimeError("Another GLCallTracer is installed")
+        originals = {}
+        for module in _SOURCE_MODULES:
+            for name, value in vars(module).items():
+                if name.startswith('gl') and callable(value):
+                    originals[id(value)] = (name, value)
+        for module in list(sys.modules.values()):
+            namespace = getattr(module, '__dict__', None)
+            if namespace is None:
+                continue
+            for name, value in list(namespace.items()):
+                wrapper = self._wrapper(originals, value)
+                if wrapper is value:
+                    continue
+                namespace[name] = wrapper
+                self._patched.append((namespace, name, value))
+        for table in _FUNCTION_TABLES:
+            for key, entry in list(table.items()):
+                if not any(id(item) in originals for item in entry):
+                    continue
+                patched = table[key] = tuple(self._wrapper(originals, item) for item in entry)
+                self._patched_entries.append((table, key, entry, patched))
+        _installed = self
+        return len(self._patched) + len(self._patched_entries)
+
+    def _wrapper(self, originals: dict, value):
+        original = originals.get(id(value))
+        if original is None or original[1] is not value:
+            return value
+        wrapper = self._wrappers.get(id(value))
+        if wrapper is None:
+            wrapper = self._wrappers[id(value)] = self._wrap(original[0], value)
+        return wrapper
+
+    def uninstall(self) -> None:
+        """
+            Put the original functions back.
+        """
+        global _installed
+        if _installed is not self:
+            return
+        for namespace, name, original in self._patched:
+            if getattr(namespace.get(name), '__wrapped__', None) is original:
+                namespace[name] = original
+        for table, key, original, patched in self._patched_entries:
+            if table.get(key) is patched:
+                table[key] = original
+        self._patched.clear()
+        self._patched_entries.clear()
+        _installed = None
+
+    def _drain(self) -> dict:
+        calls = {name: (entry[0], entry[1]) for name, entry in self._touched}
+        for _, entry in self._touched:
+            entry[0] = entry[1] = 0
+        self._touched.clear()
+        return calls
+
+    def begin_frame(self) -> None:
+        self._drain()
+        self._frame_start = time.perf_counter_ns()
+
+    def end_frame(self) -> FrameCalls | None:
+        """
+            Record the calls since begin_frame().
+            Returns:
+                The frame, None if no frame was begun
+        """
+        if self._frame_start is None:
+            return None
+        frame = FrameCalls(self._frame_index, self._drain(),
+                           time.perf_counter_ns() - self._frame_start)
+        self._frame_start = None
+        self._frame_index += 1
+        self.frames.append(frame)
+        if self.call_budget is not None and frame.count > self.call_budget:
+            self.over_budget.append(frame.index)
+            top = ', '.join(f"{name} {count:.0f}" for name, count, _ in self.histogram([frame])[:5])
+            log.warning("Frame %d made %d GL calls, budget %d: %s",
+                        frame.index, frame.count, self.call_budget, top)
+        return frame
+
+    def histogram(self, frames: list | None = None) -> list:
+        """
+            Mean calls and ms per frame of every function, most called
+            first.
+            Parameters:
+                frames: FrameCalls to average, by default the kept frames
+            Returns:
+                A list of (name, calls, ms)
+        """
+        frames = self.frames if frames is None else frames
+        if not frames:
+            return []
+        totals = {}
+        for frame in frames:
+            for name, (count, ns) in frame.calls.items():
+                calls, time_ns = totals.get(name, (0, 0))
+                totals[name] = (calls + count, time_ns + ns)
+        return sorted(((name, calls / len(frames), ns / len(frames) / 1e6)
+                       for name, (calls, ns) in totals.items()),
+                      key=lambda row: (-row[1], row[0]))
+
+    def format_histogram(self, frames: list | None = None, width: int = 40) -> str:
+        """
+            histogram() as a text table with a bar per function.
+        """
+        rows = self.histogram(frames)
+        if not rows:
+            return "No GL calls recorded"
+        most = rows[0][1]
+        name_width = max(len(name) for name, _, _ in rows)
+        lines = [f"{'function':<{name_width}} {'calls':>9} {'ms':>8}"]
+        for name, calls, ms in rows:
+            bar = '#' * max(1, round(calls / most * width))
+            lines.append(f"{name:<{name_width}} {calls:9.2f} {ms:8.3f} {bar}")
+        return '\n'.join(lines)
+
+    def export_json(self, filepath: str) -> None:
+        """
+            Write the kept frames, one histogram each, as JSON.
+        """
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump({'call_budget': self.call_budget, 'over_budget': self.over_budget,
+                       'frames': [frame.as_dict() for frame in self.frames]}, f)
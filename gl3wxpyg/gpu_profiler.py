@@ -0,0 +1,225 @@
+''' Scoped GPU/CPU profiler. Every scope writes a GL_TIMESTAMP query at
+its start and end, so scopes can nest. Results are read back a few
+frames later, when the driver reports them as available, so profiling
+never stalls the pipeline. The output is Chrome trace JSON, open it in
+chrome://tracing or https://ui.perfetto.dev.'''
+
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from pyglet.gl import GLint, GLuint, GLint64, GLuint64, GL_TIMESTAMP, \
+    GL_QUERY_RESULT, GL_QUERY_RESULT_AVAILABLE, glGenQueries, glDeleteQueries, \
+    glQueryCounter, glGetQueryObjectiv, glGetQueryObjectui64v, glGetInteger64v
+
+from .gl_debug import debug_group
+
+CPU_TID = 1
+GPU_TID = 2
+
+
+class QueryPool:
+    """
+        Recycles GL query objects instead of creating them per frame.
+    """
+    def __init__(self, grow: int = 64):
+        self.grow = grow
+        self._free = []
+        self._all = []
+
+    def acquire(self) -> int:
+        if not self._free:
+            ids = (GLuint * self.grow)()
+            glGenQueries(self.grow, ids)
+            self._all.extend(ids)
+            self._free.extend(ids)
+        return self._free.pop()
+
+    def release(self, query_id: int) -> None:
+        self._free.append(query_id)
+
+    def destroy(self) -> None:
+        if self._all:
+            glDeleteQueries(len(self._all), (GLuint * len(self._all))(*self._all))
+        self._all.clear()
+        self._free.clear()
+
+
+class Scope:
+    """
+        One timed region of a frame.
+    """
+    __slots__ = ('name', 'depth', 'cpu_begin', 'cpu_end', 'query_begin',
+                 'query_end', 'gpu_begin', 'gpu_end')
+
+    def __init__(self, name: str, depth: int, cpu_begin: int, query_begin: int):
+        self.name = name
+        self.depth = depth
+        self.cpu_begin = cpu_begin
+        self.cpu_end = cpu_begin
+        self.query_begin = query_begin
+        self.query_end = 0
+        self.gpu_begin = None
+        self.gpu_end = None
+
+    @property
+    def cpu_ms(self) -> float:
+        return (self.cpu_end - self.cpu_begin) / 1e6
+
+    @property
+    def gpu_ms(self) -> float | None:
+        if self.gpu_begin is None:
+            return None
+        return (self.gpu_end - self.gpu_begin) / 1e6
+
+
+class GpuProfiler:
+    """
+        Collects nested CPU and GPU timings per frame.
+    """
+    def __init__(self, enabled: bool = True, max_frames: int = 1000):
+        """
+            Parameters:
+                enabled: a disabled profiler only costs the scope() call
+                max_frames: how many resolved frames are kept for export
+        """
+        self.enabled = enabled
+        self.frames = deque(maxlen=max_frames)
+        self._pool = QueryPool()
+        self._in_flight = deque()
+        self._scopes = None
+        self._last_query = 0
+        self._depth = 0
+        self._frame_index = 0
+        self._clock_offset = None
+
+    def _calibrate(self) -> None:
+        """
+            Map the GPU clock onto perf_counter_ns.
+        """
+        gpu_now = GLint64(0)
+        glGetInteger64v(GL_TIMESTAMP, gpu_now)
+        self._clock_offset = time.perf_counter_ns() - gpu_now.value
+
+    def begin_frame(self) -> None:
+        """
+            Start collecting scopes for a new frame.
+        """
+        if not self.enabled:
+            return
+        if self._clock_offset is None:
+            self._calibrate()
+        self._scopes = []
+        self._depth = 0
+
+    def end_frame(self) -> None:
+        """
+            Close the frame and collect older frames whose queries have
+            become available.
+        """
+        if not self.enabled or self._scopes is None:
+            return
+        if self._scopes:
+            self._in_flight.append((self._frame_index, self._scopes, self._last_query))
+        self._scopes = None
+        self._frame_index += 1
+        self.collect()
+
+    @contextmanager
+    def scope(self, name: str):
+        """
+            Time the body of a with block on the CPU and the GPU. In the
+            debug profile the body is also a debug group of that name.
+        """
+        with debug_group(name):
+            if not self.enabled or self._scopes is None:
+                yield
+                return
+            query_begin = self._pool.acquire()
+            glQueryCounter(query_begin, GL_TIMESTAMP)
+            scope = Scope(name, self._depth, time.perf_counter_ns(), query_begin)
+            self._scopes.append(scope)
+            self._depth += 1
+            try:
+                yield scope
+            finally:
+                self._depth -= 1
+                scope.cpu_end = time.perf_counter_ns()
+                scope.query_end = self._pool.acquire()
+                glQueryCounter(scope.query_end, GL_TIMESTAMP)
+                self._last_query = scope.query_end
+
+    def _result(self, query_id: int) -> int:
+        value = GLuint64(0)
+        glGetQueryObjectui64v(query_id, GL_QUERY_RESULT, value)
+        self._pool.release(query_id)
+        return value.value
+
+    def collect(self) -> int:
+        """
+            Read back every in-flight frame whose last query is available,
+            oldest first. Never waits for the GPU.
+            Returns:
+                The number of frames resolved
+        """
+        resolved = 0
+        available = GLint(0)
+        while self._in_flight:
+            frame_index, scopes, last_query = self._in_flight[0]
+            # Queries complete in order, the last one closes the frame
+            glGetQueryObjectiv(last_query, GL_QUERY_RESULT_AVAILABLE, available)
+            if not available.value:
+                break
+            self._in_flight.popleft()
+            for scope in scopes:
+                scope.gpu_begin = self._result(scope.query_begin) + self._clock_offset
+                scope.gpu_end = self._result(scope.query_end) + self._clock_offset
+            self.frames.append((frame_index, scopes))
+            resolved += 1
+        return resolved
+
+    def averages(self) -> dict:
+        """
+            Mean CPU and GPU time in ms per scope name over the kept frames.
+        """
+        totals = {}
+        for _, scopes in self.frames:
+            for scope in scopes:
+                cpu, gpu, count = totals.get(scope.name, (0.0, 0.0, 0))
+                totals[scope.name] = (cpu + scope.cpu_ms, gpu + scope.gpu_ms, count + 1)
+        return {name: {'cpu_ms': cpu / count, 'gpu_ms': gpu / count}
+                for name, (cpu, gpu, count) in totals.items()}
+
+    def chrome_trace(self) -> dict:
+        """
+            The kept frames as a Chrome trace event dictionary.
+        """
+        events = [
+            {'ph': 'M', 'pid': 1, 'tid': CPU_TID, 'name': 'thread_name', 'args': {'name': 'CPU'}},
+            {'ph': 'M', 'pid': 1, 'tid': GPU_TID, 'name': 'thread_name', 'args': {'name': 'GPU'}},
+        ]
+        for frame_index, scopes in self.frames:
+            for scope in scopes:
+                args = {'frame': frame_index}
+                events.append({'ph': 'X', 'pid': 1, 'tid': CPU_TID, 'name': scope.name,
+                               'ts': scope.cpu_begin / 1e3, 'dur': scope.cpu_ms * 1e3,
+                               'args': args})
+                events.append({'ph': 'X', 'pid': 1, 'tid': GPU_TID, 'name': scope.name,
+                               'ts': scope.gpu_begin / 1e3, 'dur': scope.gpu_ms * 1e3,
+                               'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, filepath: str) -> None:
+        """
+            Write the kept frames as Chrome trace JSON.
+        """
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def destroy(self) -> None:
+        """
+            Free the query objects.
+        """
+        self._in_flight.clear()
+        self._pool.destroy()
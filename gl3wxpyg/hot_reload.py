@@ -0,0 +1,202 @@
+''' Shader hot-reload. A background thread compares file modification
+times, so the draw loop pays nothing while no file changes. Changed
+stages are recompiled on their own and only the programs that use them
+are relinked; the new program replaces the old one between frames and
+a broken edit keeps the old program running.'''
+
+import logging
+import os
+import threading
+
+from pyglet.gl import glDeleteShader
+
+from .shaders import read_source
+
+log = logging.getLogger(__name__)
+
+
+class FileWatcher:
+    """
+        Polls the modification time of a set of files on a daemon thread
+        and reports changes through a callback.
+    """
+    def __init__(self, callback, interval: float = 0.5):
+        """
+            Parameters:
+                callback: called with a set of changed absolute paths. It
+                          runs on the watcher thread, wrap it with
+                          wx.CallAfter to get back to the UI thread.
+                interval: seconds between two checks
+        """
+        self.callback = callback
+        self.interval = interval
+        self._mtimes = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _mtime(path: str) -> int | None:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def watch(self, path: str) -> None:
+        """
+            Start watching a file.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            if path not in self._mtimes:
+                self._mtimes[path] = self._mtime(path)
+
+    def check(self) -> set:
+        """
+            Compare every file with its last known modification time.
+            Returns:
+                The set of files that changed since the last check
+        """
+        changed = set()
+        with self._lock:
+            for path, old in self._mtimes.items():
+                new = self._mtime(path)
+                # A missing file is usually an editor saving in between
+                if new is not None and new != old:
+                    self._mtimes[path] = new
+                    changed.add(path)
+        return changed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            changed = self.check()
+            if changed:
+                self.callback(changed)
+
+    def start(self) -> None:
+        """
+            Start the watcher thread.
+        """
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='FileWatcher', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+            Stop the watcher thread and wait for it.
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+
+class ReloadableProgram:
+    """
+        Book-keeping for one program built from shader files.
+    """
+    def __init__(self, name: str, files: dict, defines: dict | None):
+        self.name = name
+        # {shader type: absolute path}
+        self.files = files
+        self.defines = defines
+        # The last shader objects that compiled, {shader type: id}
+        self.shaders = {}
+        # Stages submitted since the last successful build. Their files
+        # changed after self.shaders was compiled, they are recompiled
+        # until a build succeeds
+        self.stale = set()
+
+
+class ShaderReloader:
+    """
+        Builds programs from files through a CompileQueue and rebuilds
+        only what is affected when some of the files change. All methods
+        need the GL context to be current.
+    """
+    def __init__(self, compile_queue):
+        """
+            Parameters:
+                compile_queue: the CompileQueue that builds the programs
+                               and owns them
+        """
+        self.compile_queue = compile_queue
+        self.programs = {}
+
+    @property
+    def files(self) -> set:
+        """
+            Every file used by a registered program.
+        """
+        return {path for program in self.programs.values() for path in program.files.values()}
+
+    def add_program(self, name: str, files: dict, defines: dict | None = None):
+        """
+            Register a program and submit its first build.
+            Parameters:
+                name: key of the program in the compile queue
+                files: {shader type: path to the source}
+                defines: optional {name: value} for every stage
+            Returns:
+                The PendingProgram of the first build
+        """
+        files = {shader_type: os.path.abspath(path) for shader_type, path in files.items()}
+        program = ReloadableProgram(name, files, defines)
+        self.programs[name] = program
+        return self._submit(program, set(files.values()))
+
+    def _submit(self, program: ReloadableProgram, changed: set):
+        # Stages without a working shader object, or whose edit has not
+        # built yet, are compiled as well
+        sources = {shader_type: read_source(path)
+                   for shader_type, path in program.files.items()
+                   if path in changed or shader_type not in program.shaders
+                   or shader_type in program.stale}
+        program.stale.update(sources)
+        compiled = {shader_type: shader_id
+                    for shader_type, shader_id in program.shaders.items()
+                    if shader_type not in sources}
+        pending = self.compile_queue.submit(program.name, sources, program.defines,
+                                            compiled=compiled, keep_shaders=True)
+        pending.on_ready = lambda _program: self._adopt(program, pending)
+        return pending
+
+    @staticmethod
+    def _adopt(program: ReloadableProgram, pending) -> None:
+        """
+            Keep the stages of a successful build for later relinks.
+        """
+        for shader_type, shader_id in pending.shaders.items():
+            old = program.shaders.get(shader_type)
+            if old is not None:
+                glDeleteShader(old)
+            program.shaders[shader_type] = shader_id
+        pending.shaders = {}
+        program.stale.clear()
+        log.info("Reloaded shader program '%s'", program.name)
+
+    def reload(self, changed) -> list:
+        """
+            Resubmit every program that uses one of the changed files.
+            Only the changed stages are compiled again.
+            Parameters:
+                changed: iterable of changed file paths
+            Returns:
+                The PendingPrograms that were submitted
+        """
+        changed = {os.path.abspath(path) for path in changed}
+        return [self._submit(program, changed)
+                for program in self.programs.values()
+                if changed.intersection(program.files.values())]
+
+    def destroy(self) -> None:
+        """
+            Delete the kept shader objects. The programs belong to the
+            compile queue.
+        """
+        for program in self.programs.values():
+            for shader_id in program.shaders.values():
+                glDeleteShader(shader_id)
+            program.shaders.clear()
+        self.programs.clear()
@@ -0,0 +1,182 @@
+''' Instanced drawing: per-instance attributes (offset, rotation, scale,
+colour, ...) live in one NumPy array that backs a vertex buffer with an
+attribute divisor of 1, and every instance of a mesh is drawn by a single
+glDrawArraysInstanced/glDrawElementsInstanced call. Writes go to the
+array and only the changed instance ranges are uploaded before drawing.'''
+
+from pyglet.gl import GL_ARRAY_BUFFER, GL_DYNAMIC_DRAW, GL_FLOAT, GL_FALSE, \
+    GL_TRIANGLES, GL_STATIC_DRAW, glBindVertexArray, glEnableVertexAttribArray, \
+    glVertexAttribPointer, glVertexAttribDivisor, glDrawArraysInstanced, \
+    glDrawElementsInstanced
+import numpy as np
+
+from .buffers import BufferObject, Mesh
+
+# Per-instance layout of the instanced shaders in shaders/
+DEFAULT_INSTANCE_ATTRIBUTES = (
+    ('offset', 2, 3),
+    ('rotation', 3, 1),
+    ('scale', 4, 1),
+    ('color', 5, 3),
+)
+# More separate dirty ranges than this are uploaded as one range
+MAX_DIRTY_RANGES = 8
+
+
+class InstanceBuffer:
+    """
+        Per-instance attributes in an interleaved float32 array and the
+        vertex buffer it is uploaded to.
+    """
+    def __init__(self, attributes=DEFAULT_INSTANCE_ATTRIBUTES, capacity: int = 1024,
+                 usage: int = GL_DYNAMIC_DRAW):
+        """
+            Parameters:
+                attributes: sequence of (name, location, components) in
+                            the order they are interleaved
+                capacity: instances to allocate, grows on demand
+                usage: usage hint for the vertex buffer
+        """
+        self.attributes = tuple(attributes)
+        self.components = sum(count for _, _, count in self.attributes)
+        self.stride = self.components * 4
+        self.count = 0
+        self.data = np.zeros((max(capacity, 1), self.components), dtype=np.float32)
+        self.vbo = BufferObject(GL_ARRAY_BUFFER, usage, size=self.data.nbytes)
+        self._columns = {}
+        start = 0
+        for name, _, count in self.attributes:
+            self._columns[name] = slice(start, start + count)
+            start += count
+        # Sorted, non-overlapping [first, last) instance ranges
+        self._dirty = []
+
+    @property
+    def capacity(self) -> int:
+        return len(self.data)
+
+    def attach(self, vao) -> None:
+        """
+            Add the attributes with a divisor of 1 to a vertex array.
+        """
+        glBindVertexArray(vao)
+        self.vbo.bind()
+        offset = 0
+        for _, location, count in self.attributes:
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, count, GL_FLOAT, GL_FALSE, self.stride, offset)
+            glVertexAttribDivisor(location, 1)
+            offset += count * 4
+        glBindVertexArray(0)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """
+            A writable view of one attribute of the active instances.
+            Call mark_dirty() for the rows changed through it.
+        """
+        return self.data[:self.count, self._columns[name]]
+
+    def resize(self, count: int) -> None:
+        """
+            Set the number of drawn instances. New instances are zero.
+        """
+        if count > self.capacity:
+            capacity = max(count, self.capacity * 2)
+            data = np.zeros((capacity, self.components), dtype=np.float32)
+            data[:self.count] = self.data[:self.count]
+            self.data = data
+            # Same buffer name, the vertex arrays stay valid
+            self.vbo.allocate(self.data.nbytes)
+            self._dirty = [(0, count)]
+        elif count > self.count:
+            self.data[self.count:count] = 0.0
+            self.mark_dirty(self.count, count)
+        self.count = count
+
+    def set(self, name: str, values, first: int = 0) -> None:
+        """
+            Write values of one attribute starting at instance first and
+            mark the range for upload.
+            Parameters:
+                name: attribute name
+                values: one row of components per instance
+                first: index of the first instance to overwrite
+        """
+        column = self._columns[name]
+        values = np.asarray(values, dtype=np.float32).reshape(-1, column.stop - column.start)
+        last = first + len(values)
+        if first < 0 or last > self.count:
+            raise IndexError(f"Instances {first}:{last} are outside of 0:{self.count}")
+        self.data[first:last, column] = values
+        self.mark_dirty(first, last)
+
+    def mark_dirty(self, first: int, last: int | None = None) -> None:
+        """
+            Upload the instances first to last (exclusive) before the
+            next draw. Overlapping and adjacent ranges are merged.
+        """
+        if last is None:
+            last = first + 1
+        ranges = []
+        for start, stop in self._dirty:
+            if stop < first or start > last:
+                ranges.append((start, stop))
+            else:
+                first, last = min(first, start), max(last, stop)
+        ranges.append((first, last))
+        ranges.sort()
+        if len(ranges) > MAX_DIRTY_RANGES:
+            # Many small uploads cost more than one bigger one
+            ranges = [(ranges[0][0], ranges[-1][1])]
+        self._dirty = ranges
+
+    def flush(self) -> int:
+        """
+            Upload the dirty ranges.
+                Returns:
+                    Number of instances uploaded
+        """
+        uploaded = 0
+        for first, last in self._dirty:
+            self.vbo.set_sub_data(self.data[first:last], first * self.stride)
+            uploaded += last - first
+        self._dirty = []
+        return uploaded
+
+    def destroy(self) -> None:
+        self.vbo.destroy()
+
+
+class InstancedMesh(Mesh):
+    """
+        A mesh drawn once per instance of its instance buffer.
+    """
+    def __init__(self, vertices, attributes, instance_attributes=DEFAULT_INSTANCE_ATTRIBUTES,
+                 indices=None, capacity: int = 1024, mode: int = GL_TRIANGLES,
+                 usage: int = GL_STATIC_DRAW):
+        """
+            Parameters:
+                vertices, attributes, indices, mode, usage: see Mesh
+                instance_attributes: see InstanceBuffer
+                capacity: instances to allocate up front
+        """
+        super().__init__(vertices, attributes, indices, mode, usage)
+        self.instances = InstanceBuffer(instance_attributes, capacity)
+        self.instances.attach(self.vao)
+
+    def draw(self) -> None:
+        """
+            Upload changed instances and draw all of them with one call.
+        """
+        self.instances.flush()
+        count = self.instances.count
+        if not count:
+            return
+        if self.ibo is not None:
+            glDrawElementsInstanced(self.mode, self.index_count, self.index_type, 0, count)
+        else:
+            glDrawArraysInstanced(self.mode, 0, self.vertex_count, count)
+
+    def destroy(self) -> None:
+        super().destroy()
+        self.instances.destroy()
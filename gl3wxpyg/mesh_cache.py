@@ -0,0 +1,195 @@
+''' A cache of procedural meshes keyed by generator name and parameters.
+Every user of identical geometry gets the same Mesh, so opening many
+viewers of one part generates and uploads it once. Meshes are reference
+counted; under a byte budget the least recently used ones lose their
+CPU-side arrays first and, once nobody uses them, their GPU buffers.
+GL objects are not shared between unrelated contexts: use one cache per
+context, or per group of contexts created with a shared context.'''
+
+from collections import OrderedDict
+import inspect
+import logging
+
+from . import geometry
+from .buffers import Mesh
+from .geometry import INTERLEAVED_ATTRIBUTES
+
+log = logging.getLogger(__name__)
+
+GENERATORS = {
+    'torus': geometry.torus,
+    'sphere': geometry.sphere,
+    'cylinder': geometry.cylinder,
+    'cone': geometry.cone,
+    'cube': geometry.cube,
+    'grid': geometry.grid,
+}
+
+
+class CacheEntry:
+    """
+        The geometry and mesh of one key.
+    """
+    __slots__ = ('key', 'geometry', 'mesh', 'refs')
+
+    def __init__(self, key: tuple, arrays: geometry.Geometry):
+        self.key = key
+        self.geometry = arrays
+        self.mesh = None
+        self.refs = 0
+
+    @property
+    def cpu_bytes(self) -> int:
+        return self.geometry.nbytes if self.geometry is not None else 0
+
+    @property
+    def gpu_bytes(self) -> int:
+        if self.mesh is None:
+            return 0
+        return self.mesh.vbo.nbytes + (self.mesh.ibo.nbytes if self.mesh.ibo is not None else 0)
+
+
+class MeshCache:
+    """
+        Shares generated geometry and its GPU buffers between users.
+    """
+    def __init__(self, budget: int = 64 * 2**20, generators: dict | None = None):
+        """
+            Parameters:
+                budget: bytes of CPU arrays plus GPU buffers to keep. Meshes
+                        in use are never freed, they may exceed it.
+                generators: name -> function returning a Geometry, by
+                            default the ones of gl3wxpyg.geometry
+        """
+        self.budget = budget
+        self.generators = dict(GENERATORS if generators is None else generators)
+        # Least recently used first
+        self._entries = OrderedDict()
+        self._by_mesh = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry.cpu_bytes + entry.gpu_bytes for entry in self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, name: str, **params) -> tuple:
+        """
+            The cache key of a generator call. Defaults are filled in,
+            so torus() and torus(slices=50) share an entry.
+        """
+        try:
+            generator = self.generators[name]
+        except KeyError:
+            raise KeyError(f"Unknown geometry generator {name!r}") from None
+        bound = inspect.signature(generator).bind(**params)
+        bound.apply_defaults()
+        return (name, tuple(sorted(bound.arguments.items())))
+
+    def _entry(self, name: str, params: dict) -> CacheEntry:
+        key = self.key(name, **params)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = CacheEntry(key, self.generators[name](**params))
+            self._entries[key] = entry
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return entry
+
+    def get_geometry(self, name: str, **params) -> geometry.Geometry:
+        """
+            The CPU-side arrays of a generator call. They may be evicted
+            later, keep the returned object as long as you need it.
+        """
+        entry = self._entry(name, params)
+        if entry.geometry is None:
+            entry.geometry = self.generators[name](**params)
+        # Eviction may drop this very entry when it alone exceeds the budget
+        result = entry.geometry
+        self._evict()
+        return result
+
+    def acquire(self, name: str, **params) -> Mesh:
+        """
+            The shared mesh of a generator call, uploaded on first use.
+            Hand it back with release() instead of destroying it.
+            Needs the cache's context to be current.
+            Parameters:
+                name: generator name, e.g. 'torus'
+                params: keyword arguments of the generator
+            Returns:
+                A mesh with the attribute layout INTERLEAVED_ATTRIBUTES
+        """
+        entry = self._entry(name, params)
+        if entry.mesh is None:
+            # Only entries from get_geometry() have no mesh, they keep their arrays
+            entry.mesh = Mesh(entry.geometry.interleaved(), INTERLEAVED_ATTRIBUTES,
+                              entry.geometry.indices)
+            self._by_mesh[id(entry.mesh)] = entry
+        entry.refs += 1
+        self._evict()
+        return entry.mesh
+
+    def release(self, mesh: Mesh) -> None:
+        """
+            Give back a mesh from acquire(). It stays cached until the
+            budget needs the space.
+        """
+        entry = self._by_mesh.get(id(mesh))
+        if entry is None or entry.refs <= 0:
+            raise ValueError("Mesh was not acquired from this cache")
+        entry.refs -= 1
+        self._evict()
+
+    def _evict(self) -> None:
+        total = self.nbytes
+        if total <= self.budget:
+            return
+        for key, entry in list(self._entries.items()):
+            if total <= self.budget:
+                break
+            if entry.refs == 0:
+                total -= entry.cpu_bytes + entry.gpu_bytes
+                self._drop(entry)
+                del self._entries[key]
+            elif entry.geometry is not None and entry.mesh is not None:
+                # In use, but the arrays are on the GPU already
+                total -= entry.cpu_bytes
+                entry.geometry = None
+            else:
+                continue
+            self.evictions += 1
+        if total > self.budget:
+            log.debug("Mesh cache holds %d bytes in use, over its budget of %d",
+                      total, self.budget)
+
+    def _drop(self, entry: CacheEntry) -> None:
+        if entry.mesh is not None:
+            del self._by_mesh[id(entry.mesh)]
+            entry.mesh.destroy()
+            entry.mesh = None
+        entry.geometry = None
+
+    def clear(self) -> None:
+        """
+            Free every mesh nobody uses.
+        """
+        for key, entry in list(self._entries.items()):
+            if entry.refs == 0:
+                self._drop(entry)
+                del self._entries[key]
+
+    def destroy(self) -> None:
+        """
+            Free all meshes, also the ones still in use. Needs the
+            cache's context to be current.
+        """
+        for entry in self._entries.values():
+            self._drop(entry)
+        self._entries.clear()
@@ -0,0 +1,207 @@
+''' Offscreen rendering without wx or a display. A pyglet context is
+created from a hidden window, or from EGL in pyglet's headless mode on
+machines without a display (Mesa llvmpipe works), and every frame is
+rendered into a framebuffer object that can be read back into NumPy.
+Call gl3wxpyg.options.configure() before this module is imported.'''
+
+import queue
+
+import pyglet
+from pyglet.gl import GLuint, GL_FRAMEBUFFER, GL_RENDERBUFFER, GL_RGBA8, \
+    GL_DEPTH24_STENCIL8, GL_COLOR_ATTACHMENT0, GL_DEPTH_STENCIL_ATTACHMENT, \
+    GL_FRAMEBUFFER_COMPLETE, GL_RGBA, GL_UNSIGNED_BYTE, GL_PACK_ALIGNMENT, \
+    glGenFramebuffers, glBindFramebuffer, glDeleteFramebuffers, \
+    glGenRenderbuffers, glBindRenderbuffer, glRenderbufferStorage, \
+    glDeleteRenderbuffers, glFramebufferRenderbuffer, glCheckFramebufferStatus, \
+    glViewport, glReadPixels, glPixelStorei, glFinish
+from pyglet.gl.lib import GLException
+import numpy as np
+
+from . import options
+from .options import needs_headless
+
+
+def create_context(core: bool = True):
+    """
+        Create a 3.3 core context that is not shown on screen. Whether
+        it comes from EGL (headless) or a hidden window depends on
+        pyglet.options['headless'], see gl3wxpyg.options.configure().
+            Parameters:
+                core: False asks for the driver's default context, a
+                      compatibility profile with the fixed-function
+                      pipeline on most drivers
+            Returns:
+                The pyglet window that owns the current context
+    """
+    if needs_headless() and not pyglet.options['headless']:
+        raise RuntimeError("No display available, call gl3wxpyg.options.configure() "
+                           "before importing pyglet.gl")
+    # Imported late, pyglet.window opens the display on import
+    from pyglet.window import Window
+
+    # Some drivers only report debug messages in a debug context
+    debug = options.profile() == 'debug'
+    if core:
+        config = pyglet.gl.Config(major_version=3, minor_version=3, forward_compatible=True,
+                                  double_buffer=False, depth_size=24, debug=debug)
+    else:
+        config = pyglet.gl.Config(double_buffer=False, depth_size=24, debug=debug)
+    window = Window(width=1, height=1, visible=False, config=config)
+    window.switch_to()
+    return window
+
+
+class Framebuffer:
+    """
+        A framebuffer object with an RGBA8 colour and a depth/stencil
+        renderbuffer.
+    """
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.fbo = GLuint(0)
+        self.color = GLuint(0)
+        self.depth = GLuint(0)
+        glGenFramebuffers(1, self.fbo)
+        glGenRenderbuffers(1, self.color)
+        glGenRenderbuffers(1, self.depth)
+        self._allocate()
+
+    def _allocate(self) -> None:
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, self.width, self.height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH24_STENCIL8, self.width, self.height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_STENCIL_ATTACHMENT,
+                                  GL_RENDERBUFFER, self.depth)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            raise GLException(f"Framebuffer incomplete: 0x{status:x}")
+
+    def bind(self) -> None:
+        """
+            Render into this framebuffer.
+        """
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+
+    def resize(self, width: int, height: int) -> None:
+        """
+            Reallocate the attachments, the content is lost.
+        """
+        self.width = width
+        self.height = height
+        self._allocate()
+
+    def read_pixels(self, out: np.ndarray | None = None) -> np.ndarray:
+        """
+            Read the colour attachment into an (height, width, 4) uint8
+            array. Row 0 is the top row, like an image.
+            Parameters:
+                out: optional C-contiguous array of that shape to reuse
+        """
+        if out is None:
+            out = np.empty((self.height, self.width, 4), dtype=np.uint8)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, out.ctypes.data)
+        # OpenGL starts at the bottom row
+        return out[::-1]
+
+    def destroy(self) -> None:
+        glDeleteFramebuffers(1, self.fbo)
+        glDeleteRenderbuffers(1, self.color)
+        glDeleteRenderbuffers(1, self.depth)
+
+
+class OffscreenSurface:
+    """
+        Stands in for the wx canvas of a scene: it owns the context and
+        the render target and provides the same hooks (get_aspect,
+        swap_buffers, make_current, request_redraw, call_after).
+        Combine it with a scene class, scene first:
+
+            class HeadlessTriangle(TriangleScene, OffscreenSurface): ...
+    """
+    def __init__(self, width: int = 640, height: int = 480):
+        self.window = create_context()
+        self.framebuffer = Framebuffer(width, height)
+        self.size = (width, height)
+        self.aspect = width / height
+        self.frames = 0
+        self.redraw_requested = False
+        # Filled from other threads, e.g. a FileWatcher
+        self._calls = queue.SimpleQueue()
+        self.init = False
+
+    def get_aspect(self) -> float:
+        return self.aspect
+
+    def make_current(self) -> None:
+        self.window.switch_to()
+        self.framebuffer.bind()
+
+    def swap_buffers(self) -> None:
+        # Nothing to present, just count the frame
+        self.frames += 1
+
+    def request_redraw(self) -> None:
+        self.redraw_requested = True
+
+    def call_after(self, func, *args) -> None:
+        """
+            Run func on the render thread before the next frame. The
+            same role wx.CallAfter plays for the wx canvas.
+        """
+        self._calls.put((func, args))
+
+    def set_size(self, width: int, height: int) -> None:
+        """
+            Resize the render target.
+        """
+        self.make_current()
+        self.framebuffer.resize(width, height)
+        self.size = (width, height)
+        self.aspect = width / height
+        glViewport(0, 0, width, height)
+
+    def render_frame(self, finish: bool = False) -> None:
+        """
+            Initialise the scene if needed and draw one frame.
+            Parameters:
+                finish: wait for the GPU to complete the frame, e.g. for
+                        timing the whole frame
+        """
+        self.make_current()
+        while True:
+            try:
+                func, args = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            func(*args)
+        if not self.init:
+            self.init_gl()
+            self.init = True
+            glViewport(0, 0, *self.size)
+        self.redraw_requested = False
+        self.on_draw()
+        if finish:
+            glFinish()
+
+    def read_pixels(self, out: np.ndarray | None = None) -> np.ndarray:
+        """
+            The last rendered frame as an (height, width, 4) uint8 array.
+        """
+        return self.framebuffer.read_pixels(out)
+
+    def close(self) -> None:
+        """
+            Free the scene, the render target and the context.
+        """
+        self.make_current()
+        if self.init:
+            self.destroy()
+        self.framebuffer.destroy()
+        self.window.close()
@@ -0,0 +1,59 @@
+''' pyglet options that have to be set before pyglet.gl is imported.
+Import this module and call configure() first thing in an entry point,
+every other module of the package imports pyglet.gl.'''
+
+import os
+import sys
+
+import pyglet
+
+# production: no error checks at all. debug: the driver reports errors
+# and warnings through a KHR_debug callback, see gl3wxpyg.gl_debug
+PROFILES = ('production', 'debug')
+PROFILE_ENV = 'GL3WXPYG_PROFILE'
+
+_profile = None
+
+
+def needs_headless() -> bool:
+    """
+        True on Linux when there is no X11 or Wayland display to use.
+    """
+    return (sys.platform.startswith('linux')
+            and not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'))
+
+
+def profile() -> str:
+    """
+        The GL profile given to configure(), or the one it would pick.
+    """
+    if _profile is not None:
+        return _profile
+    return os.environ.get(PROFILE_ENV) or 'production'
+
+
+def configure(headless: bool | None = None, profile: str | None = None) -> None:
+    """
+        Set the pyglet options for this package.
+            Parameters:
+                headless: create contexts through EGL without a display,
+                          by default only if no display is available
+                profile: one of PROFILES, by default GL3WXPYG_PROFILE or
+                         production
+    """
+    global _profile
+    if 'pyglet.gl' in sys.modules:
+        raise RuntimeError("gl3wxpyg.options.configure() has to run before pyglet.gl is imported")
+    if profile is None:
+        profile = os.environ.get(PROFILE_ENV) or 'production'
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown GL profile {profile!r}, expected one of {', '.join(PROFILES)}")
+    _profile = profile
+    # pyglet's default glGetError after every call doubles the round-trips
+    # to the driver. macOS has no KHR_debug, there debug falls back to it
+    pyglet.options['debug_gl'] = profile == 'debug' and sys.platform == 'darwin'
+    if headless is None:
+        headless = needs_headless()
+    pyglet.options['headless'] = headless
+    # wx and the offscreen backend create their own contexts
+    pyglet.options['shadow_window'] = False
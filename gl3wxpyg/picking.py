@@ -0,0 +1,251 @@
+''' Object picking through an ID buffer. A pick pass draws the scene
+again with every object writing its id into an unsigned integer
+framebuffer, but only inside a scissor rectangle of a few pixels around
+the cursor, so its fill cost does not depend on the window size. The
+ids under the cursor are copied into a pixel pack buffer, which returns
+at once, and read on a later frame when a fence says the copy is done.
+Hover picking never waits for the GPU, and the readback is a handful of
+pixels however many objects there are.
+
+Shaders write the id as 'out uint' to colour attachment 0, see
+shaders/pick_fragment.glsl and the PICKING define of
+shaders/instanced_vertex.glsl. Id 0 means no object.'''
+
+import ctypes
+import logging
+from collections import deque
+
+from pyglet.gl import GLuint, GL_FRAMEBUFFER, GL_RENDERBUFFER, GL_R32UI, \
+    GL_DEPTH_COMPONENT24, GL_COLOR_ATTACHMENT0, GL_DEPTH_ATTACHMENT, GL_FRAMEBUFFER_COMPLETE, \
+    GL_COLOR, GL_DEPTH_BUFFER_BIT, GL_SCISSOR_TEST, GL_PIXEL_PACK_BUFFER, GL_STREAM_READ, \
+    GL_RED_INTEGER, GL_UNSIGNED_INT, GL_PACK_ALIGNMENT, GL_MAP_READ_BIT, \
+    GL_SYNC_GPU_COMMANDS_COMPLETE, GL_SYNC_FLUSH_COMMANDS_BIT, GL_ALREADY_SIGNALED, \
+    GL_CONDITION_SATISFIED, glGenFramebuffers, glBindFramebuffer, glDeleteFramebuffers, \
+    glGenRenderbuffers, glBindRenderbuffer, glRenderbufferStorage, glDeleteRenderbuffers, \
+    glFramebufferRenderbuffer, glCheckFramebufferStatus, glClearBufferuiv, glClear, \
+    glEnable, glDisable, glScissor, glReadBuffer, glReadPixels, glPixelStorei, \
+    glBindBuffer, glMapBufferRange, glUnmapBuffer, glFenceSync, glClientWaitSync, \
+    glDeleteSync
+from pyglet.gl.lib import GLException
+import numpy as np
+
+from .buffers import BufferObject
+from .streaming import have_sync_objects
+
+log = logging.getLogger(__name__)
+
+
+class PickResult:
+    """
+        The object under a window position, as drawn frame `frame` of
+        the pick buffer.
+    """
+    __slots__ = ('x', 'y', 'object_id', 'frame')
+
+    def __init__(self, x: int, y: int, object_id: int, frame: int):
+        self.x = x
+        self.y = y
+        self.object_id = object_id
+        self.frame = frame
+
+    def __repr__(self):
+        return f"PickResult(x={self.x}, y={self.y}, object_id={self.object_id}, frame={self.frame})"
+
+
+class _Request:
+    __slots__ = ('buffer', 'fence', 'x', 'y', 'region', 'frame')
+
+    def __init__(self, buffer: BufferObject, fence, x: int, y: int, region: tuple, frame: int):
+        self.buffer = buffer
+        self.fence = fence
+        self.x = x
+        self.y = y
+        # x, y, width, height of the pixels read
+        self.region = region
+        self.frame = frame
+
+
+class PickBuffer:
+    """
+        An R32UI colour and a depth renderbuffer of the window size, and
+        a few pack buffers for requests in flight. One pick per frame:
+        begin(), draw the pickable objects, end(), and poll() on a later
+        frame.
+    """
+    def __init__(self, width: int, height: int, max_radius: int = 8, slots: int = 3,
+                 fences: bool | None = None):
+        """
+            Parameters:
+                width, height: size of the window framebuffer
+                max_radius: largest pick radius in pixels
+                slots: requests in flight, older ones are dropped
+                fences: check readbacks with sync objects, by default if
+                        available. Without, poll() maps the requests of
+                        earlier frames at once and may wait for them
+        """
+        self.width = width
+        self.height = height
+        self.max_radius = max_radius
+        self.fences = have_sync_objects() if fences is None else fences
+        self.fbo = GLuint(0)
+        self.ids = GLuint(0)
+        self.depth = GLuint(0)
+        glGenFramebuffers(1, self.fbo)
+        glGenRenderbuffers(1, self.ids)
+        glGenRenderbuffers(1, self.depth)
+        self._allocate()
+
+        side = 2 * max_radius + 1
+        self._free = deque(BufferObject(GL_PIXEL_PACK_BUFFER, GL_STREAM_READ, size=side * side * 4)
+                           for _ in range(slots))
+        self._pending = deque()
+        self._region = None
+        self._cursor = None
+        self.frame = 0
+        # Requests given up because all slots were in flight
+        self.dropped = 0
+        # The newest result returned by poll()
+        self.result = None
+
+    def _allocate(self) -> None:
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.ids)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_R32UI, self.width, self.height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.ids)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, self.width, self.height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            raise GLException(f"Pick framebuffer incomplete: 0x{status:x}")
+
+    @property
+    def pending(self) -> int:
+        """
+            Requests whose result has not been returned yet.
+        """
+        return len(self._pending)
+
+    def resize(self, width: int, height: int) -> None:
+        """
+            Reallocate for a new window size, requests in flight are
+            dropped.
+        """
+        self.width = width
+        self.height = height
+        self._allocate()
+        while self._pending:
+            self._release(self._pending.popleft())
+
+    def begin(self, x: int, y: int, radius: int = 0) -> bool:
+        """
+            Bind the pick framebuffer and clear the pixels around a
+            window position. Draw the pickable objects with their ids
+            next, with the depth test on, and call end().
+            Parameters:
+                x, y: window position in framebuffer pixels, y up from
+                      the bottom like glReadPixels
+                radius: also pick objects this many pixels off the
+                        position, the nearest one wins
+            Returns:
+                False if the position is outside of the window, nothing
+                needs to be drawn then
+        """
+        radius = min(radius, self.max_radius)
+        left, bottom = max(x - radius, 0), max(y - radius, 0)
+        right, top = min(x + radius + 1, self.width), min(y + radius + 1, self.height)
+        if left >= right or bottom >= top:
+            self._region = None
+            return False
+        self._region = (left, bottom, right - left, top - bottom)
+        self._cursor = (x, y)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        # Nothing outside of the region is shaded or cleared
+        glEnable(GL_SCISSOR_TEST)
+        glScissor(*self._region)
+        glClearBufferuiv(GL_COLOR, 0, (GLuint * 4)())
+        glClear(GL_DEPTH_BUFFER_BIT)
+        return True
+
+    def end(self, framebuffer: int = 0) -> None:
+        """
+            Start copying the ids of the region into a pack buffer and
+            bind framebuffer again. Returns without waiting for the copy.
+        """
+        if self._region is None:
+            return
+        if not self._free:
+            # Never wait for a slot, the oldest request is stale anyway
+            self._release(self._pending.popleft())
+            self.dropped += 1
+        buffer = self._free.popleft()
+        buffer.bind()
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+        glPixelStorei(GL_PACK_ALIGNMENT, 4)
+        # Into the bound pack buffer at offset 0, not into client memory
+        glReadPixels(*self._region, GL_RED_INTEGER, GL_UNSIGNED_INT, 0)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0) if self.fences else None
+        self._pending.append(_Request(buffer, fence, *self._cursor, self._region, self.frame))
+        glDisable(GL_SCISSOR_TEST)
+        glBindFramebuffer(GL_FRAMEBUFFER, framebuffer)
+        self._region = None
+        self.frame += 1
+
+    def _release(self, request: _Request) -> None:
+        if request.fence is not None:
+            glDeleteSync(request.fence)
+        self._free.append(request.buffer)
+
+    def _read(self, request: _Request) -> PickResult:
+        left, bottom, width, height = request.region
+        count = width * height
+        request.buffer.bind()
+        pointer = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, count * 4, GL_MAP_READ_BIT)
+        ids = np.ctypeslib.as_array(ctypes.cast(pointer, ctypes.POINTER(ctypes.c_uint32)),
+                                    (height, width)).copy()
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+        object_id = 0
+        rows, columns = np.nonzero(ids)
+        if len(rows):
+            # The hit nearest to the cursor
+            distances = (columns + left - request.x) ** 2 + (rows + bottom - request.y) ** 2
+            nearest = np.argmin(distances)
+            object_id = int(ids[rows[nearest], columns[nearest]])
+        return PickResult(request.x, request.y, object_id, request.frame)
+
+    def poll(self) -> PickResult | None:
+        """
+            Read the requests whose copy has finished, never blocks with
+            fences.
+            Returns:
+                The newest finished result, None if none finished since
+                the last call
+        """
+        result = None
+        while self._pending:
+            request = self._pending[0]
+            if request.fence is not None:
+                status = glClientWaitSync(request.fence, GL_SYNC_FLUSH_COMMANDS_BIT, 0)
+                if status not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+                    break
+            self._pending.popleft()
+            result = self._read(request)
+            self._release(request)
+        if result is not None:
+            self.result = result
+        return result
+
+    def destroy(self) -> None:
+        while self._pending:
+            self._release(self._pending.popleft())
+        for buffer in self._free:
+            buffer.destroy()
+        self._free.clear()
+        glDeleteFramebuffers(1, self.fbo)
+        glDeleteRenderbuffers(1, self.ids)
+        glDeleteRenderbuffers(1, self.depth)
@@ -0,0 +1,95 @@
+''' Render-on-demand frame scheduling for wx canvases. Input, resize and
+scene changes only mark the canvas dirty; at most one repaint is queued
+and it is held back until one display refresh has passed since the last
+frame. An optional continuous mode keeps rendering at a target FPS.'''
+
+import time
+
+import wx
+
+
+def display_refresh_rate(window: wx.Window, default: float = 60.0) -> float:
+    """
+        Refresh rate of the display showing window, default if unknown.
+    """
+    index = wx.Display.GetFromWindow(window)
+    if index == wx.NOT_FOUND:
+        return default
+    refresh = wx.Display(index).GetCurrentMode().refresh
+    return float(refresh) if refresh > 0 else default
+
+
+class FrameScheduler:
+    """
+        Coalesces redraw requests of one window into at most one paint
+        per display refresh.
+    """
+    def __init__(self, window: wx.Window, refresh_rate: float | None = None):
+        """
+            Parameters:
+                window: the canvas to repaint with Refresh(False)
+                refresh_rate: frames per second at most, defaults to the
+                              refresh rate of the display
+        """
+        self.window = window
+        self.min_interval = 1.0 / (refresh_rate or display_refresh_rate(window))
+        self.continuous_fps = None
+        self.dirty = False
+        # Requests versus rendered frames shows how much was coalesced
+        self.requests = 0
+        self.frames = 0
+        self._pending = None
+        self._last_frame = 0.0
+
+    def invalidate(self) -> None:
+        """
+            Mark the window dirty. Cheap, call it for every event.
+        """
+        self.requests += 1
+        self.dirty = True
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._pending is not None:
+            # A repaint is queued already, it will pick this change up
+            return
+        interval = self.min_interval
+        if self.continuous_fps:
+            interval = max(interval, 1.0 / self.continuous_fps)
+        delay = self._last_frame + interval - time.perf_counter()
+        self._pending = wx.CallLater(max(1, int(delay * 1000)), self._fire)
+
+    def _fire(self) -> None:
+        self._pending = None
+        if self.dirty and self.window:
+            self.window.Refresh(False)
+
+    def frame_rendered(self) -> None:
+        """
+            Tell the scheduler a frame was drawn. Call it from the paint
+            handler, also for paints the scheduler did not ask for.
+        """
+        self.frames += 1
+        self._last_frame = time.perf_counter()
+        self.dirty = False
+        if self.continuous_fps:
+            self.dirty = True
+            self._schedule()
+
+    def set_continuous(self, fps: float | None) -> None:
+        """
+            Render continuously at fps (capped by the refresh rate), or
+            go back to render on demand with None.
+        """
+        self.continuous_fps = fps
+        if fps:
+            self.invalidate()
+
+    def stop(self) -> None:
+        """
+            Cancel a queued repaint, e.g. before the window is destroyed.
+        """
+        self.continuous_fps = None
+        if self._pending is not None:
+            self._pending.Stop()
+            self._pending = None
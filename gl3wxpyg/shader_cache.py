@@ -0,0 +1,217 @@
+''' Persistent cache of linked program binaries. A cold compile of
+every shader variant dominates the time to the first frame, loading
+the driver's binary back with glProgramBinary skips it entirely.'''
+
+import ctypes
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+
+from pyglet.gl import GLint, GLenum, GLsizei, GLubyte, GL_TRUE, GL_VENDOR, \
+    GL_RENDERER, GL_VERSION, GL_LINK_STATUS, GL_PROGRAM_BINARY_LENGTH, \
+    GL_NUM_PROGRAM_BINARY_FORMATS, glGetString, glGetIntegerv, glGetProgramiv, \
+    glGetProgramBinary, glProgramBinary, glCreateProgram, glDeleteProgram
+from pyglet.gl.lib import GLException, MissingFunctionException
+
+from .shaders import ShaderProgram, build_program
+
+log = logging.getLogger(__name__)
+
+# Magic, format version, binary format enum
+_HEADER = struct.Struct('<4sII')
+_MAGIC = b'GLPB'
+_FILE_VERSION = 1
+
+
+def default_cache_dir() -> str:
+    """
+        The per-user cache directory, $XDG_CACHE_HOME is respected.
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'gl3wxpyg', 'programs')
+
+
+def gl_string(name: int) -> str:
+    """
+        Read a glGetString value as str.
+    """
+    value = glGetString(name)
+    if not value:
+        return ''
+    return ctypes.cast(value, ctypes.c_char_p).value.decode('utf-8', errors='replace')
+
+
+class ProgramBinaryCache:
+    """
+        Stores glGetProgramBinary output on disk, keyed by a hash of
+        the sources, the defines and the GL vendor/renderer/version.
+    """
+    def __init__(self, directory: str | None = None):
+        """
+            Parameters:
+                directory: where the binaries are stored, the default
+                           is default_cache_dir()
+        """
+        self.directory = directory or default_cache_dir()
+        self.hits = 0
+        self.misses = 0
+        self._driver = None
+        self._supported = None
+
+    @property
+    def supported(self) -> bool:
+        """
+            True if the current context can hand out program binaries.
+        """
+        if self._supported is None:
+            formats = GLint(0)
+            try:
+                glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS, formats)
+            except (GLException, MissingFunctionException):
+                # Unknown enum before GL 4.1 / ARB_get_program_binary
+                pass
+            self._supported = formats.value > 0
+        return self._supported
+
+    def key(self, sources: dict, defines: dict | None = None) -> str:
+        """
+            The cache key for a set of {shader type: source} and defines.
+        """
+        if self._driver is None:
+            self._driver = (gl_string(GL_VENDOR), gl_string(GL_RENDERER), gl_string(GL_VERSION))
+        description = {
+            'driver': self._driver,
+            'sources': sorted((int(stage), source) for stage, source in sources.items()),
+            'defines': sorted((str(k), str(v)) for k, v in (defines or {}).items()),
+        }
+        blob = json.dumps(description, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(blob).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.bin')
+
+    def load(self, key: str) -> int | None:
+        """
+            Create a program from the cached binary.
+            Returns:
+                The linked program handle, or None if there is no
+                usable entry. Rejected entries are removed.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(_HEADER.size)
+                data = f.read()
+        except OSError:
+            return None
+
+        if len(header) != _HEADER.size or not data:
+            self._discard(path)
+            return None
+        magic, version, binary_format = _HEADER.unpack(header)
+        if magic != _MAGIC or version != _FILE_VERSION:
+            self._discard(path)
+            return None
+
+        program_id = glCreateProgram()
+        status = GLint(0)
+        try:
+            glProgramBinary(program_id, binary_format, data, len(data))
+            glGetProgramiv(program_id, GL_LINK_STATUS, status)
+        except GLException:
+            # The format itself is unknown to this driver
+            pass
+        if status.value != GL_TRUE:
+            # Usually a driver update, the binary is no longer accepted
+            log.info("Cached program binary %s was rejected", key)
+            glDeleteProgram(program_id)
+            self._discard(path)
+            return None
+        return program_id
+
+    def store(self, key: str, program_id: int) -> bool:
+        """
+            Write the binary of a linked program to the cache.
+            Returns:
+                True if the binary was written
+        """
+        length = GLint(0)
+        glGetProgramiv(program_id, GL_PROGRAM_BINARY_LENGTH, length)
+        if length.value <= 0:
+            return False
+        data = (GLubyte * length.value)()
+        written = GLsizei(0)
+        binary_format = GLenum(0)
+        glGetProgramBinary(program_id, length.value, written, binary_format, data)
+
+        tmp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write to a temporary file first so a crash never leaves
+            # a truncated entry behind
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, _FILE_VERSION, binary_format.value))
+                f.write(bytes(data)[:written.value])
+            os.replace(tmp_path, self._path(key))
+        except OSError as err:
+            log.warning("Could not write program binary cache: %s", err)
+            if tmp_path is not None:
+                self._discard(tmp_path)
+            return False
+        return True
+
+    @staticmethod
+    def _discard(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def lookup(self, sources: dict, defines: dict | None = None) -> tuple:
+        """
+            Load the cached program of a set of sources and count the hit
+            or miss. Build it with retrievable=True on a miss and store()
+            it under the returned key.
+            Returns:
+                The key and the linked program handle, None on a miss
+        """
+        key = self.key(sources, defines)
+        program_id = self.load(key)
+        if program_id is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return key, program_id
+
+    def load_program(self, sources: dict, defines: dict | None = None) -> ShaderProgram:
+        """
+            Return a program for the sources, loaded from the cache if
+            possible and compiled (then cached) otherwise.
+            Parameters:
+                sources: {shader type: source code}
+                defines: optional {name: value} inserted after #version
+        """
+        if not self.supported:
+            return ShaderProgram(build_program(sources, defines))
+
+        key, program_id = self.lookup(sources, defines)
+        if program_id is not None:
+            return ShaderProgram(program_id)
+
+        program_id = build_program(sources, defines, retrievable=True)
+        self.store(key, program_id)
+        return ShaderProgram(program_id)
+
+    def clear(self) -> None:
+        """
+            Remove every cached binary.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.bin'):
+                self._discard(os.path.join(self.directory, name))
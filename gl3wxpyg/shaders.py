@@ -0,0 +1,418 @@
+''' Shader compilation helpers and the program wrapper. Active
+uniforms and attributes are queried once after linking, so the draw
+loop never has to ask the driver for a uniform location by name again.'''
+
+import ctypes
+
+from pyglet.gl import GLint, GLuint, GLfloat, GLsizei, GLenum, GLchar, GL_FALSE, \
+    GL_ACTIVE_UNIFORMS, GL_ACTIVE_UNIFORM_MAX_LENGTH, GL_ACTIVE_ATTRIBUTES, \
+    GL_ACTIVE_ATTRIBUTE_MAX_LENGTH, GL_FLOAT, GL_FLOAT_VEC2, GL_FLOAT_VEC3, \
+    GL_FLOAT_VEC4, GL_INT, GL_INT_VEC2, GL_INT_VEC3, GL_INT_VEC4, GL_BOOL, \
+    GL_BOOL_VEC2, GL_BOOL_VEC3, GL_BOOL_VEC4, GL_UNSIGNED_INT, \
+    GL_UNSIGNED_INT_VEC2, GL_UNSIGNED_INT_VEC3, GL_UNSIGNED_INT_VEC4, \
+    GL_FLOAT_MAT2, GL_FLOAT_MAT3, GL_FLOAT_MAT4, GL_SAMPLER_1D, GL_SAMPLER_2D, \
+    GL_SAMPLER_3D, GL_SAMPLER_CUBE, GL_SAMPLER_2D_ARRAY, GL_SAMPLER_2D_SHADOW, \
+    GL_SAMPLER_2D_MULTISAMPLE, GL_SAMPLER_BUFFER, GL_INT_SAMPLER_2D, \
+    GL_UNSIGNED_INT_SAMPLER_2D, glGetProgramiv, glGetActiveUniform, \
+    glGetActiveAttrib, glGetUniformLocation, glGetAttribLocation, glUseProgram, \
+    glDeleteProgram, glUniform1fv, glUniform2fv, glUniform3fv, glUniform4fv, \
+    glUniform1iv, glUniform2iv, glUniform3iv, glUniform4iv, glUniform1uiv, \
+    glUniform2uiv, glUniform3uiv, glUniform4uiv, glUniformMatrix2fv, \
+    glUniformMatrix3fv, glUniformMatrix4fv, GL_VERTEX_SHADER, GL_FRAGMENT_SHADER, \
+    GL_GEOMETRY_SHADER, GL_TRUE, GL_COMPILE_STATUS, GL_LINK_STATUS, \
+    GL_INFO_LOG_LENGTH, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, glCreateShader, \
+    glShaderSource, glCompileShader, glGetShaderiv, glGetShaderInfoLog, \
+    glDeleteShader, glCreateProgram, glAttachShader, glDetachShader, \
+    glLinkProgram, glGetProgramInfoLog, glProgramParameteri, glGetUniformBlockIndex, \
+    glUniformBlockBinding, GL_INVALID_INDEX
+from pyglet.graphics.shader import ShaderException
+
+_SAMPLER = (GLint, glUniform1iv, 1)
+
+# GL type: (ctypes element type, glUniform*v function, components)
+UNIFORM_SETTERS = {
+    GL_FLOAT: (GLfloat, glUniform1fv, 1),
+    GL_FLOAT_VEC2: (GLfloat, glUniform2fv, 2),
+    GL_FLOAT_VEC3: (GLfloat, glUniform3fv, 3),
+    GL_FLOAT_VEC4: (GLfloat, glUniform4fv, 4),
+    GL_INT: (GLint, glUniform1iv, 1),
+    GL_INT_VEC2: (GLint, glUniform2iv, 2),
+    GL_INT_VEC3: (GLint, glUniform3iv, 3),
+    GL_INT_VEC4: (GLint, glUniform4iv, 4),
+    GL_BOOL: (GLint, glUniform1iv, 1),
+    GL_BOOL_VEC2: (GLint, glUniform2iv, 2),
+    GL_BOOL_VEC3: (GLint, glUniform3iv, 3),
+    GL_BOOL_VEC4: (GLint, glUniform4iv, 4),
+    GL_UNSIGNED_INT: (GLuint, glUniform1uiv, 1),
+    GL_UNSIGNED_INT_VEC2: (GLuint, glUniform2uiv, 2),
+    GL_UNSIGNED_INT_VEC3: (GLuint, glUniform3uiv, 3),
+    GL_UNSIGNED_INT_VEC4: (GLuint, glUniform4uiv, 4),
+    GL_FLOAT_MAT2: (GLfloat, glUniformMatrix2fv, 4),
+    GL_FLOAT_MAT3: (GLfloat, glUniformMatrix3fv, 9),
+    GL_FLOAT_MAT4: (GLfloat, glUniformMatrix4fv, 16),
+    GL_SAMPLER_1D: _SAMPLER,
+    GL_SAMPLER_2D: _SAMPLER,
+    GL_SAMPLER_3D: _SAMPLER,
+    GL_SAMPLER_CUBE: _SAMPLER,
+    GL_SAMPLER_2D_ARRAY: _SAMPLER,
+    GL_SAMPLER_2D_SHADOW: _SAMPLER,
+    GL_SAMPLER_2D_MULTISAMPLE: _SAMPLER,
+    GL_SAMPLER_BUFFER: _SAMPLER,
+    GL_INT_SAMPLER_2D: _SAMPLER,
+    GL_UNSIGNED_INT_SAMPLER_2D: _SAMPLER,
+}
+
+MATRIX_TYPES = (GL_FLOAT_MAT2, GL_FLOAT_MAT3, GL_FLOAT_MAT4)
+
+# Uniform blocks shared by all programs: block name -> binding point.
+# pyglet hands out bindings from 1 upwards and keeps 0 for its WindowBlock
+UNIFORM_BLOCK_BINDINGS = {
+    'FrameBlock': 15,
+}
+
+SHADER_STAGES = {
+    GL_VERTEX_SHADER: 'vertex',
+    GL_FRAGMENT_SHADER: 'fragment',
+    GL_GEOMETRY_SHADER: 'geometry',
+}
+
+
+def read_source(filepath: str) -> str:
+    """
+        Read a shader source file as text.
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def apply_defines(source: str, defines: dict | None) -> str:
+    """
+        Insert '#define NAME VALUE' lines right after the #version
+        directive, which has to stay the first statement.
+    """
+    if not defines:
+        return source
+    block = ''.join(f"#define {name} {value}\n" for name, value in sorted(defines.items()))
+    lines = source.splitlines(keepends=True)
+    for index, line in enumerate(lines):
+        if line.lstrip().startswith('#version'):
+            if not line.endswith('\n'):
+                lines[index] = line + '\n'
+            lines.insert(index + 1, block)
+            return ''.join(lines)
+    return block + source
+
+
+def _info_log(object_id: int, get_iv, get_log) -> str:
+    length = GLint(0)
+    get_iv(object_id, GL_INFO_LOG_LENGTH, length)
+    log = ctypes.create_string_buffer(max(length.value, 1))
+    get_log(object_id, len(log), None, ctypes.cast(log, ctypes.POINTER(GLchar)))
+    return log.value.decode('utf-8', errors='replace')
+
+
+def shader_log(shader_id: int) -> str:
+    return _info_log(shader_id, glGetShaderiv, glGetShaderInfoLog)
+
+
+def program_log(program_id: int) -> str:
+    return _info_log(program_id, glGetProgramiv, glGetProgramInfoLog)
+
+
+def start_compile(source: str, shader_type: int) -> int:
+    """
+        Create a shader object and submit its source for compilation
+        without waiting for the result.
+            Returns:
+                A handle to the shader object
+    """
+    b_src = source.encode('utf-8')
+    src_len = GLint(len(b_src))
+    src_pointer = ctypes.cast(ctypes.c_char_p(b_src), ctypes.POINTER(GLchar))
+
+    shader_id = glCreateShader(shader_type)
+    glShaderSource(shader_id, 1, src_pointer, src_len)
+    glCompileShader(shader_id)
+    return shader_id
+
+
+def check_compile(shader_id: int, shader_type: int) -> None:
+    """
+        Raise ShaderException with the info log if compiling failed.
+        The shader object is deleted in that case. Querying the status
+        blocks until the driver has finished compiling.
+    """
+    status = GLint(0)
+    glGetShaderiv(shader_id, GL_COMPILE_STATUS, status)
+    if status.value != GL_TRUE:
+        log = shader_log(shader_id)
+        glDeleteShader(shader_id)
+        stage = SHADER_STAGES.get(shader_type, shader_type)
+        raise ShaderException(f"Compiling the {stage} shader failed:\n{log}")
+
+
+def compile_shader(source: str, shader_type: int) -> int:
+    """
+        Take shader source code as string, prepare it with ctypes
+        and compile a shader
+            Parameters:
+                source: shader source code as string
+                shader_type: GL_VERTEX_SHADER, GL_FRAGMENT_SHADER, ...
+            Returns:
+                A handle to the compiled shader object
+    """
+    shader_id = start_compile(source, shader_type)
+    check_compile(shader_id, shader_type)
+    return shader_id
+
+
+def start_link(shader_ids, retrievable: bool = False) -> int:
+    """
+        Create a program from compiled shader objects and submit it
+        for linking without waiting for the result. The shader objects
+        are detached afterwards, deleting them is up to the caller.
+            Parameters:
+                shader_ids: handles of the compiled shaders
+                retrievable: ask the driver to keep a program binary
+                            that glGetProgramBinary can read back
+            Returns:
+                A handle to the program
+    """
+    program_id = glCreateProgram()
+    if retrievable:
+        glProgramParameteri(program_id, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+    for shader_id in shader_ids:
+        glAttachShader(program_id, shader_id)
+    glLinkProgram(program_id)
+    # Shader objects no longer needed
+    for shader_id in shader_ids:
+        glDetachShader(program_id, shader_id)
+    return program_id
+
+
+def check_link(program_id: int) -> None:
+    """
+        Raise ShaderException with the info log if linking failed.
+        The program is deleted in that case.
+    """
+    status = GLint(0)
+    glGetProgramiv(program_id, GL_LINK_STATUS, status)
+    if status.value != GL_TRUE:
+        log = program_log(program_id)
+        glDeleteProgram(program_id)
+        raise ShaderException(f"Linking the shader program failed:\n{log}")
+
+
+def link_program(shader_ids, retrievable: bool = False) -> int:
+    """
+        Link compiled shader objects to a program and check the result.
+        See start_link() for the parameters.
+            Returns:
+                A handle to the linked program
+    """
+    program_id = start_link(shader_ids, retrievable)
+    check_link(program_id)
+    return program_id
+
+
+def build_program(sources: dict, defines: dict | None = None,
+                  retrievable: bool = False) -> int:
+    """
+        Compile every stage in sources ({shader type: source}) and
+        link them. Returns the raw program handle.
+    """
+    shader_ids = []
+    try:
+        for shader_type, source in sources.items():
+            shader_ids.append(compile_shader(apply_defines(source, defines), shader_type))
+        return link_program(shader_ids, retrievable)
+    finally:
+        for shader_id in shader_ids:
+            glDeleteShader(shader_id)
+
+
+def _flatten(value) -> tuple:
+    """
+        Turn a scalar, sequence, matrix or NumPy array into a flat tuple.
+    """
+    if hasattr(value, 'ravel'):
+        return tuple(value.ravel().tolist())
+    if isinstance(value, (int, float, bool)):
+        return (value,)
+    flat = []
+    for item in value:
+        flat.extend(_flatten(item))
+    return tuple(flat)
+
+
+class Uniform:
+    """
+        One active uniform of a linked program. Remembers the last
+        value it sent, so setting the same value again is free.
+    """
+    def __init__(self, name: str, location: int, gl_type: int, size: int):
+        self.name = name
+        self.location = location
+        self.type = gl_type
+        self.size = size
+        self.value = None
+
+        c_type, _, self.components = UNIFORM_SETTERS[gl_type]
+        self._is_matrix = gl_type in MATRIX_TYPES
+        self._array_type = c_type * (self.components * size)
+
+    def set(self, value) -> bool:
+        """
+            Upload value if it differs from the cached one. The owning
+            program has to be in use.
+            Returns:
+                True if a GL call was made
+        """
+        flat = _flatten(value)
+        if flat == self.value:
+            return False
+        if len(flat) != self.components * self.size:
+            raise ValueError(f"Uniform '{self.name}' expects "
+                             f"{self.components * self.size} values, got {len(flat)}")
+        data = self._array_type(*flat)
+        # From the table on every upload, gl3wxpyg.gl_trace swaps its entries
+        setter = UNIFORM_SETTERS[self.type][1]
+        if self._is_matrix:
+            setter(self.location, self.size, GL_FALSE, data)
+        else:
+            setter(self.location, self.size, data)
+        self.value = flat
+        return True
+
+    def invalidate(self) -> None:
+        """
+            Forget the cached value, the next set() always uploads.
+        """
+        self.value = None
+
+    def __repr__(self):
+        return f"Uniform({self.name!r}, location={self.location}, size={self.size})"
+
+
+class Attribute:
+    """
+        One active vertex attribute of a linked program.
+    """
+    def __init__(self, name: str, location: int, gl_type: int, size: int):
+        self.name = name
+        self.location = location
+        self.type = gl_type
+        self.size = size
+
+    def __repr__(self):
+        return f"Attribute({self.name!r}, location={self.location}, size={self.size})"
+
+
+def _active_resources(program_id: int, count_enum: int, length_enum: int, query) -> list:
+    """
+        Enumerate active uniforms or attributes as (name, type, size).
+    """
+    count = GLint(0)
+    glGetProgramiv(program_id, count_enum, count)
+    max_length = GLint(0)
+    glGetProgramiv(program_id, length_enum, max_length)
+
+    buffer = ctypes.create_string_buffer(max(max_length.value, 1))
+    name_ptr = ctypes.cast(buffer, ctypes.POINTER(GLchar))
+    resources = []
+    for index in range(count.value):
+        length = GLsizei(0)
+        size = GLint(0)
+        gl_type = GLenum(0)
+        query(program_id, index, len(buffer), length, size, gl_type, name_ptr)
+        name = buffer.raw[:length.value].decode('utf-8')
+        resources.append((name, gl_type.value, size.value))
+    return resources
+
+
+class ShaderProgram:
+    """
+        Owns a linked GL program and its introspected interface.
+    """
+    def __init__(self, program_id: int):
+        """
+            Wrap a linked program id and query its interface.
+            Parameters:
+                program_id: handle returned by glCreateProgram, the
+                            wrapper takes ownership of it
+        """
+        self.id = program_id
+        self.uniforms = {}
+        self.attributes = {}
+        self.uniform_blocks = {}
+        self._introspect()
+
+    def _introspect(self) -> None:
+        """
+            Look up every active uniform and attribute once and bind
+            the shared uniform blocks.
+        """
+        for name, gl_type, size in _active_resources(
+                self.id, GL_ACTIVE_UNIFORMS, GL_ACTIVE_UNIFORM_MAX_LENGTH,
+                glGetActiveUniform):
+            location = glGetUniformLocation(self.id, name.encode('utf-8'))
+            # Members of uniform blocks have no location
+            if location == -1 or gl_type not in UNIFORM_SETTERS:
+                continue
+            # Arrays are reported as 'name[0]'
+            if name.endswith('[0]'):
+                name = name[:-3]
+            self.uniforms[name] = Uniform(name, location, gl_type, size)
+
+        for name, gl_type, size in _active_resources(
+                self.id, GL_ACTIVE_ATTRIBUTES, GL_ACTIVE_ATTRIBUTE_MAX_LENGTH,
+                glGetActiveAttrib):
+            location = glGetAttribLocation(self.id, name.encode('utf-8'))
+            self.attributes[name] = Attribute(name, location, gl_type, size)
+
+        # GLSL 3.30 cannot declare block bindings, assign the shared ones here
+        for name, binding in UNIFORM_BLOCK_BINDINGS.items():
+            index = glGetUniformBlockIndex(self.id, name.encode('utf-8'))
+            if index != GL_INVALID_INDEX:
+                glUniformBlockBinding(self.id, index, binding)
+                self.uniform_blocks[name] = binding
+
+    def use(self) -> None:
+        """
+            Make this the current program.
+        """
+        glUseProgram(self.id)
+
+    @staticmethod
+    def stop() -> None:
+        """
+            Unbind any program.
+        """
+        glUseProgram(0)
+
+    def set_uniform(self, name: str, value) -> bool:
+        """
+            Set a uniform of this program, which has to be in use.
+            Returns:
+                True if a GL call was made, False if the value
+                was unchanged
+        """
+        try:
+            uniform = self.uniforms[name]
+        except KeyError:
+            raise ShaderException(f"Uniform '{name}' is not active in program {self.id}") from None
+        return uniform.set(value)
+
+    def __setitem__(self, name: str, value) -> None:
+        self.set_uniform(name, value)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.uniforms
+
+    def destroy(self) -> None:
+        """
+            Delete the program on the GPU.
+        """
+        if self.id:
+            glDeleteProgram(self.id)
+            self.id = 0
@@ -0,0 +1,203 @@
+''' Streaming vertex buffers for data that changes every frame, like a
+live toolpath preview or a pointer overlay. One buffer is split into
+regions, one per frame in flight. A frame writes into its own region
+with unsynchronized mappings, so the driver never waits for draws of
+earlier frames, and puts a fence behind its draws. If a region's fence
+has not signalled when it comes round again, the buffer is orphaned
+instead of waiting, which is also the strategy without sync objects.'''
+
+import ctypes
+import logging
+
+import pyglet
+from pyglet.gl import GLuint, GL_ARRAY_BUFFER, GL_STREAM_DRAW, GL_FLOAT, GL_FALSE, \
+    GL_TRIANGLES, GL_MAP_WRITE_BIT, GL_MAP_UNSYNCHRONIZED_BIT, GL_MAP_INVALIDATE_RANGE_BIT, \
+    GL_SYNC_GPU_COMMANDS_COMPLETE, GL_SYNC_FLUSH_COMMANDS_BIT, GL_ALREADY_SIGNALED, \
+    GL_CONDITION_SATISFIED, glMapBufferRange, glUnmapBuffer, glFenceSync, glClientWaitSync, \
+    glDeleteSync, glGenVertexArrays, glBindVertexArray, glDeleteVertexArrays, \
+    glEnableVertexAttribArray, glVertexAttribPointer, glDrawArrays
+import numpy as np
+
+from .buffers import BufferObject, as_array
+
+log = logging.getLogger(__name__)
+
+
+def have_sync_objects() -> bool:
+    """
+        Fences need OpenGL 3.2 or GL_ARB_sync.
+    """
+    info = pyglet.gl.current_context.get_info()
+    return info.have_version(3, 2) or info.have_extension('GL_ARB_sync')
+
+
+class StreamBuffer:
+    """
+        A buffer of `regions` equally sized parts that are written in
+        turn, one per frame. Call begin_frame() before writing and
+        end_frame() after the draws that read this frame's data.
+    """
+    def __init__(self, region_size: int, regions: int = 3, target: int = GL_ARRAY_BUFFER,
+                 fences: bool | None = None):
+        """
+            Parameters:
+                region_size: bytes one frame may write at most
+                regions: frames in flight, 3 hides the usual driver queue
+                target: buffer binding target
+                fences: guard the regions with sync objects; None uses
+                        them when available, False always orphans
+        """
+        self.region_size = region_size
+        self.regions = regions
+        self.fences = have_sync_objects() if fences is None else fences
+        self.buffer = BufferObject(target, GL_STREAM_DRAW, size=region_size * regions)
+        self._fences = [None] * regions
+        # Start on the last region, the first begin_frame() moves to 0
+        self.region = regions - 1
+        self.offset = self.region * region_size
+        self.orphans = 0
+        self.written_bytes = 0
+
+    @property
+    def target(self) -> int:
+        return self.buffer.target
+
+    def _orphan(self) -> None:
+        # New storage: pending draws keep reading the old one
+        self.buffer.allocate(self.buffer.nbytes)
+        for region, fence in enumerate(self._fences):
+            if fence is not None:
+                glDeleteSync(fence)
+                self._fences[region] = None
+        self.orphans += 1
+
+    def begin_frame(self) -> None:
+        """
+            Move on to the next region. Never blocks: a region the GPU
+            may still read is replaced by orphaning the buffer.
+        """
+        self.region = (self.region + 1) % self.regions
+        self.offset = self.region * self.region_size
+        if not self.fences:
+            # No way to tell when the GPU is done, orphan once per cycle
+            if self.region == 0:
+                self._orphan()
+            return
+        fence = self._fences[self.region]
+        if fence is None:
+            return
+        status = glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, 0)
+        glDeleteSync(fence)
+        self._fences[self.region] = None
+        if status not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+            log.debug("Stream region %d still in use, orphaning the buffer", self.region)
+            self._orphan()
+
+    def write(self, data, alignment: int = 1) -> int:
+        """
+            Append data to the current region.
+            Parameters:
+                data: any buffer-protocol object
+                alignment: the start is rounded up to a multiple of
+                           this, e.g. the vertex stride
+            Returns:
+                The byte offset of the data in the buffer
+        """
+        array = as_array(data)
+        offset = -(-self.offset // alignment) * alignment
+        region_end = (self.region + 1) * self.region_size
+        if offset + array.nbytes > region_end:
+            raise ValueError(f"{array.nbytes} bytes do not fit into the "
+                             f"{region_end - offset} bytes left in the stream region")
+        self.buffer.bind()
+        # The region is not read by the GPU any more, no synchronisation needed
+        pointer = glMapBufferRange(self.target, offset, array.nbytes,
+                                   GL_MAP_WRITE_BIT | GL_MAP_UNSYNCHRONIZED_BIT
+                                   | GL_MAP_INVALIDATE_RANGE_BIT)
+        ctypes.memmove(pointer, array.ctypes.data, array.nbytes)
+        glUnmapBuffer(self.target)
+        self.offset = offset + array.nbytes
+        self.written_bytes += array.nbytes
+        return offset
+
+    def end_frame(self) -> None:
+        """
+            Fence the current region behind the draws issued so far.
+        """
+        if not self.fences:
+            return
+        if self._fences[self.region] is not None:
+            glDeleteSync(self._fences[self.region])
+        self._fences[self.region] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+
+    def destroy(self) -> None:
+        for fence in self._fences:
+            if fence is not None:
+                glDeleteSync(fence)
+        self._fences = [None] * self.regions
+        self.buffer.destroy()
+
+
+class StreamMesh:
+    """
+        A vertex array reading from a StreamBuffer, for vertices that are
+        replaced every frame. The attributes are set up once; each frame
+        draws from wherever its vertices were written.
+    """
+    def __init__(self, attributes, max_vertices: int, regions: int = 3,
+                 mode: int = GL_TRIANGLES, fences: bool | None = None):
+        """
+            Parameters:
+                attributes: sequence of (location, components) in the
+                            order they are interleaved in a vertex
+                max_vertices: vertices one frame may update at most
+                regions: frames in flight
+                mode: primitive type used by draw()
+                fences: see StreamBuffer
+        """
+        components = sum(count for _, count in attributes)
+        self.stride = components * 4
+        self.mode = mode
+        self.first = 0
+        self.vertex_count = 0
+        # Regions are whole vertices, so every write starts on a vertex
+        self.stream = StreamBuffer(max_vertices * self.stride, regions, GL_ARRAY_BUFFER, fences)
+
+        self.vao = GLuint(0)
+        glGenVertexArrays(1, self.vao)
+        glBindVertexArray(self.vao)
+        self.stream.buffer.bind()
+        offset = 0
+        for location, count in attributes:
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, count, GL_FLOAT, GL_FALSE, self.stride, offset)
+            offset += count * 4
+        glBindVertexArray(0)
+
+    def update(self, vertices) -> None:
+        """
+            Replace the vertices for this frame, without waiting for the
+            GPU to finish drawing the previous ones.
+        """
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        self.stream.begin_frame()
+        offset = self.stream.write(vertices, alignment=self.stride)
+        self.first = offset // self.stride
+        self.vertex_count = vertices.nbytes // self.stride
+
+    def arm_for_drawing(self) -> None:
+        """
+            Arm the mesh for drawing.
+        """
+        glBindVertexArray(self.vao)
+
+    def draw(self) -> None:
+        """
+            Draw this frame's vertices and fence their region.
+        """
+        glDrawArrays(self.mode, self.first, self.vertex_count)
+        self.stream.end_frame()
+
+    def destroy(self) -> None:
+        glDeleteVertexArrays(1, self.vao)
+        self.stream.destroy()
@@ -0,0 +1,307 @@
+''' Asynchronous texture loading. Images are decoded on worker threads
+and their pixels are handed over as NumPy views of the decoder's buffer.
+The render thread streams them to the GPU through a pixel buffer object
+in row chunks, never more than a byte budget per frame, and generates
+mipmaps once a texture is complete. Call poll() once per frame.'''
+
+import ctypes
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import queue
+
+from pyglet.gl import GLuint, GL_TEXTURE_2D, GL_PIXEL_UNPACK_BUFFER, GL_STREAM_DRAW, \
+    GL_MAP_WRITE_BIT, GL_MAP_INVALIDATE_BUFFER_BIT, GL_UNPACK_ALIGNMENT, GL_RGB, GL_RGBA, \
+    GL_RGB8, GL_RGBA8, GL_UNSIGNED_BYTE, GL_TEXTURE_MIN_FILTER, GL_TEXTURE_MAG_FILTER, \
+    GL_TEXTURE_WRAP_S, GL_TEXTURE_WRAP_T, GL_LINEAR, GL_LINEAR_MIPMAP_LINEAR, GL_REPEAT, \
+    glGenTextures, glBindTexture, glDeleteTextures, glTexImage2D, glTexSubImage2D, \
+    glTexParameteri, glGenerateMipmap, glPixelStorei, glBindBuffer, \
+    glMapBufferRange, glUnmapBuffer
+import numpy as np
+
+from .buffers import BufferObject
+
+log = logging.getLogger(__name__)
+
+# Channels: (internal format, pixel format)
+PIXEL_FORMATS = {
+    3: (GL_RGB8, GL_RGB),
+    4: (GL_RGBA8, GL_RGBA),
+}
+
+
+def decode_wx(path: str) -> tuple:
+    """
+        Decode an image file with wx.Image, which may be used outside of
+        the main thread. RGB images are returned as a view of the image
+        buffer, no copy is made; with alpha, RGBA is assembled once.
+            Returns:
+                A (height, width, 3 or 4) uint8 array, top row first, and
+                the wx.Image that owns its memory
+    """
+    import wx
+    image = wx.Image(path)
+    if not image.IsOk():
+        raise OSError(f"Could not decode image {path}")
+    width, height = image.GetSize()
+    # The buffer does not own the image, the image has to outlive the array
+    rgb = np.frombuffer(image.GetDataBuffer(), dtype=np.uint8).reshape(height, width, 3)
+    if not image.HasAlpha():
+        return rgb, image
+    alpha = np.frombuffer(image.GetAlphaBuffer(), dtype=np.uint8).reshape(height, width, 1)
+    return np.concatenate((rgb, alpha), axis=2), None
+
+
+class Texture:
+    """
+        A 2D texture with mipmaps.
+    """
+    def __init__(self, width: int, height: int, channels: int):
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.id = GLuint(0)
+        glGenTextures(1, self.id)
+
+    def bind(self) -> None:
+        glBindTexture(GL_TEXTURE_2D, self.id)
+
+    def destroy(self) -> None:
+        if self.id.value:
+            glDeleteTextures(1, self.id)
+            self.id = GLuint(0)
+
+
+class PendingTexture:
+    """
+        A texture that was requested from a TextureLoader.
+    """
+    DECODING = 'decoding'
+    UPLOADING = 'uploading'
+    READY = 'ready'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, path: str, on_ready=None):
+        self.path = path
+        self.on_ready = on_ready
+        self.state = self.DECODING
+        self.texture = None
+        self.error = None
+        self.pixels = None
+        # Whatever owns the memory of pixels, kept as long as pixels
+        self.pixels_owner = None
+        # Image rows uploaded so far, top row first
+        self.rows_done = 0
+
+    @property
+    def done(self) -> bool:
+        return self.state in (self.READY, self.FAILED, self.CANCELLED)
+
+    def cancel(self) -> None:
+        """
+            Drop the request. A texture already created is deleted by
+            the next poll().
+        """
+        if not self.done:
+            self.state = self.CANCELLED
+
+    def __repr__(self):
+        return f"PendingTexture({self.path!r}, {self.state})"
+
+
+class TextureLoader:
+    """
+        Decodes images in the background and uploads them a slice per
+        frame, so loading many large textures does not stall the UI.
+    """
+    def __init__(self, budget: int = 4 * 2**20, workers: int = 2, decoder=decode_wx,
+                 mipmaps: bool = True, wrap: int = GL_REPEAT):
+        """
+            Parameters:
+                budget: bytes uploaded per poll() at most, at least one
+                        row is uploaded to make progress
+                workers: decoder threads
+                decoder: path -> (height, width, 3 or 4) uint8 array, or
+                         the array and an object that owns its memory
+                mipmaps: generate mipmaps and sample them trilinearly
+                wrap: GL_TEXTURE_WRAP_S/T of the textures
+        """
+        self.budget = budget
+        self.decoder = decoder
+        self.mipmaps = mipmaps
+        self.wrap = wrap
+        self.uploaded_bytes = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='texture-decode')
+        # Decoded on a worker, waiting for the render thread
+        self._decoded = queue.SimpleQueue()
+        self._uploads = []
+        self._requests = 0
+        self.pbo = BufferObject(GL_PIXEL_UNPACK_BUFFER, GL_STREAM_DRAW)
+
+    @property
+    def pending(self) -> int:
+        return self._requests
+
+    def load(self, path: str, on_ready=None) -> PendingTexture:
+        """
+            Start loading an image file.
+            Parameters:
+                path: image file the decoder understands
+                on_ready: called with the Texture from poll() once it is
+                          complete, mipmaps included
+            Returns:
+                The request, its texture is set once it is ready
+        """
+        request = PendingTexture(path, on_ready)
+        self._requests += 1
+        self._executor.submit(self._decode, request)
+        return request
+
+    def _decode(self, request: PendingTexture) -> None:
+        # Worker thread: no GL calls here
+        if request.state == request.CANCELLED:
+            self._decoded.put(request)
+            return
+        try:
+            pixels = self.decoder(request.path)
+            if isinstance(pixels, tuple):
+                pixels, request.pixels_owner = pixels
+            if pixels.dtype != np.uint8 or pixels.ndim != 3 or pixels.shape[2] not in PIXEL_FORMATS:
+                raise ValueError(f"Unsupported pixel array {pixels.dtype} {pixels.shape}")
+            request.pixels = pixels
+        except Exception as error:
+            request.error = error
+        self._decoded.put(request)
+
+    def poll(self) -> list:
+        """
+            Upload decoded images, budget bytes at most. Needs the
+            context to be current.
+                Returns:
+                    The requests that finished during this call
+        """
+        finished = []
+        while True:
+            try:
+                request = self._decoded.get_nowait()
+            except queue.Empty:
+                break
+            if request.state == request.CANCELLED:
+                finished.append(self._finish(request))
+            elif request.error is not None:
+                request.state = request.FAILED
+                log.error("Loading texture %s failed: %s", request.path, request.error)
+                finished.append(self._finish(request))
+            else:
+                self._start_upload(request)
+
+        budget = self.budget
+        while self._uploads and budget > 0:
+            request = self._uploads[0]
+            if request.state == request.CANCELLED:
+                self._uploads.pop(0)
+                finished.append(self._finish(request))
+                continue
+            budget -= self._upload_rows(request, budget)
+            if request.rows_done == request.texture.height:
+                self._uploads.pop(0)
+                self._complete(request)
+                finished.append(self._finish(request))
+        return finished
+
+    def _start_upload(self, request: PendingTexture) -> None:
+        height, width, channels = request.pixels.shape
+        texture = Texture(width, height, channels)
+        internal_format, pixel_format = PIXEL_FORMATS[channels]
+        texture.bind()
+        # Storage only, the rows follow over the next frames
+        glTexImage2D(GL_TEXTURE_2D, 0, internal_format, width, height, 0,
+                     pixel_format, GL_UNSIGNED_BYTE, None)
+        request.texture = texture
+        request.state = request.UPLOADING
+        self._uploads.append(request)
+
+    def _upload_rows(self, request: PendingTexture, budget: int) -> int:
+        texture = request.texture
+        pixels = request.pixels
+        row_bytes = texture.width * texture.channels
+        rows = min(max(budget // row_bytes, 1), texture.height - request.rows_done)
+        first = request.rows_done
+        nbytes = rows * row_bytes
+
+        # Orphan the storage so the driver need not wait for the last
+        # transfer, then write the rows straight into the mapping
+        self.pbo.allocate(max(self.pbo.nbytes, nbytes))
+        pointer = glMapBufferRange(GL_PIXEL_UNPACK_BUFFER, 0, nbytes,
+                                   GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_BUFFER_BIT)
+        mapped = np.ctypeslib.as_array(ctypes.cast(pointer, ctypes.POINTER(ctypes.c_ubyte)),
+                                       shape=(rows, texture.width, texture.channels))
+        # OpenGL starts at the bottom row, images at the top one
+        mapped[:] = pixels[first:first + rows][::-1]
+        glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+
+        texture.bind()
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        _, pixel_format = PIXEL_FORMATS[texture.channels]
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, texture.height - first - rows, texture.width, rows,
+                        pixel_format, GL_UNSIGNED_BYTE, 0)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
+        request.rows_done += rows
+        self.uploaded_bytes += nbytes
+        return nbytes
+
+    def _complete(self, request: PendingTexture) -> None:
+        texture = request.texture
+        texture.bind()
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, self.wrap)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, self.wrap)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        if self.mipmaps:
+            glGenerateMipmap(GL_TEXTURE_2D)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+        else:
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        request.state = request.READY
+
+    def _finish(self, request: PendingTexture) -> PendingTexture:
+        self._requests -= 1
+        # The decoded pixels are on the GPU now or not needed any more
+        request.pixels = None
+        request.pixels_owner = None
+        if request.state == request.CANCELLED and request.texture is not None:
+            request.texture.destroy()
+            request.texture = None
+        if request.state == request.READY and request.on_ready:
+            request.on_ready(request.texture)
+        return request
+
+    def finish(self) -> None:
+        """
+            Block until every requested texture is done, e.g. offscreen.
+        """
+        budget = self.budget
+        self.budget = 2**62
+        try:
+            while self.pending:
+                self.poll()
+                if self.pending and not self._uploads:
+                    # Waiting for the decoders
+                    request = self._decoded.get()
+                    self._decoded.put(request)
+        finally:
+            self.budget = budget
+
+    def destroy(self) -> None:
+        """
+            Stop the workers and free the pixel buffer. Textures that are
+            still uploading are deleted, ready ones belong to the caller.
+        """
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for request in self._uploads:
+            request.texture.destroy()
+        self._uploads = []
+        self.pbo.destroy()
@@ -0,0 +1,261 @@
+''' The scene of 01_Triangle.py without any wx code, so the same
+init_gl/on_draw/_create_assets logic runs in the wx canvas and in the
+offscreen backend. The class hosting the scene provides the surface
+hooks: get_aspect, swap_buffers, make_current, request_redraw and
+call_after.'''
+
+import os
+
+from pyglet.gl import GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT, GL_DEPTH_TEST, \
+    GL_CULL_FACE, GL_VERTEX_SHADER, GL_FRAGMENT_SHADER, glClear
+import numpy as np
+
+from .buffers import Mesh
+from .instancing import InstancedMesh
+from .shaders import read_source
+from .shader_cache import ProgramBinaryCache
+from .compile_queue import CompileQueue, PendingProgram
+from .hot_reload import FileWatcher, ShaderReloader
+from .frame_stats import FrameStats
+from .gpu_profiler import GpuProfiler
+from .frame_uniforms import FrameUniforms
+from .gl_state import GLState
+from .gl_debug import install_for_profile
+from .gl_trace import GLCallTracer
+from .offscreen import OffscreenSurface
+
+SHADER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shaders')
+
+# x, y, z, r, g, b
+TRIANGLE_VERTICES = np.array((
+    -0.5, -0.5, 0.0, 1.0, 0.3, 0.0,
+     0.5, -0.5, 0.0, 0.7, 0.9, 0.0,
+     0.0,  0.5, 0.0, 0.1, 0.3, 0.5
+), dtype=np.float32)
+
+
+class Triangle(Mesh):
+    """
+        Yep, it's a triangle.
+    """
+    def __init__(self):
+        """
+            Initialize a triangle.
+        """
+        # The array is handed to glBufferData by its data pointer,
+        # vertex position at location 0 and colour at location 1
+        super().__init__(TRIANGLE_VERTICES, ((0, 3), (1, 3)))
+
+
+class InstancedTriangle(InstancedMesh):
+    """
+        Many triangles drawn with a single instanced draw call.
+    """
+    def __init__(self, count: int, seed: int = 0):
+        """
+            Scatter count triangles with random offsets, rotations,
+            scales and colours over the viewport.
+        """
+        super().__init__(TRIANGLE_VERTICES, ((0, 3), (1, 3)), capacity=count)
+        rng = np.random.default_rng(seed)
+        instances = self.instances
+        instances.resize(count)
+        # Written as whole columns, uploaded as one range by the first draw
+        instances['offset'][:, :2] = rng.uniform(-1.0, 1.0, (count, 2))
+        instances['rotation'][:, 0] = rng.uniform(0.0, 2 * np.pi, count)
+        instances['scale'][:, 0] = rng.uniform(0.5, 1.5, count) / max(np.sqrt(count), 1.0)
+        instances['color'][:] = rng.uniform(0.5, 1.0, (count, 3))
+        instances.mark_dirty(0, count)
+
+
+class TriangleScene:
+    """
+        Draws a coloured triangle. Mix it into a class that provides
+        the surface hooks, scene first.
+    """
+    # Rebuild shader programs when their files change, e.g. GL3WXPYG_HOT_RELOAD=1
+    hot_reload = bool(os.environ.get('GL3WXPYG_HOT_RELOAD'))
+    # Write a Chrome trace of CPU/GPU scope timings to this path on close
+    gpu_profile_path = os.environ.get('GL3WXPYG_GPU_PROFILE')
+    # Draw this many instanced triangles instead of one, e.g. GL3WXPYG_INSTANCES=100000
+    instances = int(os.environ.get('GL3WXPYG_INSTANCES', 0))
+    # Write the GL calls of every frame to this path on close, e.g. GL3WXPYG_GL_TRACE=calls.json
+    gl_trace_path = os.environ.get('GL3WXPYG_GL_TRACE')
+    # Warn about traced frames with more GL calls, e.g. GL3WXPYG_GL_CALL_BUDGET=20
+    gl_call_budget = int(os.environ.get('GL3WXPYG_GL_CALL_BUDGET', 0)) or None
+
+    def init_gl(self):
+        '''Initialise ogl context'''
+        # Driver errors and warnings in the debug profile, see gl3wxpyg.options
+        self.debug_output = install_for_profile()
+        self.frame_stats = FrameStats()
+        self.profiler = GpuProfiler(enabled=bool(self.gpu_profile_path))
+        self.gl_tracer = None
+        if self.gl_trace_path:
+            self.gl_tracer = GLCallTracer(self.gl_call_budget)
+            self.gl_tracer.install()
+        self.sh_program = None
+        self.triangle = None
+        # Aspect ratio and camera of every program, at one binding point
+        self.frame_uniforms = FrameUniforms()
+        # Unchanged program and vertex array bindings are not issued again
+        self.gl_state = GLState()
+        self.shader_cache = ProgramBinaryCache()
+        self.compile_queue = CompileQueue(self.shader_cache)
+        self.shader_reloader = None
+        self.shader_watcher = None
+        if self.hot_reload:
+            self.shader_reloader = ShaderReloader(self.compile_queue)
+            self.shader_watcher = FileWatcher(
+                lambda paths: self.call_after(self.on_shaders_changed, paths))
+
+        # Background colour
+        COL_BG = (96, 147, 172)
+        self.gl_state.clear_color(COL_BG[0] / 255, COL_BG[1] / 255, COL_BG[2] / 255, 1)
+
+        # Enable depth testing and face culling. Not needed in this example
+        self.gl_state.enable(GL_DEPTH_TEST)
+        self.gl_state.enable(GL_CULL_FACE)
+
+        self._create_assets()
+
+    def on_draw(self):
+        '''Drawcall, clear the stage, prepare a new frame and
+        eventually swap buffers
+        '''
+
+        # Frames are drawn on demand, idle time between them is no frame time
+        self.frame_stats.begin()
+        profiler = self.profiler
+        profiler.begin_frame()
+        if self.gl_tracer:
+            self.gl_tracer.begin_frame()
+
+        # Pick up programs the driver has finished in the meantime
+        self.compile_queue.poll()
+        self.sh_program = self.compile_queue.get(self.program_name)
+
+        # One upload for all programs, and none if nothing changed
+        self.frame_uniforms.set_aspect(self.get_aspect())
+        self.frame_uniforms.update()
+
+        with profiler.scope('frame'):
+            with profiler.scope('clear'):
+                # Clear color and depth buffers.
+                glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            if self.sh_program:
+                with profiler.scope('triangle'):
+                    # Activate the compiled shader program for use
+                    self.gl_state.use_program(self.sh_program)
+
+                    # Activate the vertex array buffer for the objects to draw
+                    self.gl_state.bind_vertex_array(self.triangle.vao)
+                    self.triangle.draw()
+
+        # Swap the currently shown frame with the prepared new frame
+        self.swap_buffers()
+        if self.gl_tracer:
+            self.gl_tracer.end_frame()
+        profiler.end_frame()
+
+        # Record how long the frame took
+        if self.frame_stats.tick():
+            self.update_frame_status()
+
+        if self.compile_queue.pending:
+            # Come back next frame instead of waiting for the driver here
+            self.request_redraw()
+
+    def _create_assets(self) -> None:
+        """
+            Create all of the assets needed for drawing.
+        """
+        # A triangle object (vertices and colours), or many drawn at once
+        if self.instances:
+            self.triangle = InstancedTriangle(self.instances)
+            self.program_name = 'instanced_triangle'
+            vert_filepath = os.path.join(SHADER_DIR, "instanced_vertex.glsl")
+        else:
+            self.triangle = Triangle()
+            self.program_name = 'triangle'
+            vert_filepath = os.path.join(SHADER_DIR, "vertex.glsl")
+
+        # Shader program
+        frag_filepath = os.path.join(SHADER_DIR, "fragment.glsl")
+        if self.shader_reloader:
+            self.shader_reloader.add_program(self.program_name,
+                                             {GL_VERTEX_SHADER: vert_filepath,
+                                              GL_FRAGMENT_SHADER: frag_filepath})
+            for path in self.shader_reloader.files:
+                self.shader_watcher.watch(path)
+            self.shader_watcher.start()
+        else:
+            self.submit_shader_program(self.program_name, vert_filepath, frag_filepath)
+
+    def on_shaders_changed(self, paths: set) -> None:
+        """
+            Resubmit the programs that use the changed shader files. The
+            new programs are swapped in by on_draw once they are linked.
+        """
+        self.make_current()
+        self.shader_reloader.reload(paths)
+        self.request_redraw()
+
+    def submit_shader_program(self, name: str, vertex_filepath: str, fragment_filepath: str,
+                              defines: dict | None = None) -> PendingProgram:
+        """
+            Queue shader modules for compiling and linking. The program
+            shows up in self.compile_queue under name once it is done.
+            A binary of the program is cached on disk, later launches
+            load it instead of compiling the sources again.
+            Parameters:
+                name: key of the program in the compile queue
+                vertex_filepath: path to the text file storing the vertex
+                                source code
+                fragment_filepath: path to the text file storing the
+                                fragment source code
+                defines: optional preprocessor defines for both stages
+            Returns:
+                The queue entry of the program
+        """
+        sources = {
+            GL_VERTEX_SHADER: read_source(vertex_filepath),
+            GL_FRAGMENT_SHADER: read_source(fragment_filepath),
+        }
+        return self.compile_queue.submit(name, sources, defines)
+
+    def update_frame_status(self) -> None:
+        """
+            Called a few times per second with new frame statistics.
+        """
+
+    def destroy(self) -> None:
+        '''Clean up before closing the window'''
+        if self.triangle:
+            self.triangle.destroy()
+        self.frame_uniforms.destroy()
+        if self.profiler.enabled:
+            self.profiler.export_chrome_trace(self.gpu_profile_path)
+        self.profiler.destroy()
+        if self.gl_tracer:
+            self.gl_tracer.uninstall()
+            self.gl_tracer.export_json(self.gl_trace_path)
+        if self.shader_watcher:
+            self.shader_watcher.stop()
+        if self.shader_reloader:
+            self.shader_reloader.destroy()
+        if self.compile_queue:
+            # Also deletes every program built by the queue
+            self.compile_queue.destroy()
+        if self.debug_output:
+            self.debug_output.destroy()
+
+
+class OffscreenTriangle(TriangleScene, OffscreenSurface):
+    """
+        The triangle scene rendered into an offscreen framebuffer.
+    """
+    def init_gl(self):
+        super().init_gl()
+        # Nobody is waiting on screen, build the program right away
+        self.compile_queue.finish()
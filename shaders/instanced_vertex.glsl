@@ -0,0 +1,39 @@
+#version 330 core
+
+layout (location=0) in vec3 vertexPos;
+layout (location=1) in vec3 vertexColor;
+// Per instance, attribute divisor 1
+layout (location=2) in vec3 instanceOffset;
+layout (location=3) in float instanceRotation;
+layout (location=4) in float instanceScale;
+layout (location=5) in vec3 instanceColor;
+
+// Shared by all programs, see gl3wxpyg/frame_uniforms.py
+layout (std140) uniform FrameBlock
+{
+    mat4 projection;
+    mat4 view;
+    vec2 viewport;
+    float aspect;
+    float time;
+} frame;
+
+out vec3 fragmentColor;
+
+#ifdef PICKING
+// Every instance is an object for gl3wxpyg/picking.py, 0 is nothing
+flat out uint objectId;
+#endif
+
+void main()
+{
+    float c = cos(instanceRotation);
+    float s = sin(instanceRotation);
+    vec2 rotated = mat2(c, s, -s, c) * vertexPos.xy * instanceScale;
+    vec3 position = vec3(rotated, vertexPos.z * instanceScale) + instanceOffset;
+    gl_Position = vec4(position.x, position.y * frame.aspect, position.z, 1.0);
+    fragmentColor = vertexColor * instanceColor;
+#ifdef PICKING
+    objectId = uint(gl_InstanceID) + 1u;
+#endif
+}
\ No newline at end of file
@@ -0,0 +1,22 @@
+#version 330 core
+
+in vec3 fragmentNormal;
+in vec2 fragmentUV;
+
+// Directional light in eye space, like GL_LIGHT0 with w = 0
+uniform vec3 lightDirection;
+uniform vec3 ambient;
+uniform vec4 diffuse;
+// Modulate with a texture, like GL_MODULATE
+uniform bool textured;
+uniform sampler2D diffuseMap;
+
+out vec4 color;
+
+void main()
+{
+    float lambert = max(dot(normalize(fragmentNormal), normalize(lightDirection)), 0.0);
+    color = vec4(ambient + diffuse.rgb * lambert, diffuse.a);
+    if (textured)
+        color *= texture(diffuseMap, fragmentUV);
+}
\ No newline at end of file
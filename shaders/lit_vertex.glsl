@@ -0,0 +1,19 @@
+#version 330 core
+
+layout (location=0) in vec3 vertexPos;
+layout (location=1) in vec3 vertexNormal;
+layout (location=2) in vec2 vertexUV;
+
+uniform mat4 projection;
+uniform mat4 modelview;
+
+out vec3 fragmentNormal;
+out vec2 fragmentUV;
+
+void main()
+{
+    gl_Position = projection * modelview * vec4(vertexPos, 1.0);
+    // Rotations and translations only, no normal matrix needed
+    fragmentNormal = mat3(modelview) * vertexNormal;
+    fragmentUV = vertexUV;
+}
\ No newline at end of file
@@ -0,0 +1,16 @@
+#version 330 core
+
+uniform vec4 lineColor;
+// Pixels on and off of a dashed line, 0 for a solid one. Replaces
+// glLineStipple, which the core profile does not have
+uniform float dash;
+
+out vec4 color;
+
+void main()
+{
+    // Counted along both axes, so any horizontal or vertical line is dashed
+    if (dash > 0.0 && mod(gl_FragCoord.x + gl_FragCoord.y, 2.0 * dash) >= dash)
+        discard;
+    color = lineColor;
+}
\ No newline at end of file
@@ -0,0 +1,19 @@
+#version 330 core
+
+// Window coordinates in pixels, origin at the bottom left
+layout (location=0) in vec2 vertexPos;
+
+// Shared by all programs, see gl3wxpyg/frame_uniforms.py
+layout (std140) uniform FrameBlock
+{
+    mat4 projection;
+    mat4 view;
+    vec2 viewport;
+    float aspect;
+    float time;
+} frame;
+
+void main()
+{
+    gl_Position = vec4(vertexPos / frame.viewport * 2.0 - 1.0, 0.0, 1.0);
+}
\ No newline at end of file
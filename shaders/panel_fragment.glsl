@@ -0,0 +1,28 @@
+#version 330 core
+
+in vec3 fragmentNormal;
+in vec4 fragmentColor;
+
+// Directional lights in eye space, like GL_LIGHTn with w = 0 and
+// GL_COLOR_MATERIAL tracking the vertex colour
+uniform bool lit;
+uniform vec3 ambient;
+uniform vec3 lightDirections[2];
+uniform vec3 lightDiffuse[2];
+
+out vec4 color;
+
+void main()
+{
+    if (!lit)
+    {
+        color = fragmentColor;
+        return;
+    }
+    // GL_NORMALIZE
+    vec3 normal = normalize(fragmentNormal);
+    vec3 light = ambient;
+    for (int i = 0; i < 2; i++)
+        light += lightDiffuse[i] * max(dot(normal, normalize(lightDirections[i])), 0.0);
+    color = vec4(fragmentColor.rgb * light, fragmentColor.a);
+}
\ No newline at end of file
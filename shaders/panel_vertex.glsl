@@ -0,0 +1,39 @@
+#version 330 core
+
+layout (location=0) in vec3 vertexPos;
+layout (location=1) in vec3 vertexNormal;
+layout (location=2) in vec4 vertexColor;
+
+// Shared by all programs, see gl3wxpyg/frame_uniforms.py
+layout (std140) uniform FrameBlock
+{
+    mat4 projection;
+    mat4 view;
+    vec2 viewport;
+    float aspect;
+    float time;
+} frame;
+
+// Object transform under the camera view, e.g. the orbit rotation
+uniform mat4 model;
+// Inverse transpose of mat3(view * model), zooming scales unevenly
+uniform mat3 normalMatrix;
+
+out vec3 fragmentNormal;
+out vec4 fragmentColor;
+
+#ifdef PICKING
+// Id of the first instance of a draw for gl3wxpyg/picking.py, 0 is nothing
+uniform uint idBase;
+flat out uint objectId;
+#endif
+
+void main()
+{
+    gl_Position = frame.projection * frame.view * model * vec4(vertexPos, 1.0);
+    fragmentNormal = normalMatrix * vertexNormal;
+    fragmentColor = vertexColor;
+#ifdef PICKING
+    objectId = idBase + uint(gl_InstanceID);
+#endif
+}
\ No newline at end of file
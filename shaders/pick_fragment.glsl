@@ -0,0 +1,11 @@
+#version 330 core
+
+flat in uint objectId;
+
+// The R32UI attachment of gl3wxpyg.picking.PickBuffer
+out uint pickId;
+
+void main()
+{
+    pickId = objectId;
+}
\ No newline at end of file
@@ -3,8 +3,17 @@
 layout (location=0) in vec3 vertexPos;
 layout (location=1) in vec3 vertexColor;
 
-uniform float aspect;
-float correctedY = vertexPos.y * aspect;
+// Shared by all programs, see gl3wxpyg/frame_uniforms.py
+layout (std140) uniform FrameBlock
+{
+    mat4 projection;
+    mat4 view;
+    vec2 viewport;
+    float aspect;
+    float time;
+} frame;
+
+float correctedY = vertexPos.y * frame.aspect;
 
 out vec3 fragmentColor;
 